@@ -1,22 +1,233 @@
-from flask import Flask, request, jsonify
+from flask import Flask, Response, request, jsonify
 import os
-from sentence_transformers import SentenceTransformer
-from transformers import ChineseCLIPProcessor, ChineseCLIPModel
 from PIL import Image
 import base64
+import binascii
 import io
 import logging
-import pytesseract
-from pdf2image import convert_from_bytes
+import json
+import shutil
+import tempfile
+import time
+import types
+from assets.utils.micro_batch import MicroBatcher
+from assets.utils.query_cache import QueryCache, normalize_query
+from assets.utils.wire import EMBEDDING_MIMES, JSON_MIME, pack_embeddings
+from assets.utils.ocr import OCREngine, OCR_DPI, OCR_MAX_PAGES
+from assets.utils.content_cache import OCRCache, file_digest, bytes_digest
+from assets.utils.ocr_jobs import OCRJobManager
+from assets.utils.model_pool import ModelWorkerPool, parse_cores
+from assets.utils.model_names import TEXT_MODEL_NAME, CLIP_MODEL_NAME, model_id
+from assets.utils.local_backend import LocalEmbeddingClient, ENDPOINTS
+from assets.utils.app_config import data_files, read_config
+from assets.utils.index_service import IndexService, search_filter
 
 app = Flask(__name__)
 logging.basicConfig(level=logging.DEBUG)
 
 # Update this to your actual model directory
 MODEL_DIR = r"X:\projects\Ollama\models"  # Replace with actual path
-text_model = SentenceTransformer(os.path.join(MODEL_DIR, "paraphrase-multilingual-MiniLM-L12-v2"))
-clip_model = ChineseCLIPModel.from_pretrained(os.path.join(MODEL_DIR, "chinese-clip-vit-base-patch16"))
-clip_processor = ChineseCLIPProcessor.from_pretrained(os.path.join(MODEL_DIR, "chinese-clip-vit-base-patch16"))
+
+# Per-model inference mode: float32 (default), int8 (dynamic quantization) or onnx (text model only).
+# TORCH_THREADS / TORCH_INTEROP_THREADS override PyTorch's thread pools; 0 keeps its defaults.
+TEXT_MODEL_MODE = os.getenv("TEXT_MODEL_MODE", "float32")
+CLIP_MODEL_MODE = os.getenv("CLIP_MODEL_MODE", "float32")
+# Non-float32 models are compared against float32 at startup; INFERENCE_DRIFT_MIN is the minimum cosine
+INFERENCE_DRIFT_CHECK = os.getenv("INFERENCE_DRIFT_CHECK", "1") == "1"
+INFERENCE_DRIFT_MIN = float(os.getenv("INFERENCE_DRIFT_MIN", "0.98"))
+model_config = {
+    'model_dir': MODEL_DIR,
+    'text_name': TEXT_MODEL_NAME,
+    'clip_name': CLIP_MODEL_NAME,
+    'text_mode': TEXT_MODEL_MODE,
+    'clip_mode': CLIP_MODEL_MODE,
+    'drift_check': INFERENCE_DRIFT_CHECK,
+    'drift_min': INFERENCE_DRIFT_MIN,
+}
+
+# MODEL_WORKERS > 0 moves the models into that many worker processes per model (TEXT_WORKERS /
+# CLIP_WORKERS override it per model), each pinned to its own share of MODEL_WORKER_CORES
+# (e.g. "0-47"; default: every core this process may use). 0 keeps the models in this process.
+MODEL_WORKERS = int(os.getenv("MODEL_WORKERS", "0"))
+model_pool = model_runtime = clip_processor = run_model = None
+
+def load_models():
+    global model_pool, model_runtime, clip_processor, run_model
+    if MODEL_WORKERS:
+        model_pool = ModelWorkerPool(
+            {
+                'text': max(1, int(os.getenv("TEXT_WORKERS", str(MODEL_WORKERS)))),
+                'clip': max(1, int(os.getenv("CLIP_WORKERS", str(MODEL_WORKERS)))),
+            },
+            model_config,
+            parse_cores(os.getenv("MODEL_WORKER_CORES", "")) or None,
+        )
+        run_model = model_pool.call
+        from transformers import ChineseCLIPProcessor
+        clip_processor = ChineseCLIPProcessor.from_pretrained(os.path.join(MODEL_DIR, CLIP_MODEL_NAME))
+    else:
+        # Imported here so that a pool front end never loads PyTorch
+        from assets.utils.inference import configure_threads
+        from assets.utils.model_runtime import ModelRuntime
+        configure_threads(int(os.getenv("TORCH_THREADS", "0")), int(os.getenv("TORCH_INTEROP_THREADS", "0")))
+        model_pool = None
+        model_runtime = ModelRuntime(**model_config)
+        clip_processor = model_runtime.clip_processor
+
+        def run_local(model, method, *args):
+            return getattr(model_runtime, method)(*args)
+        run_model = run_local
+
+TEXT_MODEL_ID = model_id(TEXT_MODEL_NAME, TEXT_MODEL_MODE)
+CLIP_MODEL_ID = model_id(CLIP_MODEL_NAME, CLIP_MODEL_MODE)
+
+# Upper bound on items accepted by the *_batch endpoints in a single request
+MAX_BATCH_SIZE = 256
+
+def get_batch(items, key):
+    if not isinstance(items, list) or not items:
+        raise ValueError(f"'{key}' must be a non-empty list")
+    if len(items) > MAX_BATCH_SIZE:
+        raise ValueError(f"Batch of {len(items)} exceeds the limit of {MAX_BATCH_SIZE}")
+    return items
+
+def request_blobs(key):
+    """Uploaded files for ``key`` as file-like objects.
+
+    Accepts multipart parts named ``key`` (spooled to disk by werkzeug rather
+    than held in memory), a raw binary body, or the legacy JSON body of
+    base64 strings.
+    """
+    if request.files:
+        return [part.stream for part in request.files.getlist(key)]
+    if not request.is_json:
+        return [io.BytesIO(request.get_data(cache=False))]
+    items = request.json[key]
+    return [decode_base64(item) for item in (items if isinstance(items, list) else [items])]
+
+def decode_base64(item):
+    try:
+        return io.BytesIO(base64.b64decode(item))
+    except (binascii.Error, TypeError):
+        # An empty stream fails to open like any other undecodable upload
+        return io.BytesIO()
+
+def request_tempfile(key, suffix):
+    """Copy the upload for ``key`` to a temporary file in blocks and return its path; the caller deletes it."""
+    with tempfile.NamedTemporaryFile(suffix=suffix, delete=False) as f:
+        if request.files:
+            shutil.copyfileobj(request.files[key].stream, f)
+        elif not request.is_json:
+            shutil.copyfileobj(request.stream, f)
+        else:
+            f.write(base64.b64decode(request.json[key]))
+        return f.name
+
+def to_json(value):
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    if isinstance(value, list):
+        return [to_json(item) for item in value]
+    return value
+
+def embedding_response(key, embeddings):
+    """JSON by default; packed float32 or .npy when the client's Accept header asks for it."""
+    mime = request.accept_mimetypes.best_match(EMBEDDING_MIMES, default=JSON_MIME)
+    if mime == JSON_MIME:
+        return jsonify({key: to_json(embeddings)})
+    body, headers = pack_embeddings(embeddings, mime)
+    return Response(body, mimetype=mime, headers=headers)
+
+def encode_texts(texts):
+    return run_model('text', 'encode_texts', texts)
+
+def encode_clip_texts(texts):
+    return run_model('clip', 'encode_clip_texts', texts)
+
+def encode_images(blobs):
+    """Embeddings for uploaded image streams; None for images that cannot be decoded."""
+    return run_model('clip', 'encode_images', [blob.read() for blob in blobs])
+
+def encode_ocr_text(text):
+    return encode_texts([text])[0].tolist()
+
+# Concurrent single-query requests are coalesced into one forward pass per model.
+# MICRO_BATCH_MAX_WAIT_MS bounds the added latency, MICRO_BATCH_MAX_SIZE the batch.
+MICRO_BATCH_MAX_WAIT = float(os.getenv("MICRO_BATCH_MAX_WAIT_MS", "5")) / 1000
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", "32"))
+text_batcher = clip_text_batcher = None
+ocr_engine = ocr_cache = ocr_jobs = query_cache = None
+
+def create_services():
+    global text_batcher, clip_text_batcher, ocr_engine, ocr_cache, ocr_jobs, query_cache
+    # With a worker pool, one batch per worker can be in flight at a time
+    text_batcher = MicroBatcher(
+        encode_texts, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT, name="embed_text",
+        concurrency=model_pool.count('text') if model_pool is not None else 1,
+    )
+    clip_text_batcher = MicroBatcher(
+        encode_clip_texts, MICRO_BATCH_MAX_SIZE, MICRO_BATCH_MAX_WAIT, name="embed_clip_text",
+        concurrency=model_pool.count('clip') if model_pool is not None else 1,
+    )
+
+    # PDFs are OCR'd page by page in a process pool; OCR_WORKERS defaults to all cores but one
+    ocr_engine = OCREngine(
+        int(os.getenv("OCR_WORKERS", "0")) or None,
+        int(os.getenv("OCR_DPI", str(OCR_DPI))),
+        int(os.getenv("OCR_MAX_PAGES", str(OCR_MAX_PAGES))),
+    )
+
+    # OCR text per (content digest, page, language, engine); OCR_CACHE_MB bounds the file
+    ocr_cache = OCRCache(
+        os.getenv("OCR_CACHE_FILE", "ocr_cache.sqlite"), int(os.getenv("OCR_CACHE_MB", "512")) * 1024 * 1024
+    )
+
+    # Asynchronous OCR jobs; finished jobs stay available for OCR_JOB_TTL seconds
+    ocr_jobs = OCRJobManager(int(os.getenv("OCR_JOB_TTL", "600")))
+
+    # Shared cache of query embeddings keyed by (endpoint, model, normalized text)
+    query_cache = QueryCache(
+        int(os.getenv("QUERY_CACHE_SIZE", "4096")), float(os.getenv("QUERY_CACHE_TTL", "3600"))
+    )
+
+def cached_pdf_pages(pdf_path, pages, digest=None):
+    """Yield (page, text) for ``pages`` in order, running OCR only for pages not in the cache."""
+    digest = digest or file_digest(pdf_path)
+    keys = {page: OCRCache.key(digest, page, ocr_engine.lang, ocr_engine.engine_id) for page in pages}
+    texts = {page: ocr_cache.get_text(key) for page, key in keys.items()}
+    ocr = ocr_engine.pages(pdf_path, [page for page in pages if texts[page] is None])
+    try:
+        for page in pages:
+            if texts[page] is None:
+                _, texts[page] = next(ocr)
+                ocr_cache.put_text(keys[page], texts[page])
+            yield page, texts[page]
+    finally:
+        ocr.close()
+
+def cached_image_text(data, digest=None):
+    key = OCRCache.key(digest or bytes_digest(data), 0, ocr_engine.lang, ocr_engine.engine_id)
+    text = ocr_cache.get_text(key)
+    if text is None:
+        text = ocr_engine.image(data)
+        ocr_cache.put_text(key, text)
+    return text
+
+def parse_pages(requested, total_pages):
+    """Page numbers from a ``1,4,7`` query parameter, or every page when it is absent."""
+    if not requested:
+        return list(range(1, total_pages + 1))
+    return sorted({int(n) for n in requested.split(',') if 0 < int(n) <= total_pages})
+
+# Only short texts go through the query cache; anything longer is a document, not a search query
+QUERY_CACHE_MAX_CHARS = 512
+
+def cached_query_embedding(endpoint, model_name, batcher, text):
+    if len(text) > QUERY_CACHE_MAX_CHARS:
+        return batcher.submit(text)
+    # Normalized for the key only: the model sees the text as sent, full-width characters and all
+    key = (endpoint, model_name, normalize_query(text))
+    return query_cache.get_or_compute(key, lambda: batcher.submit(text))
 
 @app.route('/embed_text', methods=['POST'])
 def embed_text():
@@ -24,8 +235,8 @@ def embed_text():
     try:
         data = request.json
         text = data['text']
-        embedding = text_model.encode(text).tolist()
-        return jsonify({'embedding': embedding})
+        embedding = cached_query_embedding('embed_text', TEXT_MODEL_NAME, text_batcher, text)
+        return embedding_response('embedding', embedding)
     except Exception as e:
         logging.error(f"Embed Text Error: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -34,12 +245,10 @@ def embed_text():
 def embed_image():
     logging.info("Received embed_image request")
     try:
-        data = request.json
-        image_data = base64.b64decode(data['image'])
-        image = Image.open(io.BytesIO(image_data))
-        inputs = clip_processor(images=image, return_tensors="pt")
-        embedding = clip_model.get_image_features(**inputs).detach().numpy().tolist()
-        return jsonify({'embedding': embedding})
+        embedding = encode_images(request_blobs('image')[:1])
+        if embedding[0] is None:
+            raise ValueError("Cannot identify image file")
+        return embedding_response('embedding', embedding)
     except Exception as e:
         logging.error(f"Embed Image Error: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -50,33 +259,75 @@ def embed_clip_text():
     try:
         data = request.json
         text = data['text']
-        inputs = clip_processor(text=[text], return_tensors="pt", padding=True)
-        embedding = clip_model.get_text_features(**inputs).detach().numpy().tolist()
-        return jsonify({'embedding': embedding})
+        embedding = [cached_query_embedding('embed_clip_text', CLIP_MODEL_NAME, clip_text_batcher, text)]
+        return embedding_response('embedding', embedding)
     except Exception as e:
         logging.error(f"Embed Clip Text Error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/embed_text_batch', methods=['POST'])
+def embed_text_batch():
+    logging.info("Received embed_text_batch request")
+    try:
+        texts = get_batch(request.json['texts'], 'texts')
+        embeddings = encode_texts(texts)
+        return embedding_response('embeddings', embeddings)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Embed Text Batch Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/embed_image_batch', methods=['POST'])
+def embed_image_batch():
+    logging.info("Received embed_image_batch request")
+    try:
+        blobs = get_batch(request_blobs('images'), 'images')
+        # Undecodable images get a null embedding instead of failing the whole batch
+        embeddings = encode_images(blobs)
+        return embedding_response('embeddings', embeddings)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Embed Image Batch Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/embed_clip_text_batch', methods=['POST'])
+def embed_clip_text_batch():
+    logging.info("Received embed_clip_text_batch request")
+    try:
+        texts = get_batch(request.json['texts'], 'texts')
+        embeddings = encode_clip_texts(texts)
+        return embedding_response('embeddings', embeddings)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Embed Clip Text Batch Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
 @app.route('/extract_pdf_with_ocr', methods=['POST'])
 def extract_pdf_with_ocr():
     logging.info("Received extract_pdf_with_ocr request")
     try:
-        data = request.json
-        pdf_data = base64.b64decode(data['pdf'])  # Expecting base64-encoded PDF
-        pdf_file = io.BytesIO(pdf_data)
-
-        # Convert PDF to images
-        images = convert_from_bytes(pdf_file.read())
-
-        # Perform OCR on each image
-        ocr_text = ""
-        for img in images:
-            text = pytesseract.image_to_string(img, lang='chi_sim+eng')
-            ocr_text += text + "\n"
+        # ?pages=1,4,7 limits OCR to those pages, e.g. the ones without a text layer
+        requested = request.args.get('pages')
+        pdf_path = request_tempfile('pdf', '.pdf')  # Raw, multipart or base64-in-JSON PDF
+        try:
+            total_pages = ocr_engine.page_count(pdf_path)
+            pages = parse_pages(requested, total_pages)
+            truncated = len(pages) > ocr_engine.max_pages
+            page_texts = list(cached_pdf_pages(pdf_path, pages[:ocr_engine.max_pages]))
+        finally:
+            os.remove(pdf_path)
+        ocr_text = "".join(text + "\n" for _, text in page_texts)
 
         # Optionally, you can embed the text here or return it for summarization
-        embedding = text_model.encode(ocr_text).tolist()
-        return jsonify({'text': ocr_text, 'embedding': embedding})
+        embedding = encode_ocr_text(ocr_text)
+        return jsonify({
+            'text': ocr_text, 'embedding': embedding,
+            'pages': total_pages, 'truncated': truncated,
+            'page_texts': [{'page': page, 'text': text} for page, text in page_texts],
+        })
     except Exception as e:
         logging.error(f"Extract PDF with OCR Error: {str(e)}")
         return jsonify({'error': str(e)}), 500
@@ -85,19 +336,269 @@ def extract_pdf_with_ocr():
 def extract_image_ocr():
     logging.info("Received extract_image_ocr request")
     try:
-        data = request.json
-        image_data = base64.b64decode(data['image'])  # Expecting base64-encoded image
-        image = Image.open(io.BytesIO(image_data))
+        data = request_blobs('image')[0].read()  # Raw, multipart or base64-in-JSON image
 
-        # Perform OCR on the image
-        ocr_text = pytesseract.image_to_string(image, lang='chi_sim+eng')
+        # Perform OCR on the image unless the same content was recognized before
+        ocr_text = cached_image_text(data)
 
         # Optionally, embed the text
-        embedding = text_model.encode(ocr_text if ocr_text.strip() else "No text detected").tolist()
+        embedding = encode_ocr_text(ocr_text if ocr_text.strip() else "No text detected")
         return jsonify({'text': ocr_text, 'embedding': embedding})
     except Exception as e:
         logging.error(f"Extract Image OCR Error: {str(e)}")
         return jsonify({'error': str(e)}), 500
 
+@app.route('/ocr/jobs', methods=['POST'])
+def submit_ocr_job():
+    """Start OCR of an uploaded PDF (optionally ?pages=1,4,7) or image; returns a job id at once."""
+    logging.info("Received submit_ocr_job request")
+    try:
+        path = request_tempfile('file', '')
+        try:
+            with open(path, 'rb') as f:
+                is_pdf = f.read(5) == b'%PDF-'
+            digest = file_digest(path)
+            if is_pdf:
+                total_pages = ocr_engine.page_count(path)
+                pages = parse_pages(request.args.get('pages'), total_pages)[:ocr_engine.max_pages]
+                run = lambda: cached_pdf_pages(path, pages, digest)
+            else:
+                total_pages, pages = 1, [0]
+                def run():
+                    with open(path, 'rb') as f:
+                        yield 0, cached_image_text(f.read(), digest)
+            key = (digest, tuple(pages), ocr_engine.lang, ocr_engine.engine_id)
+            job, created = ocr_jobs.submit(key, pages, run, cleanup=lambda: os.remove(path))
+        except Exception:
+            os.remove(path)
+            raise
+        if not created:
+            os.remove(path)
+        return jsonify({
+            'job_id': job.id, 'status': job.status, 'pages': pages,
+            'total_pages': total_pages, 'deduplicated': not created,
+        }), 202
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Submit OCR Job Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/ocr/jobs/<job_id>', methods=['GET'])
+def get_ocr_job(job_id):
+    """Pages finished after the first ``since``; ``wait`` long-polls up to that many seconds for one."""
+    job = ocr_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    since = int(request.args.get('since', 0))
+    wait = min(float(request.args.get('wait', 0)), 60)
+    return jsonify(job.snapshot(since, wait))
+
+@app.route('/ocr/jobs/<job_id>/stream', methods=['GET'])
+def stream_ocr_job(job_id):
+    """Newline-delimited JSON: one {"page", "text"} line per page in order, then a {"status"} line."""
+    job = ocr_jobs.get(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+
+    def generate():
+        since = 0
+        while True:
+            results, status = job.wait(since, timeout=30)
+            for page, text in results:
+                yield json.dumps({'page': page, 'text': text}, ensure_ascii=False) + "\n"
+            since += len(results)
+            if status == 'running' and not results:
+                yield "\n"  # Keep-alive, so clients' read timeouts only fire on a dead server
+            elif status != 'running' and not results:
+                yield json.dumps({'status': status, 'error': job.error}) + "\n"
+                return
+
+    return Response(generate(), mimetype='application/x-ndjson')
+
+@app.route('/ocr/jobs/<job_id>', methods=['DELETE'])
+def cancel_ocr_job(job_id):
+    job = ocr_jobs.cancel(job_id)
+    if job is None:
+        return jsonify({'error': 'Unknown job'}), 404
+    return jsonify({'job_id': job.id, 'status': job.status, 'cancelled': job.cancelled.is_set()})
+
+def models_info():
+    # Clients key their embedding caches on these names and pre-shrink images to clip_image
+    image_processor = clip_processor.image_processor
+    return {
+        'text': TEXT_MODEL_ID,
+        'clip': CLIP_MODEL_ID,
+        'clip_image': {
+            'size': dict(image_processor.size),
+            'resample': int(getattr(image_processor, 'resample', Image.BICUBIC)),
+        },
+        # Clients key their local OCR caches on these
+        'ocr': {'lang': ocr_engine.lang, 'engine': ocr_engine.engine_id},
+    }
+
+@app.route('/models', methods=['GET'])
+def models():
+    return jsonify(models_info())
+
+@app.route('/search', methods=['POST'])
+def search():
+    logging.info("Received search request")
+    if index_service is None:
+        return jsonify({'error': 'This server has no index (set SERVER_INDEX_DIR)'}), 404
+    try:
+        data = request.json
+        query = data['query']
+        modality = data.get('modality', 'all')
+        if modality not in ('all', 'text', 'images'):
+            raise ValueError("'modality' must be 'all', 'text' or 'images'")
+        filters = data.get('filters')
+        search_filter(filters)  # Unknown filters are the client's error (400), not the search's
+        options = {'filters': filters}
+        if data.get('top_k') is not None:
+            options['top_k'] = max(1, min(int(data['top_k']), MAX_SEARCH_RESULTS))
+        if data.get('min_score') is not None:
+            options['min_score'] = float(data['min_score'])
+    except (KeyError, TypeError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        result = {'query': query}
+        if modality in ('all', 'text'):
+            result['text'] = index_service.search_text(query, **options)
+        if modality in ('all', 'images'):
+            result['images'] = index_service.search_images(query, **options)
+        for key in ('text', 'images'):
+            if key in result:
+                result[key] = [{'path': path, 'score': float(score)} for path, score in result[key]]
+        return jsonify(result)
+    except Exception as e:
+        logging.error(f"Search Error: {str(e)}")
+        return jsonify({'error': str(e)}), 500
+
+@app.route('/index/status', methods=['GET'])
+def index_status():
+    if index_service is None:
+        return jsonify({'error': 'This server has no index (set SERVER_INDEX_DIR)'}), 404
+    return jsonify({
+        **index_service.stats(),
+        'document_dir': index_service.settings.document_dir,
+        'image_dir': index_service.settings.image_dir,
+        'indexing': index_service.indexing_in_progress,
+        **index_updates,
+    })
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    return jsonify({
+        'micro_batching': {
+            'embed_text': text_batcher.stats(),
+            'embed_clip_text': clip_text_batcher.stats(),
+        },
+        'query_cache': query_cache.stats(),
+        'ocr_cache': ocr_cache.stats(),
+        'ocr_jobs': ocr_jobs.stats(),
+        'inference': inference_stats(),
+        'model_pool': model_pool.stats() if model_pool is not None else None,
+    })
+
+def inference_stats():
+    stats = {'text_mode': TEXT_MODEL_MODE, 'clip_mode': CLIP_MODEL_MODE}
+    if model_pool is not None:
+        # Threads are per worker: one per core in its share (see model_pool)
+        stats['drift'] = dict(model_pool.drift)
+    else:
+        import torch
+        stats['threads'] = torch.get_num_threads()
+        stats['interop_threads'] = torch.get_num_interop_threads()
+        stats['drift'] = model_runtime.drift
+    return stats
+
+@app.route('/health', methods=['GET'])
+def health():
+    # 503 until every model has a loaded worker, e.g. while a crashed worker restarts
+    if model_pool is not None and not model_pool.healthy():
+        return jsonify({'status': 'degraded', 'model_pool': model_pool.stats()}), 503
+    return jsonify({'status': 'ok'})
+
+class ServerIndexClient(LocalEmbeddingClient):
+    """Embedding client for the server-owned index: the models, batchers and OCR of this process."""
+
+    def __init__(self):
+        super().__init__(MODEL_DIR, TEXT_MODEL_MODE, CLIP_MODEL_MODE)
+        self.ocr_engine = ocr_engine
+
+    def __reduce__(self):
+        # Extraction worker processes only OCR scanned PDFs; they get a plain LocalEmbeddingClient
+        # that does it in-process without loading any model, through this server's OCR cache
+        return LocalEmbeddingClient, (
+            MODEL_DIR, TEXT_MODEL_MODE, CLIP_MODEL_MODE,
+            ocr_cache.path, ocr_cache.max_bytes // (1024 * 1024), ocr_engine.dpi,
+        )
+
+    @property
+    def api_url(self):
+        return "server"
+
+    def encode(self, endpoint, items):
+        return run_model(*ENDPOINTS[endpoint], items)
+
+    def embed_query(self, endpoint, text):
+        # Search queries share the micro-batchers and query cache with /embed_text and /embed_clip_text
+        if endpoint == 'embed_text':
+            return cached_query_embedding('embed_text', TEXT_MODEL_NAME, text_batcher, text)
+        if endpoint == 'embed_clip_text':
+            return cached_query_embedding('embed_clip_text', CLIP_MODEL_NAME, clip_text_batcher, text)
+        return super().embed_query(endpoint, text)
+
+    def models(self):
+        return models_info()
+
+    def ocr_pdf_pages(self, path, pages):
+        return dict(cached_pdf_pages(path, pages[:ocr_engine.max_pages]))
+
+    def ocr_image(self, data):
+        return cached_image_text(data)
+
+# SERVER_INDEX_DIR lets this server own a file index and answer /search and /index/status, so
+# desktops in thin-client mode need neither a copy of the index nor their own embedding passes.
+# The directory has the desktop app's data layout (file_index/, caches, optional config.json),
+# e.g. one built with cli.py. SERVER_DOCUMENT_DIR / SERVER_IMAGE_DIR (or the config's
+# document_dir / image_dir) are kept indexed continuously; without them the index is served as is.
+SERVER_INDEX_DIR = os.getenv("SERVER_INDEX_DIR", "")
+# Upper bound on top_k for /search
+MAX_SEARCH_RESULTS = 100
+index_service = None
+index_updates = {'last_scan': None, 'stale': None, 'errors': None}
+
+def record_index_update(indexer):
+    index_updates.update(last_scan=time.time(), stale=indexer.stale, errors=indexer.errors)
+
+def open_server_index():
+    global index_service
+    index_config = read_config(os.path.join(SERVER_INDEX_DIR, "config.json"))
+    index_config['document_dir'] = os.getenv("SERVER_DOCUMENT_DIR", index_config['document_dir'])
+    index_config['image_dir'] = os.getenv("SERVER_IMAGE_DIR", index_config['image_dir'])
+    os.makedirs(SERVER_INDEX_DIR, exist_ok=True)
+    server_index_client = ServerIndexClient()
+    index_service = IndexService(
+        types.SimpleNamespace(**index_config), lambda: server_index_client, *data_files(SERVER_INDEX_DIR),
+        on_update=record_index_update,
+    )
+    if index_config['document_dir'] or index_config['image_dir']:
+        index_service.start_continuous_indexing()
+
+def setup():
+    """Load the models and start the batchers, OCR and (with SERVER_INDEX_DIR) the server-owned index.
+
+    Not run on import: OCR and extraction worker processes started with spawn
+    (Windows, macOS) import this module again, and must not load the models or
+    index the shared directory a second time.
+    """
+    load_models()
+    create_services()
+    if SERVER_INDEX_DIR:
+        open_server_index()
+
 if __name__ == "__main__":
-    app.run(host='0.0.0.0', port=5000)
\ No newline at end of file
+    setup()
+    app.run(host='0.0.0.0', port=int(os.getenv("API_PORT", "5000")), threaded=True)
\ No newline at end of file
@@ -5,6 +5,7 @@ from assets.ui.main_app import MainApp
 import pystray
 from PIL import Image
 import threading
+import multiprocessing
 
 def create_tray_icon(app):
     icon_path = os.path.join(os.path.dirname(__file__), "myicon.ico")
@@ -17,6 +18,8 @@ def create_tray_icon(app):
     return icon
 
 if __name__ == "__main__":
+    # Required for the indexer's extraction process pool in frozen (PyInstaller) builds
+    multiprocessing.freeze_support()
     if getattr(sys, 'frozen', False):
         os.chdir(os.path.dirname(sys.executable))
     else:
@@ -1,6 +1,5 @@
 import queue
 import threading
-import requests
 import json
 import customtkinter as ctk
 from tkinter import filedialog, messagebox
@@ -119,10 +118,6 @@ class ChatFrame(ctk.CTkFrame):
 
     def get_response(self, prompt):
         model = self.master.chat_model.get()
-        headers = {"Content-Type": "application/json"}
-        if self.master.chat_api_key:
-            headers["Authorization"] = f"Bearer {self.master.chat_api_key}"
-
         if self.mode_var.get() == "RAG模式" and self.uploaded_docs:
             doc_text = "\n\n".join(self.uploaded_docs)
             full_query = f"基于以下文档:\n{doc_text}\n\n{prompt}"
@@ -132,7 +127,7 @@ class ChatFrame(ctk.CTkFrame):
         data = get_chat_payload(model, full_query)
 
         try:
-            response = requests.post(self.master.chat_api_url, headers=headers, json=data, stream=True, timeout=10)
+            response = self.master.chat_client().post(json=data, stream=True)
             response.raise_for_status()
             self.queue.put(("assistant_prefix", "助手: "))
 
@@ -9,6 +9,17 @@ from .chat_frame import ChatFrame
 from .setup_wizard import SetupWizard
 from .settings import SettingsWindow
 from pathlib import Path
+from assets.utils.file_utils import DEFAULT_EXCLUDES
+from assets.utils.app_config import DEFAULT_CONFIG, default_data_dir, data_files, make_embedding_client
+from assets.utils.api_client import ApiClient
+
+# (connect, read) timeout for the chat API; the read timeout bounds the wait for the next streamed chunk
+CHAT_TIMEOUT = (5, 120)
+# Settings each embedding backend is built from (see app_config.make_embedding_client)
+BACKEND_SETTINGS = {
+    "http": ("api_url", "api_key", "api_max_connections"),
+    "local": ("local_model_dir", "local_text_mode", "local_clip_mode"),
+}
 
 local_path = str(Path(__file__).parent.resolve())
 
@@ -53,13 +64,12 @@ class MainApp(ctk.CTk):
             self.translations = default_translations
 
         # Set up appdata directory
-        appdata = os.getenv('APPDATA')
-        self.appdata_path = os.path.join(appdata, "FileFinder")
+        self.appdata_path = default_data_dir()
         if not os.path.exists(self.appdata_path):
             os.makedirs(self.appdata_path)
 
         self.config_file = os.path.join(self.appdata_path, "config.json")
-        self.index_file = os.path.join(self.appdata_path, "file_index.json")
+        self.index_file, self.embedding_cache_file, self.ocr_cache_file = data_files(self.appdata_path)
 
         # Window setup
         self.title("工一文件查找器和聊天助手")
@@ -82,6 +92,22 @@ class MainApp(ctk.CTk):
         self.chat_api_key = ""
         self.document_dir = ""
         self.image_dir = ""
+        self.index_dtype = "float32"
+        self.extract_workers = 0
+        self.embed_workers = 2
+        self.scan_excludes = list(DEFAULT_EXCLUDES)
+        self.scan_workers = 4
+        self.embedding_cache_mb = 1024
+        self.ocr_cache_mb = 256
+        self.ann_min_rows = 20000
+        self.shrink_images = True
+        self.api_max_connections = 8
+        self.embedding_backend = "http"
+        self.local_model_dir = ""
+        self.local_text_mode = "float32"
+        self.local_clip_mode = "float32"
+        self.search_mode = "local"
+        self._clients = {}
 
         if not os.path.exists(self.config_file):
             self.show_setup_wizard()
@@ -118,17 +144,7 @@ class MainApp(ctk.CTk):
         self.initialize_ui()
 
     def load_config(self):
-        default_config = {
-            "api_url": "http://localhost:5000",
-            "api_key": "",
-            "chat_api_url": "http://10.20.1.213/v1/chat-messages",
-            "chat_api_key": "",
-            "document_dir": "",
-            "image_dir": "",
-            "language": "ZH",
-            "chat_model": "Regular",
-            "dark_mode": True
-        }
+        default_config = dict(DEFAULT_CONFIG)
 
         if not os.path.exists(self.config_file):
             self.config = default_config
@@ -151,6 +167,21 @@ class MainApp(ctk.CTk):
         self.current_language.set(self.config["language"])
         self.chat_model.set(self.config.get("chat_model", "Regular"))
         self.dark_mode.set(self.config["dark_mode"])
+        self.index_dtype = self.config["index_dtype"]
+        self.extract_workers = self.config["extract_workers"]
+        self.embed_workers = self.config["embed_workers"]
+        self.scan_excludes = self.config["scan_excludes"]
+        self.scan_workers = self.config["scan_workers"]
+        self.embedding_cache_mb = self.config["embedding_cache_mb"]
+        self.ocr_cache_mb = self.config["ocr_cache_mb"]
+        self.ann_min_rows = self.config["ann_min_rows"]
+        self.shrink_images = self.config["shrink_images"]
+        self.api_max_connections = self.config["api_max_connections"]
+        self.embedding_backend = self.config["embedding_backend"]
+        self.local_model_dir = self.config["local_model_dir"]
+        self.local_text_mode = self.config["local_text_mode"]
+        self.local_clip_mode = self.config["local_clip_mode"]
+        self.search_mode = self.config["search_mode"]
 
     def save_config(self):
         self.config = {
@@ -162,7 +193,22 @@ class MainApp(ctk.CTk):
             "image_dir": self.image_dir,
             "language": self.current_language.get(),
             "chat_model": self.chat_model.get(),
-            "dark_mode": self.dark_mode.get()
+            "dark_mode": self.dark_mode.get(),
+            "index_dtype": self.index_dtype,
+            "extract_workers": self.extract_workers,
+            "embed_workers": self.embed_workers,
+            "scan_excludes": self.scan_excludes,
+            "scan_workers": self.scan_workers,
+            "embedding_cache_mb": self.embedding_cache_mb,
+            "ocr_cache_mb": self.ocr_cache_mb,
+            "ann_min_rows": self.ann_min_rows,
+            "shrink_images": self.shrink_images,
+            "api_max_connections": self.api_max_connections,
+            "embedding_backend": self.embedding_backend,
+            "local_model_dir": self.local_model_dir,
+            "local_text_mode": self.local_text_mode,
+            "local_clip_mode": self.local_clip_mode,
+            "search_mode": self.search_mode
         }
         try:
             with open(self.config_file, "w", encoding='utf-8') as f:
@@ -170,6 +216,47 @@ class MainApp(ctk.CTk):
         except Exception as e:
             raise Exception(f"保存配置失败: {str(e)}")
 
+    def embedding_client(self):
+        """Shared embedding client; rebuilt when its settings change.
+
+        With the "local" backend the models run in this process and no server
+        is needed; otherwise this is server_client().
+        """
+        if self.embedding_backend == "local":
+            return self.backend_client("local")
+        return self.server_client()
+
+    def server_client(self):
+        """Shared client for the embedding server(s), also used for server-side search.
+
+        ``api_url`` may list several servers separated by commas; calls are
+        then balanced across them.
+        """
+        return self.backend_client("http")
+
+    def backend_client(self, backend):
+        # Built by make_embedding_client, which only imports the backend in use (the local
+        # one pulls in PyTorch and the OCR tools)
+        config = {key: getattr(self, key) for key in BACKEND_SETTINGS[backend]}
+        settings = tuple(config.values())
+        cached = self._clients.get(backend)
+        if cached is None or cached[0] != settings:
+            if cached is not None and backend == "local":
+                cached[1].close()
+            client = make_embedding_client({**config, "embedding_backend": backend})
+            cached = self._clients[backend] = (settings, client)
+        return cached[1]
+
+    def chat_client(self):
+        return self.shared_client(ApiClient, self.chat_api_url, self.chat_api_key, timeouts={"": CHAT_TIMEOUT})
+
+    def shared_client(self, cls, url, key, **kwargs):
+        settings = (url, key, self.api_max_connections)
+        cached = self._clients.get(cls)
+        if cached is None or cached[0] != settings:
+            cached = self._clients[cls] = (settings, cls(url, key, max_concurrency=self.api_max_connections, **kwargs))
+        return cached[1]
+
     def initialize_ui(self):
         ctk.set_appearance_mode("dark" if self.dark_mode.get() else "light")
         ctk.set_default_color_theme("blue")
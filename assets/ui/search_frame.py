@@ -1,16 +1,10 @@
 import os
-import json
 import threading
-import base64
-import requests
-import numpy as np
 from tkinter import filedialog, messagebox
 from customtkinter import CTkImage
-from sklearn.metrics.pairwise import cosine_similarity
 from PIL import Image
 from .summary_window import SummaryWindow
-from assets.utils.file_utils import extract_text_content, scan_files
-import time
+from assets.utils.index_service import IndexService, RemoteIndexService
 import customtkinter as ctk
 
 class SearchFrame(ctk.CTkFrame):
@@ -18,11 +12,17 @@ class SearchFrame(ctk.CTkFrame):
         super().__init__(master)
         self.master = master
         self.index_file = index_file
-        self.indexing_in_progress = False
-        self.stop_indexing = threading.Event()
-        self.load_index()
+        if master.search_mode == "server":
+            # Thin client: the embedding server owns the index and answers the searches
+            self.service = RemoteIndexService(master, master.server_client, master.ocr_cache_file)
+        else:
+            self.service = IndexService(
+                master, master.embedding_client, index_file, master.embedding_cache_file, master.ocr_cache_file,
+                on_update=self.on_index_updated
+            )
+        self.ocr_cache = self.service.ocr_cache
         self.create_widgets()
-        self.start_continuous_indexing()
+        self.service.start_continuous_indexing()
 
     def create_widgets(self):
         self.notebook = ctk.CTkTabview(self)
@@ -49,6 +49,8 @@ class SearchFrame(ctk.CTkFrame):
             self.search_frame, text=self.master.get_translation("index_folder"), command=self.select_folders_to_index, fg_color="#1f6aa8", hover_color="#14487f"
         )
         self.index_btn.pack(side="left", padx=5)
+        if isinstance(self.service, RemoteIndexService):
+            self.index_btn.configure(state="disabled")
 
         self.status_frame = ctk.CTkFrame(self)
         self.status_frame.pack(side="bottom", fill="x")
@@ -63,32 +65,9 @@ class SearchFrame(ctk.CTkFrame):
         self.search_entry.configure(placeholder_text=self.master.get_translation("search_placeholder"))
         self.index_btn.configure(text=self.master.get_translation("index_folder"))
         self.search_btn.configure(text=self.master.get_translation("search_button"))
-        if not self.indexing_in_progress:
+        if not self.service.indexing_in_progress:
             self.status_var.set(self.master.get_translation("status_ready"))
 
-    def load_index(self):
-        default_index = {"text": {}, "images": {}}
-        self.index_data = default_index
-        if not os.path.exists(self.index_file):
-
-            self.save_index()
-        else:
-            try:
-                with open(self.index_file, "r", encoding="utf-8") as f:
-                    self.index_data = json.load(f)
-
-            except json.JSONDecodeError:
-
-                self.index_data = default_index
-            except Exception as e:
-
-                self.index_data = default_index
-
-    def save_index(self):
-        with open(self.index_file, "w", encoding="utf-8") as f:
-            json.dump(self.index_data, f, indent=4)
-
-
     def select_folders_to_index(self):
         folders = []
         while True:
@@ -103,96 +82,15 @@ class SearchFrame(ctk.CTkFrame):
             threading.Thread(target=self.index_selected_folders, args=(folders,), daemon=True).start()
 
     def index_selected_folders(self, folders):
-        headers = {"Authorization": f"Bearer {self.master.api_key}"} if self.master.api_key else {}
-        text_extensions = {"docx", "xlsx", "pptx", "pdf", "txt"}
-        image_extensions = {"jpg", "jpeg", "png", "gif", "bmp"}
-
-        for folder in folders:
-            text_files = scan_files(folder, text_extensions)
-            image_files = scan_files(folder, image_extensions)
-
-            for file in text_files:
-                current_mtime = os.path.getmtime(file)
-                if file not in self.index_data["text"] or self.index_data["text"][file]["mtime"] != current_mtime:
-                    content = extract_text_content(file)
-                    if content:
-                        response = requests.post(
-                            f"{self.master.api_url}/embed_text", json={"text": content}, headers=headers
-                        )
-                        if response.status_code == 200:
-                            self.index_data["text"][file] = {
-                                "embedding": response.json()["embedding"], "mtime": current_mtime
-                            }
-
-            for file in image_files:
-                current_mtime = os.path.getmtime(file)
-                if file not in self.index_data["images"] or self.index_data["images"][file]["mtime"] != current_mtime:
-                    with open(file, "rb") as img_file:
-                        encoded = base64.b64encode(img_file.read()).decode("utf-8")
-                    response = requests.post(
-                        f"{self.master.api_url}/embed_image", json={"image": encoded}, headers=headers
-                    )
-                    if response.status_code == 200:
-                        self.index_data["images"][file] = {
-                            "embedding": response.json()["embedding"], "mtime": current_mtime
-                        }
-
-        self.save_index()
+        self.service.index_folders(folders)
         self.progress_bar.stop()
         self.status_var.set(self.master.get_translation("status_ready"))
 
-    def start_continuous_indexing(self):
-        threading.Thread(target=self.continuous_indexing, daemon=True).start()
-
-    def continuous_indexing(self):
-        while not self.stop_indexing.is_set():
-            if not self.indexing_in_progress:
-                self.indexing_in_progress = True
-                self.update_index()
-                self.indexing_in_progress = False
-            time.sleep(60)
-
     def stop_continuous_indexing(self):
-        self.stop_indexing.set()
-
-    def update_index(self):
-        text_files = scan_files(self.master.document_dir, {"docx", "xlsx", "pptx", "pdf", "txt"})
-        image_files = scan_files(self.master.image_dir, {"jpg", "jpeg", "png", "gif", "bmp"})
-        headers = {"Authorization": f"Bearer {self.master.api_key}"} if self.master.api_key else {}
-
-        for file in text_files:
-            current_mtime = os.path.getmtime(file)
-            if file not in self.index_data["text"] or self.index_data["text"][file]["mtime"] != current_mtime:
-                content = extract_text_content(file)
-                if content:
-                    response = requests.post(
-                        f"{self.master.api_url}/embed_text", json={"text": content}, headers=headers
-                    )
-                    if response.status_code == 200:
-                        self.index_data["text"][file] = {
-                            "embedding": response.json()["embedding"], "mtime": current_mtime
-                        }
-
-        for file in image_files:
-            current_mtime = os.path.getmtime(file)
-            if file not in self.index_data["images"] or self.index_data["images"][file]["mtime"] != current_mtime:
-                with open(file, "rb") as img_file:
-                    encoded = base64.b64encode(img_file.read()).decode("utf-8")
-                response = requests.post(
-                    f"{self.master.api_url}/embed_image", json={"image": encoded}, headers=headers
-                )
-                if response.status_code == 200:
-                    self.index_data["images"][file] = {
-                        "embedding": response.json()["embedding"], "mtime": current_mtime
-                    }
+        self.service.stop_continuous_indexing()
 
-        for key in ["text", "images"]:
-            existing = text_files if key == "text" else image_files
-            for path in list(self.index_data[key].keys()):
-                if path not in existing:
-                    del self.index_data[key][path]
-
-        self.save_index()
+    def on_index_updated(self, indexer):
+        # Runs on the indexing thread
         if self.winfo_exists():
             self.after(0, self.progress_bar.stop)
             self.after(0, lambda: self.status_var.set(self.master.get_translation("status_ready")))
@@ -208,41 +106,10 @@ class SearchFrame(ctk.CTkFrame):
         threading.Thread(target=self.run_search, args=(query,), daemon=True).start()
 
     def run_search(self, query):
-        text_results = self.search_text(query)
-        image_results = self.search_images(query)
+        text_results = self.service.search_text(query)
+        image_results = self.service.search_images(query)
         self.after(0, lambda: self.display_results(text_results, image_results))
 
-    def search_text(self, query):
-        headers = {"Authorization": f"Bearer {self.master.api_key}"} if self.master.api_key else {}
-        response = requests.post(
-            f"{self.master.api_url}/embed_text", json={"text": query}, headers=headers
-        )
-        if response.status_code != 200:
-            raise Exception(f"Embedding error: {response.text}")
-        query_embed = np.array(response.json()["embedding"])
-        scores = []
-        for path, data in self.index_data["text"].items():
-            similarity = cosine_similarity([query_embed], [np.array(data["embedding"])])[0][0]
-            if similarity >= 0.2:
-                scores.append((path, similarity))
-        return sorted(scores, key=lambda x: x[1], reverse=True)[:10]
-
-    def search_images(self, query):
-        headers = {"Authorization": f"Bearer {self.master.api_key}"} if self.master.api_key else {}
-        response = requests.post(
-            f"{self.master.api_url}/embed_clip_text", json={"text": query}, headers=headers
-        )
-        if response.status_code != 200:
-            raise Exception(f"Embedding error: {response.text}")
-        query_embed = np.array(response.json()["embedding"]).reshape(1, -1)
-        scores = []
-        for path, data in self.index_data["images"].items():
-            img_embed = np.array(data["embedding"]).reshape(1, -1)
-            score = cosine_similarity(query_embed, img_embed)[0][0]
-            if score >= 0.4:
-                scores.append((path, score))
-        return sorted(scores, key=lambda x: x[1], reverse=True)[:5]
-
     def display_results(self, text_results, image_results):
         for path, score in text_results:
             frame = ctk.CTkFrame(self.text_scroll)
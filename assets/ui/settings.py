@@ -9,7 +9,7 @@ class SettingsWindow(ctk.CTkToplevel):
         super().__init__(master)
         self.master = master
         self.title(self.master.get_translation("settings"))
-        self.geometry("400x700")
+        self.geometry("400x880")
         self.resizable(False, True)
         icon_path = os.path.join(self.master.base_path, 'img', 'logo.ico')
         try:
@@ -30,9 +30,20 @@ class SettingsWindow(ctk.CTkToplevel):
         )
         self.chat_model_option.pack(pady=5)
 
+        # "local" runs the embedding models inside the app instead of calling the embedding API
+        ctk.CTkLabel(self, text="嵌入后端:").pack(pady=5)
+        self.backend_var = ctk.StringVar(value=self.master.embedding_backend)
+        ctk.CTkOptionMenu(self, values=["http", "local"], variable=self.backend_var).pack(pady=5)
+
+        # "server" searches the index owned by the embedding server; applies after a restart
+        ctk.CTkLabel(self, text="搜索模式 (重启后生效):").pack(pady=5)
+        self.search_mode_var = ctk.StringVar(value=self.master.search_mode)
+        ctk.CTkOptionMenu(self, values=["local", "server"], variable=self.search_mode_var).pack(pady=5)
+
         fields = [
             ("嵌入API URL", "api_url"),
             ("嵌入API Key", "api_key"),
+            ("本地模型目录", "local_model_dir"),
             ("聊天API URL", "chat_api_url"),
             ("聊天API Key", "chat_api_key")
         ]
@@ -100,6 +111,8 @@ class SettingsWindow(ctk.CTkToplevel):
     def save_settings(self):
         for key, entry in self.entries.items():
             setattr(self.master, key, entry.get().strip())
+        self.master.embedding_backend = self.backend_var.get()
+        self.master.search_mode = self.search_mode_var.get()
         try:
             self.master.save_config()
             self.master.update_texts()
@@ -1,13 +1,15 @@
 import queue
 import threading
-import requests
 import json
 from customtkinter import CTkTextbox
-from assets.utils.file_utils import extract_text_content
+from assets.utils.file_utils import extract_text_content, iter_pdf_pages
+from assets.utils.ocr_client import OCRClient
 from assets.utils.ai_utils import get_chat_payload, parse_streaming_response
 import customtkinter as ctk
 import os
-import base64
+
+# Characters of page text per summary section, so a long PDF is summarized while later pages are still being OCR'd
+SECTION_CHARS = 6000
 
 class SummaryWindow(ctk.CTkToplevel):
     def __init__(self, master, file_path, use_ocr=False):
@@ -18,6 +20,9 @@ class SummaryWindow(ctk.CTkToplevel):
         self.title(f"{'OCR ' if use_ocr else ''}摘要: {os.path.basename(file_path)}")
         self.geometry("600x400")
         self.queue = queue.Queue()
+        self.ocr = OCRClient(master.master.embedding_client(), cache=master.ocr_cache)
+        self.closed = threading.Event()
+        self.protocol("WM_DELETE_WINDOW", self.close)
 
         self.text_widget = CTkTextbox(self, wrap="word", height=300)
         self.text_widget.pack(padx=10, pady=10, fill="both", expand=True)
@@ -25,73 +30,95 @@ class SummaryWindow(ctk.CTkToplevel):
         self.text_widget.tag_config("error", foreground="#FF5555")
         self.text_widget.configure(state="disabled")
 
-        self.generate_summary()
+        threading.Thread(target=self.generate_summary, daemon=True).start()
         self.after(100, self.process_queue)
 
+    def close(self):
+        # Stops the summary thread, which cancels any OCR job still running on the server
+        self.closed.set()
+        self.destroy()
+
     def generate_summary(self):
         content = ""
         if self.use_ocr:
             content = self.extract_ocr_from_image()
+        elif self.file_path.lower().endswith(".pdf"):
+            self.summarize_pdf()
+            return
         else:
             content = extract_text_content(self.file_path)
             if not content or content.strip() == "":
                 content = ""
-            if self.file_path.lower().endswith(".pdf"):
-                ocr_content = self.extract_ocr_from_pdf()
-                content += "\n" + ocr_content if ocr_content else ""
 
         if not content.strip():
             self.queue.put(("error", "错误: 无法从文件中提取内容。"))
             return
 
-        prompt = f"总结以下内容:\n\n{content}"
-        threading.Thread(target=self.stream_summary, args=(prompt,), daemon=True).start()
+        self.stream_summary(f"总结以下内容:\n\n{content}")
+
+    def summarize_pdf(self):
+        """Summarize a PDF section by section as its pages arrive.
+
+        Pages with a text layer are available at once; the others are OCR'd by
+        a server job and streamed in page order, so the first sections are
+        summarized while later pages are still being recognized. A PDF that
+        fits in one section gets a single summary, as before.
+        """
+        section, first, last, summarized = [], None, None, False
+        pages = iter_pdf_pages(self.file_path, self.ocr_pdf_pages)
+        try:
+            for page, text in pages:
+                if self.closed.is_set():
+                    return
+                if not text.strip():
+                    continue
+                first, last = first or page, page
+                section.append(text)
+                if sum(len(part) for part in section) >= SECTION_CHARS:
+                    content = "\n".join(section)
+                    self.stream_summary(f"总结以下内容:\n\n{content}", f"第{first}-{last}页摘要: ")
+                    section, first, summarized = [], None, True
+        except Exception as e:
+            # Corrupt or encrypted PDFs fail while the pages are read
+            print(f"Error reading {self.file_path}: {str(e)}")
+            self.queue.put(("error", "错误: 无法从文件中提取内容。"))
+            return
+        finally:
+            pages.close()
+
+        if section:
+            prefix = f"第{first}-{last}页摘要: " if summarized else "摘要: "
+            content = "\n".join(section)
+            self.stream_summary(f"总结以下内容:\n\n{content}", prefix)
+        elif not summarized:
+            self.queue.put(("error", "错误: 无法从文件中提取内容。"))
 
     def extract_ocr_from_image(self):
         try:
-            with open(self.file_path, "rb") as img_file:
-                encoded_image = base64.b64encode(img_file.read()).decode("utf-8")
-            headers = {"Authorization": f"Bearer {self.master.master.api_key}", "Content-Type": "application/json"}
-            data = {"image": encoded_image}
-            response = requests.post(
-                f"{self.master.master.api_url}/extract_image_ocr", headers=headers, json=data, timeout=10
-            )
-            response.raise_for_status()
-            text = response.json().get("text", "")
+            text = self.ocr.image_text(self.file_path)
             return text if text.strip() else "图像中未检测到文本。"
         except Exception as e:
             self.queue.put(("error", f"OCR提取错误: {str(e)}"))
             return ""
 
-    def extract_ocr_from_pdf(self):
+    def ocr_pdf_pages(self, path, pages):
         try:
-            with open(self.file_path, "rb") as pdf_file:
-                encoded_pdf = base64.b64encode(pdf_file.read()).decode("utf-8")
-            headers = {"Authorization": f"Bearer {self.master.master.api_key}", "Content-Type": "application/json"}
-            data = {"pdf": encoded_pdf}
-            response = requests.post(
-                f"{self.master.master.api_url}/extract_pdf_with_ocr", headers=headers, json=data, timeout=10
-            )
-            response.raise_for_status()
-            return response.json().get("text", "")
+            yield from self.ocr.pdf_pages_stream(path, pages)
         except Exception as e:
             self.queue.put(("error", f"OCR提取错误: {str(e)}"))
-            return ""
 
-    def stream_summary(self, prompt):
+    def stream_summary(self, prompt, prefix="摘要: "):
         model = self.master.master.chat_model.get()
-        headers = {"Content-Type": "application/json"}
-        if self.master.master.chat_api_key:
-            headers["Authorization"] = f"Bearer {self.master.master.chat_api_key}"
-
         data = get_chat_payload(model, prompt)
 
         try:
-            response = requests.post(self.master.master.chat_api_url, headers=headers, json=data, stream=True, timeout=10)
+            response = self.master.master.chat_client().post(json=data, stream=True)
             response.raise_for_status()
-            self.queue.put(("assistant_prefix", "摘要: "))
+            self.queue.put(("assistant_prefix", prefix))
 
             for chunk in parse_streaming_response(model, response):
+                if self.closed.is_set():
+                    break
                 self.queue.put(("chunk", chunk))
         except Exception as e:
             self.queue.put(("error", f"聊天API错误: {str(e)}"))
@@ -101,6 +128,8 @@ class SummaryWindow(ctk.CTkToplevel):
             item_type, content = self.queue.get_nowait()
             self.text_widget.configure(state="normal")
             if item_type == "assistant_prefix":
+                if self.text_widget.get("1.0", "end-1c"):
+                    self.text_widget.insert("end", "\n\n")
                 self.text_widget.insert("end", content, "assistant")
             elif item_type == "chunk":
                 self.text_widget.insert("end", content, "assistant")
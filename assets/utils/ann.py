@@ -0,0 +1,129 @@
+import numpy as np
+
+# Rows assigned to centroids per matrix product while training, to bound temporary memory
+ASSIGN_BLOCK = 65536
+
+
+def kmeans(vectors, k, iterations=10, seed=0):
+    """Spherical k-means on normalized rows; returns (k, dim) normalized centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = np.argmax(vectors @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, vectors)
+        empty = np.bincount(labels, minlength=k) == 0
+        sums[empty] = vectors[rng.choice(len(vectors), int(empty.sum()), replace=False)]
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        norms[norms == 0] = 1.0
+        centroids = sums / norms
+    return centroids.astype(np.float32)
+
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour search over a VectorIndex matrix.
+
+    Rows are assigned to the nearest of ``nlist`` k-means centroids; a query
+    only scores the rows of its ``nprobe`` closest lists. The assignment array
+    stays parallel to the VectorIndex rows, so inserts and swap-deletes are
+    O(1) and no inverted list has to be rebuilt.
+
+    Below ``min_rows`` (or before training) VectorIndex keeps using exact
+    search. After each training, ``nprobe`` is raised until recall@10 against
+    exact search reaches ``target_recall`` on a sample of stored vectors.
+    """
+
+    def __init__(self, nlist=None, nprobe=8, min_rows=20000, target_recall=0.95, seed=0):
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.min_rows = min_rows
+        self.target_recall = target_recall
+        self.seed = seed
+        self.centroids = None
+        self.assign = np.empty(0, dtype=np.int32)
+        self.trained_rows = 0
+        self.recall = None
+
+    @property
+    def trained(self):
+        return self.centroids is not None
+
+    def active(self, rows):
+        return self.trained and rows >= self.min_rows
+
+    def needs_training(self, rows):
+        # Retrain once the index has grown well past the data the centroids were fitted on
+        return rows >= self.min_rows and (not self.trained or rows > 4 * self.trained_rows)
+
+    def assign_rows(self, vectors):
+        labels = np.empty(len(vectors), dtype=np.int32)
+        for start in range(0, len(vectors), ASSIGN_BLOCK):
+            block = np.asarray(vectors[start:start + ASSIGN_BLOCK], dtype=np.float32)
+            labels[start:start + len(block)] = np.argmax(block @ self.centroids.T, axis=1)
+        return labels
+
+    def train(self, matrix):
+        rows = len(matrix)
+        nlist = self.nlist or int(np.clip(np.sqrt(rows), 16, 4096))
+        rng = np.random.default_rng(self.seed)
+        sample = np.asarray(matrix[np.sort(rng.choice(rows, min(rows, 64 * nlist), replace=False))], dtype=np.float32)
+        self.centroids = kmeans(sample, min(nlist, len(sample)), seed=self.seed)
+        self.assign = self.assign_rows(matrix)
+        self.trained_rows = rows
+
+    def restore(self, centroids, assign, nprobe, trained_rows):
+        self.centroids = np.asarray(centroids, dtype=np.float32)
+        self.assign = np.array(assign, dtype=np.int32)
+        self.nprobe = int(nprobe)
+        self.trained_rows = int(trained_rows)
+
+    def append(self, start, vectors):
+        if not self.trained:
+            return
+        end = start + len(vectors)
+        if end > len(self.assign):
+            grown = np.empty(max(end, 2 * len(self.assign)), dtype=np.int32)
+            grown[:start] = self.assign[:start]
+            self.assign = grown
+        self.assign[start:end] = self.assign_rows(vectors)
+
+    def move(self, dst, src):
+        if self.trained:
+            self.assign[dst] = self.assign[src]
+
+    def candidates(self, query, rows, nprobe=None):
+        """Row numbers in the ``nprobe`` lists closest to ``query``."""
+        nprobe = min(nprobe or self.nprobe, len(self.centroids))
+        affinity = self.centroids @ query
+        probes = np.argpartition(-affinity, nprobe - 1)[:nprobe]
+        probed = np.zeros(len(self.centroids), dtype=bool)
+        probed[probes] = True
+        return np.flatnonzero(probed[self.assign[:rows]])
+
+    def state(self, rows):
+        return {
+            "centroids": self.centroids,
+            "assign": self.assign[:rows],
+            "nprobe": self.nprobe,
+            "trained_rows": self.trained_rows,
+        }
+
+
+def recall_at_k(matrix, search, exact, k=10, samples=100, seed=0):
+    """Mean fraction of the exact top-``k`` rows that ``search`` also returns.
+
+    Queries are stored rows, so the check needs no external data. ``search``
+    and ``exact`` take a query vector and return row numbers.
+    """
+    rows = len(matrix)
+    if not rows:
+        return 1.0
+    rng = np.random.default_rng(seed)
+    hits = 0
+    total = 0
+    for row in rng.choice(rows, min(samples, rows), replace=False):
+        query = np.asarray(matrix[row], dtype=np.float32)
+        truth = set(exact(query, k))
+        hits += len(truth & set(search(query, k)))
+        total += len(truth)
+    return hits / total if total else 1.0
@@ -0,0 +1,293 @@
+import json
+import time
+import random
+import threading
+from collections import deque
+import requests
+from requests.adapters import HTTPAdapter
+from .wire import BINARY_ACCEPT, multipart_files, unpack_embeddings
+
+# (connect, read) timeouts in seconds per endpoint; batch and OCR calls may run for minutes
+DEFAULT_TIMEOUT = (5, 60)
+EMBEDDING_TIMEOUTS = {
+    "models": (5, 10),
+    "metrics": (5, 10),
+    "embed_text": (5, 30),
+    "embed_clip_text": (5, 30),
+    "embed_image": (5, 60),
+    "embed_text_batch": (5, 300),
+    "embed_clip_text_batch": (5, 300),
+    "embed_image_batch": (5, 300),
+    "extract_image_ocr": (5, 300),
+    "extract_pdf_with_ocr": (5, 600),
+    "ocr/jobs": (5, 60),
+    "search": (5, 30),
+    "index/status": (5, 10),
+}
+# Status codes worth retrying: the server (or a proxy in front of it) failed, not the request
+RETRY_STATUSES = {500, 502, 503, 504}
+# Latency samples kept per endpoint for the percentiles in stats()
+LATENCY_SAMPLES = 256
+
+
+def body_positions(kwargs):
+    """(file, offset) for every file-like body of a request (``data=`` and ``files=`` parts), to rewind between attempts."""
+    parts = kwargs.get("files") or ()
+    if isinstance(parts, dict):
+        parts = parts.items()
+    bodies = [kwargs.get("data")] + [value[1] if isinstance(value, tuple) else value for _, value in parts]
+    return [(body, body.tell()) for body in bodies if hasattr(body, "seek")]
+
+
+def rewind(positions):
+    for body, offset in positions:
+        body.seek(offset)
+
+
+class ApiClient:
+    """Pooled keep-alive HTTP client for one server.
+
+    All calls share one ``requests.Session`` whose connection pool holds
+    ``max_concurrency`` connections, and at most that many requests are in
+    flight at once; callers beyond that wait for a slot. Connection errors and
+    5xx answers are retried up to ``retries`` times with jittered exponential
+    backoff. Each endpoint has its own timeout, and per-call latency is
+    recorded per endpoint (see stats()).
+
+    Instances can be pickled into worker processes; the copy opens its own
+    connections, so hand a worker its client once (e.g. through the pool's
+    initializer) rather than with every task.
+    """
+
+    def __init__(self, base_url, api_key="", max_concurrency=8, retries=3, backoff=0.5, timeouts=None):
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeouts = timeouts or {}
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=max_concurrency, max_retries=0)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        if api_key:
+            self.session.headers["Authorization"] = f"Bearer {api_key}"
+        self.slots = threading.BoundedSemaphore(max_concurrency)
+        self.stats_lock = threading.Lock()
+        self.latency = {}
+
+    def __getstate__(self):
+        return {
+            "base_url": self.base_url, "api_key": self.api_key, "max_concurrency": self.max_concurrency,
+            "retries": self.retries, "backoff": self.backoff, "timeouts": self.timeouts,
+        }
+
+    def __setstate__(self, state):
+        ApiClient.__init__(self, **state)
+
+    def url(self, endpoint):
+        return f"{self.base_url}/{endpoint}" if endpoint else self.base_url
+
+    def timeout(self, endpoint):
+        # Job URLs like ocr/jobs/<id>/stream fall back to their collection's timeout
+        while endpoint:
+            if endpoint in self.timeouts:
+                return self.timeouts[endpoint]
+            endpoint = endpoint.rpartition("/")[0]
+        return self.timeouts.get("", DEFAULT_TIMEOUT)
+
+    def request(self, method, endpoint="", retry=True, timeout=None, **kwargs):
+        """Send a request and return the response once it is not retryable.
+
+        Streamed responses (``stream=True``) give their slot back as soon as
+        the headers arrive. File-like bodies are rewound for retries.
+        """
+        positions = body_positions(kwargs)
+        timeout = timeout or self.timeout(endpoint)
+        attempts = 1 + (self.retries if retry else 0)
+        for attempt in range(attempts):
+            rewind(positions)
+            began = time.perf_counter()
+            try:
+                with self.slots:
+                    response = self.session.request(method, self.url(endpoint), timeout=timeout, **kwargs)
+            except requests.ConnectionError:
+                self.record(endpoint, began, failed=True)
+                if attempt + 1 == attempts:
+                    raise
+                self.wait(attempt)
+                continue
+            failed = response.status_code in RETRY_STATUSES
+            self.record(endpoint, began, failed)
+            if not failed or attempt + 1 == attempts:
+                return response
+            self.wait(attempt, response.headers.get("Retry-After"))
+            response.close()
+
+    def wait(self, attempt, retry_after=None):
+        delay = self.backoff * 2 ** attempt
+        if retry_after and retry_after.isdigit():
+            delay = max(delay, min(float(retry_after), 30))
+        # Full jitter, so clients that failed together don't retry together
+        time.sleep(random.uniform(0, delay))
+
+    def get(self, endpoint="", **kwargs):
+        return self.request("GET", endpoint, **kwargs)
+
+    def post(self, endpoint="", **kwargs):
+        return self.request("POST", endpoint, **kwargs)
+
+    def delete(self, endpoint="", **kwargs):
+        return self.request("DELETE", endpoint, **kwargs)
+
+    def record(self, endpoint, began, failed=False):
+        elapsed = (time.perf_counter() - began) * 1000
+        key = endpoint.split("/")[0] if endpoint.startswith("ocr/") else endpoint
+        with self.stats_lock:
+            entry = self.latency.setdefault(key, {"calls": 0, "failures": 0, "samples": deque(maxlen=LATENCY_SAMPLES)})
+            entry["calls"] += 1
+            entry["failures"] += failed
+            entry["samples"].append(elapsed)
+
+    def stats(self):
+        """Calls, failed attempts and latency percentiles (ms) per endpoint."""
+        with self.stats_lock:
+            result = {}
+            for endpoint, entry in self.latency.items():
+                samples = sorted(entry["samples"])
+                result[endpoint or "/"] = {
+                    "calls": entry["calls"],
+                    "failures": entry["failures"],
+                    "p50_ms": samples[len(samples) // 2] if samples else None,
+                    "p95_ms": samples[int(len(samples) * 0.95)] if samples else None,
+                    "max_ms": samples[-1] if samples else None,
+                }
+            return result
+
+    def close(self):
+        self.session.close()
+
+
+class EmbeddingCalls:
+    """Embedding and OCR endpoint helpers on top of a client's ``post``.
+
+    LocalEmbeddingClient (local_backend.py) provides the same calls without a server.
+    """
+
+    def embed_batch(self, endpoint, key, items):
+        """Embeddings for a batch of texts or image bytes; image bytes go up as multipart parts."""
+        if items and isinstance(items[0], bytes):
+            body = {"files": multipart_files(key, items)}
+        else:
+            body = {"json": {key: items}}
+        response = self.post(endpoint, headers={"Accept": BINARY_ACCEPT}, **body)
+        if response.status_code != 200:
+            raise requests.HTTPError(f"{endpoint} failed: {response.text}", response=response)
+        return unpack_embeddings(response, "embeddings")
+
+    def embed_query(self, endpoint, text):
+        response = self.post(endpoint, json={"text": text}, headers={"Accept": BINARY_ACCEPT})
+        if response.status_code != 200:
+            raise requests.HTTPError(f"Embedding error: {response.text}", response=response)
+        return unpack_embeddings(response, "embedding", batch=False)
+
+    def search(self, query, modality="all", top_k=None, min_score=None, filters=None):
+        """The server's /search answer: {"text": [...], "images": [...]} lists of {"path", "score"}."""
+        body = {"query": query, "modality": modality, "top_k": top_k, "min_score": min_score, "filters": filters}
+        response = self.post("search", json={key: value for key, value in body.items() if value is not None})
+        if response.status_code != 200:
+            raise requests.HTTPError(f"Search failed: {response.text}", response=response)
+        return response.json()
+
+    def index_status(self):
+        response = self.get("index/status")
+        response.raise_for_status()
+        return response.json()
+
+    def ocr_pdf_pages(self, path, pages):
+        """OCR the 1-based ``pages`` of a local PDF on the server; returns {page: text}.
+
+        The file is streamed as the raw request body.
+        """
+        with open(path, "rb") as pdf_file:
+            response = self.post(
+                "extract_pdf_with_ocr",
+                params={"pages": ",".join(str(page) for page in pages)},
+                headers={"Content-Type": "application/octet-stream"},
+                data=pdf_file,
+            )
+        response.raise_for_status()
+        return {item["page"]: item["text"] for item in response.json()["page_texts"]}
+
+    def ocr_pages_stream(self, path, pages):
+        """Submit an OCR job for ``pages`` and yield (page, text) from its result stream.
+
+        Closing the generator before the last page cancels the job.
+        """
+        client = self.node()  # The job lives on the server it was submitted to
+        with open(path, "rb") as upload:
+            response = client.post(
+                "ocr/jobs",
+                params={"pages": ",".join(str(page) for page in pages)},
+                headers={"Content-Type": "application/octet-stream"},
+                data=upload,
+            )
+        if response.status_code == 404:
+            # Server without the job API: fall back to one blocking request
+            yield from sorted(client.ocr_pdf_pages(path, pages).items())
+            return
+        response.raise_for_status()
+        job = f"ocr/jobs/{response.json()['job_id']}"
+        remaining = len(pages)
+        finished = False
+        try:
+            # The read timeout only has to outlast the server's keep-alive lines, not the whole job
+            with client.get(f"{job}/stream", stream=True) as stream:
+                stream.raise_for_status()
+                for line in stream.iter_lines():
+                    if not line:
+                        continue
+                    item = json.loads(line)
+                    if "page" in item:
+                        remaining -= 1
+                        # Nothing left to cancel once the last page is in, even if the caller stops here
+                        finished = remaining == 0
+                        yield item["page"], item["text"]
+                    elif item.get("status") == "failed":
+                        raise RuntimeError(item.get("error") or "OCR job failed")
+            finished = True
+        finally:
+            if not finished:
+                try:
+                    client.delete(job, retry=False)
+                except requests.RequestException:
+                    pass
+
+    def ocr_image(self, data):
+        """Text of encoded image bytes."""
+        response = self.post("extract_image_ocr", headers={"Content-Type": "application/octet-stream"}, data=data)
+        response.raise_for_status()
+        return response.json().get("text", "")
+
+
+class EmbeddingClient(EmbeddingCalls, ApiClient):
+    """ApiClient for the embedding server (api_server.py)."""
+
+    def __init__(self, api_url, api_key="", max_concurrency=8, retries=3, backoff=0.5, timeouts=None):
+        super().__init__(api_url, api_key, max_concurrency, retries, backoff, {**EMBEDDING_TIMEOUTS, **(timeouts or {})})
+
+    @property
+    def api_url(self):
+        return self.base_url
+
+    def node(self):
+        """The client to use for calls that must reach the same server (see BalancedEmbeddingClient)."""
+        return self
+
+    def models(self):
+        """The server's /models answer, or {} when it cannot be reached."""
+        try:
+            response = self.get("models")
+            return response.json() if response.status_code == 200 else {}
+        except (requests.RequestException, ValueError):
+            return {}
@@ -0,0 +1,74 @@
+import os
+import json
+from .file_utils import DEFAULT_EXCLUDES
+
+# Settings shared by the desktop app (MainApp) and the headless command line (cli.py)
+DEFAULT_CONFIG = {
+    "api_url": "http://localhost:5000",
+    "api_key": "",
+    "chat_api_url": "http://10.20.1.213/v1/chat-messages",
+    "chat_api_key": "",
+    "document_dir": "",
+    "image_dir": "",
+    "language": "ZH",
+    "chat_model": "Regular",
+    "dark_mode": True,
+    "index_dtype": "float32",
+    "extract_workers": 0,
+    "embed_workers": 2,
+    "scan_excludes": list(DEFAULT_EXCLUDES),
+    "scan_workers": 4,
+    "embedding_cache_mb": 1024,
+    "ocr_cache_mb": 256,
+    "ann_min_rows": 20000,
+    "shrink_images": True,
+    "api_max_connections": 8,
+    "embedding_backend": "http",
+    "local_model_dir": "",
+    "local_text_mode": "float32",
+    "local_clip_mode": "float32",
+    # "server": search the index the embedding server owns (/search) instead of a local copy
+    "search_mode": "local"
+}
+
+
+def default_data_dir():
+    """Directory holding config.json, the index and the caches: FILEFINDER_HOME, else %APPDATA%\\FileFinder."""
+    home = os.getenv("FILEFINDER_HOME")
+    if home:
+        return home
+    # APPDATA only exists on Windows; a headless server keeps its data under the home directory
+    return os.path.join(os.getenv("APPDATA") or os.path.expanduser("~"), "FileFinder")
+
+
+def data_files(data_dir):
+    """(index directory, embedding cache, OCR cache) paths inside ``data_dir``."""
+    # A legacy file_index.json next to the index directory is migrated on first load
+    return (
+        os.path.join(data_dir, "file_index"),
+        os.path.join(data_dir, "embedding_cache.sqlite"),
+        os.path.join(data_dir, "ocr_cache.sqlite"),
+    )
+
+
+def read_config(path):
+    """DEFAULT_CONFIG overlaid with the settings saved at ``path``; defaults alone if it is missing or unreadable."""
+    try:
+        with open(path, "r", encoding='utf-8') as f:
+            return {**DEFAULT_CONFIG, **json.load(f)}
+    except (OSError, json.JSONDecodeError):
+        return dict(DEFAULT_CONFIG)
+
+
+def make_embedding_client(config):
+    """Embedding client for ``config``: in-process, one server, or balanced over several."""
+    # Imported per backend, so commands that never embed don't pay for requests or PyTorch
+    if config["embedding_backend"] == "local":
+        from .local_backend import LocalEmbeddingClient
+        return LocalEmbeddingClient(config["local_model_dir"], config["local_text_mode"], config["local_clip_mode"])
+    from .api_client import EmbeddingClient
+    from .balancer import BalancedEmbeddingClient, parse_urls
+    urls = parse_urls(config["api_url"])
+    if len(urls) > 1:
+        return BalancedEmbeddingClient(urls, config["api_key"], max_concurrency=config["api_max_connections"])
+    return EmbeddingClient(config["api_url"], config["api_key"], max_concurrency=config["api_max_connections"])
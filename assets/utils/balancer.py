@@ -0,0 +1,197 @@
+import time
+import random
+import logging
+import threading
+import requests
+from .api_client import EmbeddingCalls, EmbeddingClient, RETRY_STATUSES, body_positions, rewind
+
+# Seconds a failed endpoint stays out before it is probed again (doubles per consecutive failure)
+COOLDOWN = 2.0
+COOLDOWN_MAX = 60.0
+
+
+def parse_urls(value):
+    """Endpoint URLs from a comma- or whitespace-separated setting."""
+    return [url.strip().rstrip("/") for url in value.replace(",", " ").split() if url.strip()]
+
+
+class Endpoint:
+    def __init__(self, client):
+        self.client = client
+        self.outstanding = 0
+        self.healthy = True
+        self.failures = 0
+        self.down_until = 0.0
+        self.removed = 0
+
+
+class BalancedEmbeddingClient(EmbeddingCalls):
+    """EmbeddingClient spreading calls over several embedding servers.
+
+    Each call goes to the healthy endpoint with the fewest requests in
+    flight. An endpoint that fails a call (connection error or 5xx) is taken
+    out of rotation and the call is retried on another one; a background
+    thread, started on the first failure, probes it again after a cooldown
+    that doubles with every consecutive failure, and re-admits it once
+    /models answers with the same models as the others. Multi-request exchanges that must stay on one
+    server (OCR jobs) use ``node()``.
+    """
+
+    def __init__(self, urls, api_key="", max_concurrency=8, retries=3, backoff=0.5, timeouts=None, probe_interval=1.0):
+        self.urls = list(urls)
+        self.api_key = api_key
+        self.max_concurrency = max_concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.timeouts = timeouts
+        self.probe_interval = probe_interval
+        # Each endpoint fails fast; retrying elsewhere is this class's job
+        self.endpoints = [
+            Endpoint(EmbeddingClient(url, api_key, max_concurrency, retries=0, timeouts=timeouts)) for url in self.urls
+        ]
+        self.lock = threading.Lock()
+        self.model_ids = None
+        self.closed = threading.Event()
+        # Started with the first failure, so copies pickled into worker processes run no thread they don't need
+        self.probe_thread = None
+
+    def __getstate__(self):
+        return {
+            "urls": self.urls, "api_key": self.api_key, "max_concurrency": self.max_concurrency,
+            "retries": self.retries, "backoff": self.backoff, "timeouts": self.timeouts,
+            "probe_interval": self.probe_interval,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def api_url(self):
+        return ",".join(self.urls)
+
+    def acquire(self, exclude=()):
+        """The least-loaded healthy endpoint not in ``exclude``, counted as busy until released."""
+        with self.lock:
+            candidates = [e for e in self.endpoints if e.healthy and e not in exclude]
+            if not candidates:
+                # Everything left is out of rotation: try the endpoint whose cooldown ends first
+                rest = [e for e in self.endpoints if e not in exclude] or self.endpoints
+                candidates = [min(rest, key=lambda e: e.down_until)]
+            fewest = min(e.outstanding for e in candidates)
+            endpoint = random.choice([e for e in candidates if e.outstanding == fewest])
+            endpoint.outstanding += 1
+            return endpoint
+
+    def release(self, endpoint, ok):
+        with self.lock:
+            endpoint.outstanding -= 1
+            if ok:
+                endpoint.failures = 0
+                return
+            endpoint.failures += 1
+            endpoint.down_until = time.monotonic() + min(COOLDOWN_MAX, COOLDOWN * 2 ** (endpoint.failures - 1))
+            if endpoint.healthy:
+                endpoint.healthy = False
+                endpoint.removed += 1
+                logging.warning(f"Embedding endpoint {endpoint.client.api_url} taken out of rotation")
+            if self.probe_thread is None and not self.closed.is_set():
+                self.probe_thread = threading.Thread(target=self._probe_loop, name="endpoint-probe", daemon=True)
+                self.probe_thread.start()
+
+    def request(self, method, endpoint="", retry=True, **kwargs):
+        """Send a request to the least-loaded endpoint, retrying failures on the others."""
+        attempts = 1 + (self.retries if retry else 0)
+        # A failed attempt may have read an uploaded file to the end; every node starts from the caller's offset
+        positions = body_positions(kwargs)
+        tried = []
+        for attempt in range(attempts):
+            rewind(positions)
+            node = self.acquire(tried)
+            try:
+                response = node.client.request(method, endpoint, retry=False, **kwargs)
+            except requests.ConnectionError:
+                self.release(node, ok=False)
+                if attempt + 1 == attempts:
+                    raise
+                self.wait(node, tried, attempt)
+                continue
+            failed = response.status_code in RETRY_STATUSES
+            self.release(node, ok=not failed)
+            if not failed or attempt + 1 == attempts:
+                return response
+            response.close()
+            self.wait(node, tried, attempt)
+
+    def wait(self, node, tried, attempt):
+        tried.append(node)
+        if len(tried) >= len(self.endpoints):
+            # Every endpoint failed once: back off (with jitter) before going round again
+            time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+            tried.clear()
+
+    def get(self, endpoint="", **kwargs):
+        return self.request("GET", endpoint, **kwargs)
+
+    def post(self, endpoint="", **kwargs):
+        return self.request("POST", endpoint, **kwargs)
+
+    def delete(self, endpoint="", **kwargs):
+        return self.request("DELETE", endpoint, **kwargs)
+
+    def node(self):
+        """The EmbeddingClient of the least-loaded healthy endpoint, for calls that must share a server."""
+        endpoint = self.acquire()
+        self.release(endpoint, ok=True)
+        return endpoint.client
+
+    def models(self):
+        for _ in range(len(self.endpoints)):
+            endpoint = self.acquire()
+            models = endpoint.client.models()
+            self.release(endpoint, ok=bool(models))
+            if models:
+                self.model_ids = self.model_ids or self.identity(models)
+                return models
+        return {}
+
+    @staticmethod
+    def identity(models):
+        return models.get("text"), models.get("clip")
+
+    def _probe_loop(self):
+        while not self.closed.wait(self.probe_interval):
+            now = time.monotonic()
+            with self.lock:
+                due = [e for e in self.endpoints if not e.healthy and e.down_until <= now]
+            for endpoint in due:
+                self.probe(endpoint)
+
+    def probe(self, endpoint):
+        models = endpoint.client.models()
+        with self.lock:
+            if models and (self.model_ids is None or self.identity(models) == self.model_ids):
+                endpoint.healthy = True
+                endpoint.failures = 0
+                logging.info(f"Embedding endpoint {endpoint.client.api_url} back in rotation")
+                return
+            endpoint.failures += 1
+            endpoint.down_until = time.monotonic() + min(COOLDOWN_MAX, COOLDOWN * 2 ** (endpoint.failures - 1))
+        if models:
+            logging.warning(f"Embedding endpoint {endpoint.client.api_url} serves different models; not re-admitted")
+
+    def stats(self):
+        with self.lock:
+            return {
+                endpoint.client.api_url: {
+                    "healthy": endpoint.healthy,
+                    "outstanding": endpoint.outstanding,
+                    "removed": endpoint.removed,
+                    "latency": endpoint.client.stats(),
+                }
+                for endpoint in self.endpoints
+            }
+
+    def close(self):
+        self.closed.set()
+        for endpoint in self.endpoints:
+            endpoint.client.close()
@@ -0,0 +1,43 @@
+CHUNK_SIZE = 160
+CHUNK_OVERLAP = 32
+MAX_CHUNKS = 256
+
+# Stored in the index manifest; bump when chunking changes so old text embeddings are rebuilt
+CHUNKING_ID = f"chunks:{CHUNK_SIZE}:{CHUNK_OVERLAP}:{MAX_CHUNKS}"
+
+SENTENCE_BREAKS = "\n。！？；.!?;"
+
+
+def find_break(text, start, end):
+    """Return the best cut position in text[start:end], preferring sentence then word boundaries."""
+    floor = start + (end - start) // 2
+    for breaks in (SENTENCE_BREAKS, " \t，,、"):
+        cut = max(text.rfind(ch, floor, end) for ch in breaks)
+        if cut != -1:
+            return cut + 1
+    return end
+
+
+def chunk_text(text, size=CHUNK_SIZE, overlap=CHUNK_OVERLAP, max_chunks=MAX_CHUNKS):
+    """Split ``text`` into at most ``max_chunks`` overlapping passages of at most ``size`` characters.
+
+    The default size keeps a Chinese passage roughly within the 128-token
+    window of paraphrase-multilingual-MiniLM, so the model no longer silently
+    drops everything after the first paragraph.
+    """
+    text = text.strip()
+    if not text:
+        return []
+    chunks = []
+    start = 0
+    while start < len(text) and len(chunks) < max_chunks:
+        end = min(start + size, len(text))
+        if end < len(text):
+            end = find_break(text, start, end)
+        chunk = text[start:end].strip()
+        if chunk:
+            chunks.append(chunk)
+        if end >= len(text):
+            break
+        start = max(end - overlap, start + 1)
+    return chunks
@@ -0,0 +1,297 @@
+import numpy as np
+
+# Rows decoded per block while scoring, so compressed matrices are never inflated whole
+SCORE_BLOCK = 4096
+# Rows a product quantizer waits for before training its codebooks
+PQ_TRAIN_ROWS = 10000
+PQ_CENTROIDS = 256
+
+
+def kmeans_l2(vectors, k, iterations=10, seed=0):
+    """Euclidean k-means; returns (k, dim) centroids."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), k, replace=False)].copy()
+    for _ in range(iterations):
+        labels = nearest_l2(vectors, centroids)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.stack([
+            np.bincount(labels, weights=vectors[:, d], minlength=k) for d in range(vectors.shape[1])
+        ], axis=1)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+    return centroids
+
+
+def nearest_l2(vectors, centroids):
+    # argmin |x - c|^2 == argmax (x.c - |c|^2 / 2)
+    return np.argmax(vectors @ centroids.T - 0.5 * np.sum(centroids ** 2, axis=1), axis=1)
+
+
+class DenseCodec:
+    """Stores normalized rows as plain float32 or float16.
+
+    Codecs own the row storage of a VectorIndex: they grow it, move rows for
+    swap-deletes, score queries directly on the stored representation and
+    decode rows back to float32 when needed. Arrays loaded by IndexStore may be
+    read-only memory maps; they are copied the first time a row is written.
+    """
+
+    lossy = False
+
+    def __init__(self, dim, dtype="float32"):
+        self.dim = dim
+        self.dtype = np.dtype(dtype)
+        self.arrays = self.empty_arrays(0)
+        self.writable = True
+
+    @property
+    def name(self):
+        return self.dtype.name
+
+    def empty_arrays(self, capacity):
+        return {"vectors": np.empty((capacity, self.dim), dtype=self.dtype)}
+
+    @property
+    def capacity(self):
+        return len(next(iter(self.arrays.values())))
+
+    @property
+    def refinable(self):
+        return False
+
+    def reserve(self, rows, size):
+        if self.writable and size <= self.capacity:
+            return
+        grown = self.empty_arrays(max(size, 2 * self.capacity, 64) if self.writable else size)
+        for key, array in grown.items():
+            array[:rows] = self.arrays[key][:rows]
+        self.arrays = grown
+        self.writable = True
+
+    def move(self, dst, src):
+        for array in self.arrays.values():
+            array[dst] = array[src]
+
+    def write(self, start, vectors):
+        self.arrays["vectors"][start:start + len(vectors)] = vectors
+
+    def decode(self, rows):
+        return np.asarray(self.arrays["vectors"][rows], dtype=np.float32)
+
+    def score_block(self, query, rows):
+        return self.decode(rows) @ query
+
+    def scores(self, query, rows, candidates=None):
+        """Approximate cosine scores of ``query`` against the first ``rows`` rows (or ``candidates``)."""
+        total = rows if candidates is None else len(candidates)
+        scores = np.empty(total, dtype=np.float32)
+        for start in range(0, total, SCORE_BLOCK):
+            end = min(start + SCORE_BLOCK, total)
+            block = slice(start, end) if candidates is None else candidates[start:end]
+            scores[start:end] = self.score_block(query, block)
+        return scores
+
+    def refine(self, query, rows):
+        return self.scores(query, len(rows), rows)
+
+    def export(self, rows):
+        return {key: array[:rows] for key, array in self.arrays.items()}
+
+    @classmethod
+    def load(cls, name, dim, arrays):
+        codec = make_codec(name, dim)
+        codec.arrays = dict(arrays)
+        codec.writable = False
+        return codec
+
+
+class Int8Codec(DenseCodec):
+    """Scalar int8 quantization with one float32 scale per row (about 4x smaller than float32)."""
+
+    lossy = True
+
+    def __init__(self, dim):
+        super().__init__(dim, np.int8)
+
+    @property
+    def name(self):
+        return "int8"
+
+    def empty_arrays(self, capacity):
+        return {
+            "codes": np.empty((capacity, self.dim), dtype=np.int8),
+            "scales": np.empty(capacity, dtype=np.float32),
+        }
+
+    def write(self, start, vectors):
+        scales = np.abs(vectors).max(axis=1) / 127.0
+        scales[scales == 0] = 1.0
+        end = start + len(vectors)
+        self.arrays["codes"][start:end] = np.round(vectors / scales[:, None]).astype(np.int8)
+        self.arrays["scales"][start:end] = scales
+
+    def decode(self, rows):
+        return self.arrays["codes"][rows].astype(np.float32) * self.arrays["scales"][rows][..., None]
+
+    def score_block(self, query, rows):
+        return (self.arrays["codes"][rows].astype(np.float32) @ query) * self.arrays["scales"][rows]
+
+
+class PQCodec(DenseCodec):
+    """Product quantization scored with asymmetric distance computation (ADC).
+
+    Each row is split into ``subspaces`` slices and every slice is replaced by
+    the id of its nearest of 256 centroids, so a 384-dim row takes 48 bytes.
+    A query is scored by summing per-slice lookup tables, without decoding.
+
+    Until ``PQ_TRAIN_ROWS`` rows exist there is nothing to train the codebooks
+    on, so rows are held as float16 in the meantime. With ``rerank`` an int8
+    copy is kept as well and the best PQ candidates are re-scored from it.
+    """
+
+    lossy = True
+
+    def __init__(self, dim, rerank=True):
+        self.subspaces = next(m for m in (dim // 8, dim // 4, dim // 2, dim) if m and dim % m == 0)
+        self.codebooks = None
+        self.rerank = Int8Codec(dim) if rerank else None
+        self.staging = DenseCodec(dim, "float16")
+        super().__init__(dim, np.uint8)
+
+    @property
+    def name(self):
+        return "pq-rerank" if self.rerank is not None else "pq"
+
+    @property
+    def trained(self):
+        return self.codebooks is not None
+
+    @property
+    def refinable(self):
+        return self.trained and self.rerank is not None
+
+    def empty_arrays(self, capacity):
+        return {"codes": np.empty((capacity, self.subspaces), dtype=np.uint8)}
+
+    @property
+    def capacity(self):
+        return super().capacity if self.trained else self.staging.capacity
+
+    def reserve(self, rows, size):
+        if not self.trained:
+            self.staging.reserve(rows, size)
+            return
+        super().reserve(rows, size)
+        if self.rerank is not None:
+            self.rerank.reserve(rows, size)
+
+    def move(self, dst, src):
+        if not self.trained:
+            self.staging.move(dst, src)
+            return
+        super().move(dst, src)
+        if self.rerank is not None:
+            self.rerank.move(dst, src)
+
+    def split(self, vectors):
+        return vectors.reshape(len(vectors), self.subspaces, -1)
+
+    def encode(self, vectors):
+        codes = np.empty((len(vectors), self.subspaces), dtype=np.uint8)
+        for start in range(0, len(vectors), 256):
+            # All subspaces in one batched product: (m, n, dsub) @ (m, dsub, 256)
+            parts = self.split(vectors[start:start + 256]).transpose(1, 0, 2)
+            affinity = parts @ self.codebooks.transpose(0, 2, 1) - 0.5 * self.codebook_norms[:, None, :]
+            codes[start:start + 256] = np.argmax(affinity, axis=2).T
+        return codes
+
+    def train(self, rows, seed=0):
+        vectors = self.staging.decode(slice(0, rows))
+        rng = np.random.default_rng(seed)
+        sample = self.split(vectors[rng.choice(rows, min(rows, 4 * PQ_TRAIN_ROWS), replace=False)])
+        self.codebooks = np.stack([
+            kmeans_l2(sample[:, j], PQ_CENTROIDS, seed=seed) for j in range(self.subspaces)
+        ]).astype(np.float32)
+        self.codebook_norms = np.sum(self.codebooks ** 2, axis=2)
+        self.arrays = self.empty_arrays(0)
+        self.writable = True
+        capacity = max(rows, self.staging.capacity)
+        super().reserve(0, capacity)
+        if self.rerank is not None:
+            self.rerank.reserve(0, capacity)
+        self.staging = None
+        for start in range(0, rows, SCORE_BLOCK):
+            self._write_codes(start, vectors[start:start + SCORE_BLOCK])
+
+    def _write_codes(self, start, vectors):
+        self.arrays["codes"][start:start + len(vectors)] = self.encode(vectors)
+        if self.rerank is not None:
+            self.rerank.write(start, vectors)
+
+    def write(self, start, vectors):
+        if self.trained:
+            self._write_codes(start, vectors)
+            return
+        self.staging.write(start, vectors)
+        if start + len(vectors) >= PQ_TRAIN_ROWS:
+            self.train(start + len(vectors))
+
+    def decode(self, rows):
+        if not self.trained:
+            return self.staging.decode(rows)
+        codes = self.arrays["codes"][rows]
+        parts = [self.codebooks[j][codes[..., j]] for j in range(self.subspaces)]
+        return np.concatenate(parts, axis=-1)
+
+    def score_block(self, query, rows):
+        if not self.trained:
+            return self.staging.score_block(query, rows)
+        tables = np.einsum("jkd,jd->jk", self.codebooks, query.reshape(self.subspaces, -1))
+        offsets = np.arange(self.subspaces) * PQ_CENTROIDS
+        return np.take(tables.ravel(), self.arrays["codes"][rows] + offsets).sum(axis=1)
+
+    def refine(self, query, rows):
+        return self.rerank.scores(query, len(rows), rows)
+
+    def export(self, rows):
+        if not self.trained:
+            return self.staging.export(rows)
+        arrays = {"codes": self.arrays["codes"][:rows], "codebooks": self.codebooks}
+        if self.rerank is not None:
+            arrays.update({f"rerank_{key}": array for key, array in self.rerank.export(rows).items()})
+        return arrays
+
+    @classmethod
+    def load(cls, name, dim, arrays):
+        codec = make_codec(name, dim)
+        if "codebooks" not in arrays:
+            codec.staging = DenseCodec.load("float16", dim, arrays)
+            return codec
+        codec.codebooks = np.asarray(arrays["codebooks"], dtype=np.float32)
+        codec.codebook_norms = np.sum(codec.codebooks ** 2, axis=2)
+        codec.staging = None
+        codec.arrays = {"codes": arrays["codes"]}
+        codec.writable = False
+        if codec.rerank is not None:
+            codec.rerank = Int8Codec.load("int8", dim, {
+                key[len("rerank_"):]: array for key, array in arrays.items() if key.startswith("rerank_")
+            })
+        return codec
+
+
+CODECS = ("float32", "float16", "int8", "pq", "pq-rerank")
+
+
+def make_codec(name, dim):
+    if name in ("float32", "float16"):
+        return DenseCodec(dim, name)
+    if name == "int8":
+        return Int8Codec(dim)
+    if name in ("pq", "pq-rerank"):
+        return PQCodec(dim, rerank=name == "pq-rerank")
+    raise ValueError(f"Unsupported index codec: {name}")
+
+
+def load_codec(name, dim, arrays):
+    codec_cls = {"int8": Int8Codec, "pq": PQCodec, "pq-rerank": PQCodec}.get(name, DenseCodec)
+    return codec_cls.load(name, dim, arrays)
@@ -0,0 +1,134 @@
+import io
+import time
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+
+
+def file_digest(path, block_size=1 << 20):
+    """BLAKE2b digest of a file's contents, streamed in 1 MB blocks."""
+    digest = hashlib.blake2b(digest_size=20)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def bytes_digest(data):
+    return hashlib.blake2b(data, digest_size=20).hexdigest()
+
+
+class BlobCache:
+    """Persistent, size-bounded key/value cache in a single SQLite file.
+
+    Entries are evicted least-recently-used first once their total size
+    exceeds ``max_bytes``. Safe to share between threads.
+    """
+
+    def __init__(self, path, max_bytes=1024 * 1024 * 1024):
+        self.path = path
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries "
+            "(key TEXT PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, used REAL NOT NULL)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS entries_used ON entries (used)")
+        self.total = self.conn.execute("SELECT COALESCE(SUM(size), 0) FROM entries").fetchone()[0]
+
+    def get(self, key):
+        with self.lock:
+            row = self.conn.execute("SELECT value FROM entries WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.conn.execute("UPDATE entries SET used = ? WHERE key = ?", (time.time(), key))
+            self.conn.commit()
+            return row[0]
+
+    def put(self, key, value):
+        with self.lock:
+            old = self.conn.execute("SELECT size FROM entries WHERE key = ?", (key,)).fetchone()
+            self.conn.execute(
+                "INSERT OR REPLACE INTO entries (key, value, size, used) VALUES (?, ?, ?, ?)",
+                (key, value, len(value), time.time())
+            )
+            self.total += len(value) - (old[0] if old else 0)
+            if self.total > self.max_bytes:
+                self._evict()
+            self.conn.commit()
+
+    def _evict(self):
+        target = self.max_bytes * 0.9
+        while self.total > target:
+            rows = self.conn.execute("SELECT key, size FROM entries ORDER BY used LIMIT 256").fetchall()
+            if not rows:
+                self.total = 0
+                return
+            for key, size in rows:
+                self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+                self.total -= size
+                if self.total <= target:
+                    break
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+                "bytes": self.total,
+                "max_bytes": self.max_bytes,
+            }
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+
+class EmbeddingCache(BlobCache):
+    """Content-addressed embedding store: (modality, model id, file digest) -> embeddings.
+
+    Copies, moves, restores and touch-only changes hash to an existing entry,
+    so the indexer can reuse the stored embeddings instead of calling the server.
+    """
+
+    @staticmethod
+    def key(modality, model_id, digest):
+        return f"{modality}:{model_id}:{digest}"
+
+    def get_embeddings(self, key):
+        value = self.get(key)
+        return None if value is None else np.load(io.BytesIO(value))
+
+    def put_embeddings(self, key, embeddings):
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(embeddings, dtype=np.float32))
+        self.put(key, buffer.getvalue())
+
+
+class OCRCache(BlobCache):
+    """OCR text per page, keyed by file digest plus the language and engine that produced it.
+
+    Page 0 stands for a standalone image. Used by the server in front of
+    Tesseract and by the client in front of the server.
+    """
+
+    @staticmethod
+    def key(digest, page, lang, engine):
+        return f"ocr:{engine}:{lang}:{digest}:{page}"
+
+    def get_text(self, key):
+        value = self.get(key)
+        return None if value is None else bytes(value).decode("utf-8")
+
+    def put_text(self, key, text):
+        self.put(key, text.encode("utf-8"))
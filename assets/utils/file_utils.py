@@ -1,29 +1,158 @@
 import os
-from docx import Document
-from openpyxl import load_workbook
-from pptx import Presentation
-import PyPDF2
-
-def scan_files(directory, extensions):
-    return [
-        os.path.join(root, f)
-        for root, _, files in os.walk(directory)
-        for f in files
-        if f.split(".")[-1].lower() in extensions
+import fnmatch
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Directory and file names skipped by the scanner unless the caller passes its own patterns
+DEFAULT_EXCLUDES = (".git", ".svn", "node_modules", "__pycache__", "$RECYCLE.BIN", "System Volume Information", "~$*")
+
+FileStat = namedtuple("FileStat", ["mtime", "size", "inode"])
+
+# A PDF page whose text layer has fewer visible characters than this is treated as a scan
+MIN_TEXT_LAYER_CHARS = 16
+
+
+def is_excluded(entry, excludes):
+    return any(fnmatch.fnmatch(entry.name, pattern) or fnmatch.fnmatch(entry.path, pattern) for pattern in excludes)
+
+
+def scan_directory(directory, excludes):
+    """List one directory: returns ({path: FileStat}, [subdirectories])."""
+    files, subdirs = {}, []
+    try:
+        with os.scandir(directory) as entries:
+            for entry in entries:
+                if is_excluded(entry, excludes):
+                    continue
+                try:
+                    if entry.is_dir(follow_symlinks=False):
+                        subdirs.append(entry.path)
+                    elif entry.is_file():
+                        st = entry.stat()
+                        files[entry.path] = FileStat(st.st_mtime, st.st_size, st.st_ino)
+                except OSError:
+                    continue
+    except OSError as e:
+        print(f"Error scanning {directory}: {str(e)}")
+    return files, subdirs
+
+
+def scan_tree(roots, excludes=DEFAULT_EXCLUDES, workers=1):
+    """Walk every root directory once and classify files by extension in the same pass.
+
+    ``roots`` maps a category to a (directory, extensions) pair; categories may
+    share a directory or nest inside each other without the tree being walked
+    twice. Returns {category: {path: FileStat}} built from the stat results
+    os.scandir already fetched. With ``workers`` > 1 subdirectories are listed
+    on a thread pool, which hides round-trip latency on network shares.
+    """
+    result = {key: {} for key in roots}
+    directories = {os.path.normpath(d): d for d, _ in roots.values() if d and os.path.isdir(d)}
+    walk_roots = [
+        d for norm, d in directories.items()
+        if not any(norm != other and norm.startswith(os.path.join(other, "")) for other in directories)
     ]
+    targets = [(key, os.path.join(os.path.normpath(d), ""), exts) for key, (d, exts) in roots.items() if d]
+
+    def classify(files):
+        for path, st in files.items():
+            ext = path.split(".")[-1].lower()
+            norm = os.path.normpath(path)
+            for key, prefix, exts in targets:
+                if ext in exts and norm.startswith(prefix):
+                    result[key][path] = st
+
+    if workers <= 1:
+        pending = list(walk_roots)
+        while pending:
+            files, subdirs = scan_directory(pending.pop(), excludes)
+            classify(files)
+            pending.extend(subdirs)
+        return result
+
+    with ThreadPoolExecutor(workers) as executor:
+        in_flight = {executor.submit(scan_directory, d, excludes) for d in walk_roots}
+        while in_flight:
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                files, subdirs = future.result()
+                classify(files)
+                in_flight.update(executor.submit(scan_directory, d, excludes) for d in subdirs)
+    return result
+
+
+def scan_files(directory, extensions, excludes=DEFAULT_EXCLUDES):
+    return list(scan_tree({"files": (directory, extensions)}, excludes)["files"])
+
+def has_text_layer(text):
+    return sum(not ch.isspace() for ch in text) >= MIN_TEXT_LAYER_CHARS
+
+def extract_pdf_text(file_path, ocr_pages=None):
+    """Text of a PDF page by page: the embedded text layer where it has content, OCR elsewhere.
+
+    ``ocr_pages(file_path, pages)`` is called once with the 1-based numbers of
+    the image-only pages and returns {page: text}; without it those pages are
+    left empty, as before.
+    """
+    import PyPDF2
+    texts = [page.extract_text() or "" for page in PyPDF2.PdfReader(file_path).pages]
+    missing = [number for number, text in enumerate(texts, 1) if not has_text_layer(text)]
+    if missing and ocr_pages is not None:
+        try:
+            for number, text in ocr_pages(file_path, missing).items():
+                texts[number - 1] = text
+        except Exception as e:
+            print(f"Error running OCR on {file_path}: {str(e)}")
+    return "\n".join(texts)
+
+def iter_pdf_pages(file_path, ocr_stream=None):
+    """Yield (page, text) in page order, like extract_pdf_text but without waiting for all OCR.
+
+    ``ocr_stream(file_path, pages)`` yields (page, text) for the image-only
+    pages in page order as they are recognized. Text-layer pages before the
+    first scan are yielded straight away; closing this generator closes the
+    OCR stream too.
+    """
+    import PyPDF2
+    texts = [page.extract_text() or "" for page in PyPDF2.PdfReader(file_path).pages]
+    missing = {number for number, text in enumerate(texts, 1) if not has_text_layer(text)}
+    ocr = ocr_stream(file_path, sorted(missing)) if missing and ocr_stream is not None else None
+    stream = ocr
+    pending = None
+    try:
+        for number, text in enumerate(texts, 1):
+            if number in missing:
+                while stream is not None and (pending is None or pending[0] < number):
+                    try:
+                        pending = next(stream, None)
+                    except Exception as e:
+                        print(f"Error running OCR on {file_path}: {str(e)}")
+                        pending = None
+                    if pending is None:
+                        stream = None
+                if pending is not None and pending[0] == number:
+                    text = pending[1]
+            yield number, text
+    finally:
+        if ocr is not None and hasattr(ocr, "close"):
+            ocr.close()
 
-def extract_text_content(file_path):
+def extract_text_content(file_path, ocr_pages=None):
+    # The document parsers are imported on first use: together they take about half a second to
+    # import, which scanning, search and the command-line tools never need
     ext = file_path.split(".")[-1].lower()
     try:
         if ext == "docx":
+            from docx import Document
             return "\n".join(p.text for p in Document(file_path).paragraphs)
         elif ext == "xlsx":
+            from openpyxl import load_workbook
             return " ".join(str(cell) for sheet in load_workbook(file_path) for row in sheet.values for cell in row)
         elif ext == "pptx":
+            from pptx import Presentation
             return "\n".join(shape.text for slide in Presentation(file_path).slides for shape in slide.shapes if shape.has_text_frame)
         elif ext == "pdf":
-            pdf_reader = PyPDF2.PdfReader(file_path)
-            return "\n".join(page.extract_text() or "" for page in pdf_reader.pages)
+            return extract_pdf_text(file_path, ocr_pages)
         elif ext == "txt":
             with open(file_path, "r", encoding="utf-8") as f:
                 return f.read()
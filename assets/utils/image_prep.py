@@ -0,0 +1,42 @@
+import io
+from PIL import Image
+
+
+def target_size(width, height, size):
+    """Output size of the CLIP processor's resize step for a ``width`` x ``height`` image.
+
+    ``size`` is the processor's size config: either an exact ``height``/``width``
+    or a ``shortest_edge`` that keeps the aspect ratio.
+    """
+    if "height" in size and "width" in size:
+        return size["width"], size["height"]
+    short = size.get("shortest_edge")
+    if not short:
+        return None
+    if width <= height:
+        return short, int(short * height / width)
+    return int(short * width / height), short
+
+
+def shrink_image(data, size, resample=Image.BICUBIC):
+    """Downscale encoded image bytes to the model's input resolution.
+
+    JPEGs are decoded in draft mode at the smallest DCT scale that still
+    leaves twice the target resolution, so a 20 MB photo is never fully
+    decoded. The result is resized with the processor's filter to exactly
+    the size the server would resize to, so the server's own resize becomes
+    a no-op, and sent as lossless PNG. Returns ``data`` unchanged when it is
+    already small enough or cannot be decoded here.
+    """
+    try:
+        with Image.open(io.BytesIO(data)) as image:
+            target = target_size(image.width, image.height, size)
+            if target is None or (image.width <= target[0] and image.height <= target[1]):
+                return data
+            image.draft("RGB", (2 * target[0], 2 * target[1]))
+            resized = image.convert("RGB").resize(target, resample, reducing_gap=3.0)
+    except (OSError, ValueError, Image.DecompressionBombError):
+        return data
+    buffer = io.BytesIO()
+    resized.save(buffer, "PNG", compress_level=1)
+    return buffer.getvalue() if buffer.tell() < len(data) else data
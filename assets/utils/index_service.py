@@ -0,0 +1,254 @@
+import os
+import time
+import threading
+from .indexer import Indexer, TEXT_EXTENSIONS, IMAGE_EXTENSIONS
+from .index_store import IndexStore
+from .chunking import CHUNKING_ID
+from .ann import IVFIndex
+from .content_cache import EmbeddingCache, OCRCache
+from .query_cache import QueryCache, normalize_query
+from .watcher import FileWatcher, RECONCILE_INTERVAL
+from .file_utils import scan_tree
+from .balancer import parse_urls
+
+
+SEARCH_FILTERS = ("path_prefix", "extensions", "modified_after", "modified_before")
+# Query endpoint -> the models() entry identifying the model that answers it
+QUERY_MODELS = {"embed_text": "text", "embed_clip_text": "clip"}
+# Seconds the client's model identity is trusted before models() is asked again
+MODEL_ID_TTL = 60
+
+
+def search_filter(filters):
+    """``where(path, mtime)`` predicate for VectorIndex.search from a filters mapping, or None if it is empty.
+
+    ``path_prefix`` (one prefix or a list) and ``extensions`` (without dots)
+    match case-insensitively; ``modified_after`` / ``modified_before`` are
+    Unix timestamps. Raises ValueError for unknown keys.
+    """
+    if not filters:
+        return None
+    unknown = set(filters) - set(SEARCH_FILTERS)
+    if unknown:
+        raise ValueError(f"Unknown search filters: {', '.join(sorted(unknown))}")
+    prefixes = filters.get("path_prefix")
+    if isinstance(prefixes, str):
+        prefixes = [prefixes]
+    prefixes = tuple(os.path.normcase(prefix) for prefix in prefixes or ())
+    extensions = {ext.lower().lstrip(".") for ext in filters.get("extensions") or ()}
+    after = filters.get("modified_after")
+    before = filters.get("modified_before")
+
+    def where(path, mtime):
+        if prefixes and not os.path.normcase(path).startswith(prefixes):
+            return False
+        if extensions and path.rsplit(".", 1)[-1].lower() not in extensions:
+            return False
+        if after is not None and mtime < after:
+            return False
+        return before is None or mtime < before
+    return where
+
+
+class IndexService:
+    """The file index and its scan -> extract -> embed -> persist pipeline, without any UI.
+
+    ``settings`` is anything with the configuration keys as attributes (MainApp,
+    or the namespace cli.py builds from config.json) and is read live, so
+    changed directories or workers apply to the next pass. ``client()``
+    returns the current embedding client. SearchFrame drives one of these in
+    the desktop app; cli.py drives one headless.
+    """
+
+    def __init__(self, settings, client, index_file, embedding_cache_file, ocr_cache_file, on_update=None):
+        self.settings = settings
+        self.client = client
+        self.index_file = index_file
+        self.embedding_cache_file = embedding_cache_file
+        self.ocr_cache_file = ocr_cache_file
+        # Called after every full scan, e.g. to reset the GUI's progress bar
+        self.on_update = on_update
+        self.indexing_in_progress = False
+        self.stop_indexing = threading.Event()
+        self.query_cache = QueryCache(max_entries=256, ttl=3600)
+        self.query_models = None
+        self.load_index()
+
+    def load_index(self):
+        self.index_store = IndexStore(
+            self.index_file, dtype=self.settings.index_dtype, layouts={"text": CHUNKING_ID},
+            ann_factory=lambda: IVFIndex(min_rows=self.settings.ann_min_rows)
+        )
+        self.indexes = self.index_store.load()
+        self.embedding_cache = EmbeddingCache(
+            self.embedding_cache_file, self.settings.embedding_cache_mb * 1024 * 1024
+        )
+        self.ocr_cache = OCRCache(self.ocr_cache_file, self.settings.ocr_cache_mb * 1024 * 1024)
+
+    def save_index(self):
+        self.index_store.save(self.indexes)
+
+    def make_indexer(self):
+        # embed_workers is per embedding server, so extra servers get their own share of batches
+        servers = len(parse_urls(self.settings.api_url)) or 1
+        return Indexer(
+            self.indexes, self.client(),
+            extract_workers=self.settings.extract_workers, embed_workers=self.settings.embed_workers * servers,
+            scan_excludes=self.settings.scan_excludes, cache=self.embedding_cache,
+            shrink_images=self.settings.shrink_images
+        )
+
+    def scan(self, roots):
+        return scan_tree(roots, self.settings.scan_excludes, self.settings.scan_workers)
+
+    def index_roots(self):
+        return {
+            "text": (self.settings.document_dir, TEXT_EXTENSIONS),
+            "images": (self.settings.image_dir, IMAGE_EXTENSIONS),
+        }
+
+    def index_folders(self, folders):
+        """Index the documents and images under ``folders`` without dropping anything; returns the Indexer."""
+        indexer = self.make_indexer()
+        for folder in folders:
+            found = self.scan({"text": (folder, TEXT_EXTENSIONS), "images": (folder, IMAGE_EXTENSIONS)})
+            indexer.index_files(found["text"], found["images"])
+        self.save_index()
+        return indexer
+
+    def update_index(self):
+        """Bring the index in line with the configured directories, dropping files no longer there; returns the Indexer."""
+        found = self.scan(self.index_roots())
+        text_files, image_files = found["text"], found["images"]
+        indexer = self.make_indexer()
+        indexer.index_files(text_files, image_files)
+
+        self.indexes["text"].retain(text_files)
+        self.indexes["images"].retain(image_files)
+
+        self.save_index()
+        if self.on_update is not None:
+            self.on_update(indexer)
+        return indexer
+
+    def start_continuous_indexing(self):
+        threading.Thread(target=self.continuous_indexing, daemon=True).start()
+
+    def continuous_indexing(self):
+        # Filesystem events drive indexing; the full rescan only runs at startup, when the
+        # configured directories change, and every RECONCILE_INTERVAL as a safety net.
+        # Without watchdog this degrades to the old 60-second rescan.
+        watcher, roots, watching = None, None, False
+        last_scan = last_save = time.monotonic()
+        while not self.stop_indexing.is_set():
+            if roots != self.index_roots():
+                if watcher:
+                    watcher.stop()
+                roots = self.index_roots()
+                watcher = FileWatcher(roots, self.settings.scan_excludes)
+                watching = watcher.start()
+                last_scan = None
+            if not self.indexing_in_progress:
+                self.indexing_in_progress = True
+                now = time.monotonic()
+                # A failed pass or save is retried on the next round instead of ending the thread
+                try:
+                    if last_scan is None or now - last_scan >= (RECONCILE_INTERVAL if watching else 60):
+                        last_scan = now
+                        self.update_index()
+                        last_save = now
+                    else:
+                        changes = watcher.drain()
+                        if changes:
+                            self.make_indexer().apply_changes(changes, roots)
+                        if now - last_save >= 60:
+                            last_save = now
+                            self.save_index()
+                except Exception as e:
+                    print(f"Error updating index: {str(e)}")
+                finally:
+                    self.indexing_in_progress = False
+            self.stop_indexing.wait(1 if watching else 60)
+        if watcher:
+            watcher.stop()
+
+    def stop_continuous_indexing(self):
+        self.stop_indexing.set()
+        self.save_index()
+
+    def query_model_id(self, client, endpoint):
+        """Id of the model ``client`` embeds ``endpoint`` queries with, or None if it cannot tell."""
+        cached = self.query_models
+        now = time.monotonic()
+        if cached is None or cached[0] is not client or now - cached[1] > MODEL_ID_TTL:
+            cached = self.query_models = (client, now, client.models())
+        return cached[2].get(QUERY_MODELS[endpoint])
+
+    def embed_query(self, endpoint, query):
+        """Embed a search query, reusing recent results from the client-side query cache."""
+        client = self.client()
+        model = self.query_model_id(client, endpoint)
+        if not model:
+            # Without a model identity a cached embedding could come from another model
+            return client.embed_query(endpoint, query)
+        # Normalized for the key only; the query is embedded as typed
+        return self.query_cache.get_or_compute(
+            (endpoint, model, normalize_query(query)), lambda: client.embed_query(endpoint, query)
+        )
+
+    def search_text(self, query, top_k=10, min_score=0.2, filters=None):
+        """(path, score) pairs for ``query``; ``filters`` as in search_filter()."""
+        return self.indexes["text"].search(
+            self.embed_query("embed_text", query), top_k=top_k, min_score=min_score, where=search_filter(filters)
+        )
+
+    def search_images(self, query, top_k=5, min_score=0.4, filters=None):
+        return self.indexes["images"].search(
+            self.embed_query("embed_clip_text", query), top_k=top_k, min_score=min_score, where=search_filter(filters)
+        )
+
+    def stats(self):
+        """Files, rows and storage of each modality's index, and the query cache's hit rate."""
+        result = {"index": self.index_file, "dtype": self.index_store.dtype}
+        for name, index in self.indexes.items():
+            with index.lock:
+                result[name] = {
+                    "files": len(index),
+                    "rows": index.row_count,
+                    "dim": index.dim,
+                    "codec": index.codec_name,
+                }
+        result["query_cache"] = self.query_cache.stats()
+        return result
+
+
+class RemoteIndexService:
+    """Thin-client stand-in for IndexService: searches the index an embedding server owns (/search).
+
+    Nothing is indexed or stored locally except the OCR cache used by summaries.
+    """
+
+    indexing_in_progress = False
+
+    def __init__(self, settings, client, ocr_cache_file):
+        self.client = client
+        self.ocr_cache = OCRCache(ocr_cache_file, settings.ocr_cache_mb * 1024 * 1024)
+
+    def search(self, modality, query, top_k, min_score, filters):
+        result = self.client().search(query, modality, top_k, min_score, filters)
+        return [(item["path"], item["score"]) for item in result.get(modality, [])]
+
+    def search_text(self, query, top_k=10, min_score=0.2, filters=None):
+        return self.search("text", query, top_k, min_score, filters)
+
+    def search_images(self, query, top_k=5, min_score=0.4, filters=None):
+        return self.search("images", query, top_k, min_score, filters)
+
+    def start_continuous_indexing(self):
+        pass
+
+    def stop_continuous_indexing(self):
+        pass
+
+    def stats(self):
+        return self.client().index_status()
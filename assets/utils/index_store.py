@@ -0,0 +1,201 @@
+import os
+import json
+import threading
+import numpy as np
+from .codecs import CODECS, load_codec
+from .vector_index import VectorIndex
+
+FORMAT_VERSION = 1
+MODALITIES = ("text", "images")
+
+
+class IndexStore:
+    """Binary on-disk index, one directory with a few files per modality.
+
+    ``<name>.<gen>.<array>.npy``  codec arrays (``vectors`` for float32/float16, ``codes``
+                                  and ``scales`` for int8, ...), opened with mmap so they page in lazily
+    ``<name>.<gen>.mtimes.npy``   float64 modification times, parallel to the matrix rows
+    ``<name>.<gen>.sizes.npy``    int64 file sizes, parallel to the matrix rows (-1: unknown)
+    ``<name>.<gen>.paths``        UTF-8 paths separated by NUL bytes
+    ``<name>.<gen>.ivf.npz``      optional ANN centroids and row assignments
+    ``manifest.json``             format version, storage codec, per-modality row counts and generation
+
+    Every save of a modality writes a new generation and then points the
+    manifest at it, so files still memory-mapped by a loaded index are never
+    replaced (Windows refuses to); superseded generations are deleted once
+    nothing maps them any more. Manifests without a generation use the
+    unsuffixed names of earlier versions.
+
+    A legacy ``file_index.json`` next to the directory is migrated once on load.
+
+    ``layouts`` maps a modality to an identifier of how its rows were produced
+    (e.g. the text chunking settings). A modality saved under a different
+    layout is discarded on load so its files are re-embedded. A modality saved
+    with another codec is re-encoded in memory and written back on the next save.
+    """
+
+    def __init__(self, path, dtype="float32", layouts=None, ann_factory=None):
+        if dtype not in CODECS:
+            raise ValueError(f"Unsupported index dtype: {dtype}")
+        self.path = path
+        self.dtype = dtype
+        self.layouts = layouts or {}
+        self.ann_factory = ann_factory
+        self.legacy_json = path + ".json"
+        self.manifest_file = os.path.join(path, "manifest.json")
+        self._saved_versions = {}
+        self._generations = {}
+        # Saves come from the indexing thread, folder indexing and the GUI thread; one at a time,
+        # so cleanup never sees another save's files before its manifest records them
+        self._save_lock = threading.Lock()
+
+    def _file(self, name, suffix, generation=None):
+        if generation is None:
+            return os.path.join(self.path, f"{name}.{suffix}")
+        return os.path.join(self.path, f"{name}.{generation}.{suffix}")
+
+    def new_index(self):
+        index = VectorIndex(codec=self.dtype)
+        if self.ann_factory is not None:
+            index.ann = self.ann_factory()
+        return index
+
+    def load(self):
+        if not os.path.exists(self.manifest_file) and os.path.exists(self.legacy_json):
+            return self.migrate_json()
+
+        indexes = {name: self.new_index() for name in MODALITIES}
+        try:
+            with open(self.manifest_file, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return indexes
+        if manifest.get("version") != FORMAT_VERSION:
+            return indexes
+
+        for name in MODALITIES:
+            info = manifest.get("modalities", {}).get(name, {})
+            count = info.get("count", 0)
+            generation = info.get("generation")
+            self._generations[name] = generation
+            if not count or info.get("layout") != self.layouts.get(name):
+                continue
+            # Manifests written before codecs existed hold a single float "vectors" array
+            codec = info.get("codec", manifest.get("dtype", "float32"))
+            try:
+                indexes[name] = self._load_modality(
+                    name, generation, count, info["dim"], codec, info.get("arrays", ["vectors"])
+                )
+            except (OSError, KeyError, ValueError) as e:
+                print(f"Error loading {name} index: {str(e)}")
+            self._saved_versions[name] = indexes[name].version
+            indexes[name].recode(self.dtype)
+        return indexes
+
+    def _load_modality(self, name, generation, count, dim, codec, arrays):
+        vectors = load_codec(codec, dim, {
+            array: np.load(self._file(name, f"{array}.npy", generation), mmap_mode="r") for array in arrays
+        })
+        mtimes = np.load(self._file(name, "mtimes.npy", generation))
+        with open(self._file(name, "paths", generation), "rb") as f:
+            paths = f.read().decode("utf-8").split("\0")
+        if not (vectors.capacity == mtimes.shape[0] == len(paths) == count):
+            raise ValueError(f"{name} index files are out of sync")
+        # Indexes saved before sizes were kept have none; the indexer fills them in from the next scan
+        sizes_file = self._file(name, "sizes.npy", generation)
+        sizes = np.load(sizes_file).tolist() if os.path.exists(sizes_file) else None
+        if sizes is not None and len(sizes) != count:
+            raise ValueError(f"{name} index files are out of sync")
+        index = VectorIndex.from_arrays(paths, mtimes.tolist(), vectors, sizes)
+        if self.ann_factory is not None:
+            index.ann = self.ann_factory()
+            ivf_file = self._file(name, "ivf.npz", generation)
+            if os.path.exists(ivf_file):
+                with np.load(ivf_file) as state:
+                    if state["assign"].shape[0] == count:
+                        index.ann.restore(state["centroids"], state["assign"], state["nprobe"], state["trained_rows"])
+        return index
+
+    def save(self, indexes, force=False):
+        with self._save_lock:
+            self._save(indexes, force)
+
+    def _save(self, indexes, force):
+        os.makedirs(self.path, exist_ok=True)
+        manifest = {"version": FORMAT_VERSION, "dtype": self.dtype, "modalities": {}}
+        for name in MODALITIES:
+            index = indexes[name]
+            with index.lock:
+                # Files under the unsuffixed names move to a generation on the first save
+                stale = self._generations.get(name) is None or self._saved_versions.get(name) != index.version
+                if force or stale:
+                    generation = (self._generations.get(name) or 0) + 1
+                    self._save_modality(name, index, generation)
+                    self._generations[name] = generation
+                    self._saved_versions[name] = index.version
+                manifest["modalities"][name] = {
+                    "count": index.row_count, "dim": index.dim, "layout": self.layouts.get(name),
+                    "codec": index.codec_name,
+                    "arrays": sorted(index.vectors.export(0)) if index.vectors is not None else [],
+                    "generation": self._generations.get(name),
+                }
+        self._write_atomic(self.manifest_file, json.dumps(manifest).encode("utf-8"))
+        self._remove_superseded()
+
+    def _save_modality(self, name, index, generation):
+        arrays = index.vectors.export(index.row_count) if index.vectors is not None else {}
+        for array, values in arrays.items():
+            self._save_array(self._file(name, f"{array}.npy", generation), values)
+        self._save_array(self._file(name, "mtimes.npy", generation), np.asarray(index.mtimes, dtype=np.float64))
+        self._save_array(self._file(name, "sizes.npy", generation), np.asarray(index.sizes, dtype=np.int64))
+        self._write_atomic(self._file(name, "paths", generation), "\0".join(index.paths).encode("utf-8"))
+        if index.ann is not None and index.ann.trained:
+            ivf_file = self._file(name, "ivf.npz", generation)
+            with open(ivf_file + ".tmp", "wb") as f:
+                np.savez(f, **index.ann.state(index.row_count))
+            os.replace(ivf_file + ".tmp", ivf_file)
+
+    def _remove_superseded(self):
+        """Delete files of older generations (and older layouts); ones still mapped are retried on the next save."""
+        for file_name in os.listdir(self.path):
+            name, _, rest = file_name.partition(".")
+            if name not in MODALITIES or file_name.endswith(".tmp"):
+                continue
+            generation = self._generations.get(name)
+            if generation is not None and rest.startswith(f"{generation}."):
+                continue
+            try:
+                os.remove(os.path.join(self.path, file_name))
+            except OSError:
+                pass
+
+    @staticmethod
+    def _save_array(path, values):
+        with open(path + ".tmp", "wb") as f:
+            np.save(f, np.ascontiguousarray(values))
+        os.replace(path + ".tmp", path)
+
+    @staticmethod
+    def _write_atomic(path, data):
+        tmp = path + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(data)
+        os.replace(tmp, path)
+
+    def migrate_json(self):
+        """Convert a legacy file_index.json into the binary format and keep it as a .bak."""
+        indexes = {name: self.new_index() for name in MODALITIES}
+        try:
+            with open(self.legacy_json, "r", encoding="utf-8") as f:
+                index_data = json.load(f)
+            for name in MODALITIES:
+                # Legacy entries hold one whole-document embedding; re-embed modalities with a layout
+                if not self.layouts.get(name):
+                    indexes[name] = VectorIndex.from_dict(index_data.get(name, {}), self.dtype)
+                    indexes[name].ann = self.new_index().ann
+        except (json.JSONDecodeError, KeyError, ValueError) as e:
+            print(f"Error migrating {self.legacy_json}: {str(e)}")
+            return indexes
+        self.save(indexes, force=True)
+        os.replace(self.legacy_json, self.legacy_json + ".bak")
+        return indexes
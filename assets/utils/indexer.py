@@ -0,0 +1,407 @@
+import os
+import time
+import queue
+import threading
+import functools
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, wait, FIRST_COMPLETED
+from .file_utils import extract_text_content, scan_tree, FileStat, DEFAULT_EXCLUDES
+from .chunking import chunk_text, CHUNKING_ID
+from .content_cache import EmbeddingCache, file_digest, bytes_digest
+from .watcher import classify, is_under
+from .image_prep import shrink_image
+from .ocr_client import ocr_pdf_pages
+
+TEXT_EXTENSIONS = {"docx", "xlsx", "pptx", "pdf", "txt"}
+IMAGE_EXTENSIONS = {"jpg", "jpeg", "png", "gif", "bmp"}
+
+# Below this many changed documents, extraction runs on a single thread instead of spawning a process pool
+PARALLEL_MIN_FILES = 8
+
+
+def get_stat(path):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return FileStat(st.st_mtime, st.st_size, st.st_ino)
+
+
+# OCR function of an extraction worker process, set once by init_extract_worker
+worker_ocr_pages = None
+
+
+def init_extract_worker(ocr_pages):
+    # The client behind ocr_pages is unpickled once per process, so its connection pool
+    # and concurrency limit are shared by every document the worker extracts
+    global worker_ocr_pages
+    worker_ocr_pages = ocr_pages
+
+
+def extract_chunks(path, ocr_pages=None):
+    """Process pool entry point: parse one document and split it into passages.
+
+    In a worker process the OCR function comes from init_extract_worker.
+    """
+    return chunk_text(extract_text_content(path, ocr_pages or worker_ocr_pages))
+
+
+class EmbeddingBatcher:
+    """Collects pending items and hands them to ``flush`` as one batch.
+
+    A batch is sent once it holds ``max_items`` items or ``max_bytes`` of payload,
+    or once its oldest item has waited ``max_delay`` seconds, so a slow trickle
+    of files still reaches the index promptly.
+    """
+
+    def __init__(self, flush, max_items=32, max_bytes=8 * 1024 * 1024, max_delay=2.0):
+        self._flush = flush
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.max_delay = max_delay
+        self.items = []
+        self.size = 0
+        self.started = None
+
+    def add(self, payload, size, meta):
+        if self.items and self.size + size > self.max_bytes:
+            self.flush()
+        if not self.items:
+            self.started = time.monotonic()
+        self.items.append((payload, meta))
+        self.size += size
+        if len(self.items) >= self.max_items or self.size >= self.max_bytes or self.expired():
+            self.flush()
+
+    def expired(self):
+        return bool(self.items) and time.monotonic() - self.started >= self.max_delay
+
+    def flush(self):
+        if not self.items:
+            return
+        items, self.items, self.size, self.started = self.items, [], 0, None
+        self._flush([payload for payload, _ in items], [meta for _, meta in items])
+
+
+class Indexer:
+    """Extracts and embeds changed files into the text and image VectorIndexes.
+
+    Files are sent to the embedding server through the *_batch endpoints of
+    ``client`` (an EmbeddingClient), so the models see one forward pass per
+    batch instead of one per file. Text is split into passages first; a
+    document's chunks may span several batches and the file is stored once
+    all of them are embedded.
+
+    Indexing runs as a pipeline: a process pool of ``extract_workers`` parses
+    documents, batches go through a queue of at most ``queue_size`` entries to
+    ``embed_workers`` threads that call the server over the client's pooled
+    keep-alive connections. At most two documents per extraction worker are
+    in flight and producers block on the full queue, so memory stays bounded
+    however large the folder is.
+
+    With an EmbeddingCache, every changed file is hashed first and files whose
+    contents were embedded before (copies, moves, touch-only edits) reuse the
+    cached embeddings without extraction or a server round trip.
+
+    With ``shrink_images``, photos are downscaled on ``extract_workers``
+    threads to the CLIP input resolution reported by the server's /models
+    before upload, instead of shipping full-resolution files.
+
+    With ``ocr_pdfs``, PDF pages without a text layer are OCR'd by the server,
+    so scanned documents become searchable too.
+    """
+
+    def __init__(self, indexes, client, batch_size=32, max_batch_bytes=8 * 1024 * 1024, max_batch_delay=2.0,
+                 extract_workers=None, embed_workers=2, queue_size=4, scan_excludes=DEFAULT_EXCLUDES, cache=None,
+                 shrink_images=True, ocr_pdfs=True):
+        self.indexes = indexes
+        self.client = client
+        self.batch_size = batch_size
+        self.max_batch_bytes = max_batch_bytes
+        self.max_batch_delay = max_batch_delay
+        self.extract_workers = extract_workers or max(1, (os.cpu_count() or 2) - 1)
+        self.embed_workers = max(1, embed_workers)
+        self.queue_size = queue_size
+        self.scan_excludes = scan_excludes
+        self.cache = cache
+        self.shrink_images = shrink_images
+        self.ocr_pages = functools.partial(ocr_pdf_pages, client) if ocr_pdfs else None
+        self.model_ids = None
+        self.image_config = None
+        self.pending_chunks = {}
+        self.pending_digests = {}
+        # Sizes of the stale files found by stale_files, stored with their embeddings
+        self.file_sizes = {}
+        self.pending_lock = threading.Lock()
+        # Files found new or changed, and errors met, over this indexer's passes
+        self.stale = {"text": 0, "images": 0}
+        self.errors = 0
+
+    def report_error(self, message):
+        print(message)
+        with self.pending_lock:
+            self.errors += 1
+
+    def make_batcher(self, handler, batches):
+        return EmbeddingBatcher(
+            lambda payloads, metas: batches.put((handler, payloads, metas)),
+            self.batch_size, self.max_batch_bytes, self.max_batch_delay
+        )
+
+    def post_batch(self, endpoint, key, items):
+        # Image bytes go up as multipart parts, embeddings come back as packed float32
+        try:
+            return self.client.embed_batch(endpoint, key, items)
+        except Exception as e:
+            self.report_error(f"Error calling {endpoint}: {str(e)}")
+            return None
+
+    def load_model_ids(self):
+        """Identify the server's models so cached embeddings are never reused across model changes."""
+        models = self.client.models()
+        if not models:
+            # Without a model identity the cache cannot be used safely for this pass
+            self.model_ids = {}
+            return
+        self.image_config = models.get("clip_image")
+        self.model_ids = {
+            "text": f"{models.get('text', 'unknown')}|{CHUNKING_ID}{'|ocr' if self.ocr_pages else ''}",
+            "images": models.get("clip", "unknown"),
+        }
+
+    def cache_key(self, key, digest):
+        if self.cache is None or digest is None or key not in self.model_ids:
+            return None
+        return EmbeddingCache.key(key, self.model_ids[key], digest)
+
+    def from_cache(self, key, path, mtime, digest):
+        """Index ``path`` from the embedding cache; returns False on a miss."""
+        cache_key = self.cache_key(key, digest)
+        embeddings = self.cache.get_embeddings(cache_key) if cache_key else None
+        if embeddings is None:
+            return False
+        self.indexes[key].upsert(path, embeddings, mtime, self.file_sizes.get(path))
+        return True
+
+    def to_cache(self, key, digest, embeddings):
+        cache_key = self.cache_key(key, digest)
+        if cache_key:
+            self.cache.put_embeddings(cache_key, embeddings)
+
+    def store_images(self, payloads, metas):
+        embeddings = self.post_batch("embed_image_batch", "images", payloads)
+        if embeddings is None:
+            return
+        for (path, mtime, digest), embedding in zip(metas, embeddings):
+            if embedding is not None:
+                self.indexes["images"].upsert(path, embedding, mtime, self.file_sizes.get(path))
+                self.to_cache("images", digest, embedding)
+
+    def store_chunks(self, payloads, metas):
+        embeddings = self.post_batch("embed_text_batch", "texts", payloads)
+        completed = []
+        with self.pending_lock:
+            for (path, mtime, position), embedding in zip(metas, embeddings or [None] * len(metas)):
+                chunks = self.pending_chunks.get(path)
+                if chunks is None:
+                    continue
+                if embedding is None:
+                    del self.pending_chunks[path]
+                    continue
+                chunks[position] = embedding
+                if all(chunk is not None for chunk in chunks):
+                    del self.pending_chunks[path]
+                    completed.append((path, chunks, mtime, self.pending_digests.pop(path, None)))
+        for path, chunks, mtime, digest in completed:
+            self.indexes["text"].upsert(path, chunks, mtime, self.file_sizes.get(path))
+            self.to_cache("text", digest, chunks)
+
+    def stale_files(self, key, files):
+        """(path, mtime) pairs of ``files`` that are new or changed since they were indexed.
+
+        A file counts as changed when its mtime or its size differs, so
+        rewrites within the mtime resolution of FAT or SMB shares (2 s) and
+        copies that keep the mtime are caught too. ``files`` is either a
+        {path: FileStat} mapping from scan_tree, whose stat results are
+        reused, or a plain list of paths, which are stat-ed here.
+        """
+        index = self.indexes[key]
+        if isinstance(files, dict):
+            candidates = files.items()
+        else:
+            candidates = ((path, get_stat(path)) for path in files)
+        stale = []
+        for path, st in candidates:
+            if st is None:
+                continue
+            size = index.get_size(path)
+            if index.get_mtime(path) != st.mtime or (size is not None and st.size is not None and size != st.size):
+                stale.append((path, st.mtime))
+                self.file_sizes[path] = st.size
+            elif size is None and st.size is not None:
+                # Indexed before sizes were kept: record it now instead of re-embedding
+                index.set_size(path, st.size)
+        return stale
+
+    def digest(self, path):
+        if self.cache is None:
+            return None
+        try:
+            return file_digest(path)
+        except OSError as e:
+            self.report_error(f"Error hashing {path}: {str(e)}")
+            return None
+
+    def embed_stage(self, batches):
+        while True:
+            item = batches.get()
+            if item is None:
+                return
+            handler, payloads, metas = item
+            try:
+                handler(payloads, metas)
+            except Exception as e:
+                self.report_error(f"Error storing embeddings: {str(e)}")
+
+    def extract_stage(self, stale_text, batches):
+        batcher = self.make_batcher(self.store_chunks, batches)
+        if self.extract_workers > 1 and len(stale_text) >= PARALLEL_MIN_FILES:
+            executor = ProcessPoolExecutor(
+                self.extract_workers, initializer=init_extract_worker, initargs=(self.ocr_pages,)
+            )
+            ocr_pages = None
+        else:
+            executor = ThreadPoolExecutor(1)
+            ocr_pages = self.ocr_pages
+        todo = iter(stale_text)
+        in_flight = {}
+        with executor:
+            while True:
+                while len(in_flight) < 2 * self.extract_workers:
+                    item = next(todo, None)
+                    if item is None:
+                        break
+                    path, mtime = item
+                    digest = self.digest(path)
+                    if not self.from_cache("text", path, mtime, digest):
+                        in_flight[executor.submit(extract_chunks, path, ocr_pages)] = (path, mtime, digest)
+                if not in_flight:
+                    break
+                done, _ = wait(in_flight, timeout=self.max_batch_delay, return_when=FIRST_COMPLETED)
+                for future in done:
+                    path, mtime, digest = in_flight.pop(future)
+                    try:
+                        chunks = future.result()
+                    except Exception as e:
+                        self.report_error(f"Error reading {path}: {str(e)}")
+                        continue
+                    if not chunks:
+                        continue
+                    with self.pending_lock:
+                        self.pending_chunks[path] = [None] * len(chunks)
+                        self.pending_digests[path] = digest
+                    for position, chunk in enumerate(chunks):
+                        batcher.add(chunk, len(chunk.encode("utf-8")), (path, mtime, position))
+                if batcher.expired():
+                    batcher.flush()
+        batcher.flush()
+
+    def read_image(self, path, mtime):
+        """Upload payload and digest for one image; the payload is None if it was indexed from the cache."""
+        with open(path, "rb") as img_file:
+            data = img_file.read()
+        digest = bytes_digest(data) if self.cache is not None else None
+        if self.from_cache("images", path, mtime, digest):
+            return None, digest
+        if self.shrink_images and self.image_config:
+            data = shrink_image(data, self.image_config["size"], self.image_config.get("resample", 3))
+        return data, digest
+
+    def read_stage(self, stale_images, batches):
+        batcher = self.make_batcher(self.store_images, batches)
+        # Decoding and resizing release the GIL, so a thread pool spreads it over the cores
+        with ThreadPoolExecutor(self.extract_workers) as executor:
+            window = 2 * self.extract_workers
+            for start in range(0, len(stale_images), window):
+                items = stale_images[start:start + window]
+                futures = [executor.submit(self.read_image, path, mtime) for path, mtime in items]
+                for (path, mtime), future in zip(items, futures):
+                    try:
+                        data, digest = future.result()
+                    except OSError as e:
+                        self.report_error(f"Error reading {path}: {str(e)}")
+                        continue
+                    if data is not None:
+                        batcher.add(data, len(data), (path, mtime, digest))
+        batcher.flush()
+
+    def index_files(self, text_files, image_files):
+        stale_text = self.stale_files("text", text_files)
+        stale_images = self.stale_files("images", image_files)
+        self.stale["text"] += len(stale_text)
+        self.stale["images"] += len(stale_images)
+        if stale_text or stale_images:
+            self.run_pipeline(stale_text, stale_images)
+        for index in self.indexes.values():
+            index.refresh_ann()
+
+    def run_pipeline(self, stale_text, stale_images):
+        if self.model_ids is None:
+            self.load_model_ids()
+
+        batches = queue.Queue(maxsize=self.queue_size)
+        embedders = [
+            threading.Thread(target=self.embed_stage, args=(batches,), daemon=True)
+            for _ in range(self.embed_workers)
+        ]
+        for thread in embedders:
+            thread.start()
+        try:
+            self.extract_stage(stale_text, batches)
+            self.read_stage(stale_images, batches)
+        finally:
+            for _ in embedders:
+                batches.put(None)
+            for thread in embedders:
+                thread.join()
+            self.pending_chunks.clear()
+            self.pending_digests.clear()
+            self.file_sizes.clear()
+
+    def indexed_under(self, key, path):
+        """Indexed paths of ``key`` equal to ``path`` or inside it when it is a directory."""
+        index = self.indexes[key]
+        with index.lock:
+            return [p for p in index.rows if p == path or is_under(p, path)]
+
+    def apply_changes(self, changes, roots):
+        """Apply a watcher ChangeSet: renames move index entries, everything else is re-checked by mtime and size.
+
+        ``roots`` maps each modality to its (directory, extensions) pair.
+        """
+        recheck = list(changes.changed)
+        for src, dest in changes.moved:
+            for key in self.indexes:
+                for old in self.indexed_under(key, src):
+                    new = dest + old[len(src):]
+                    if key in classify(new, roots):
+                        self.indexes[key].rename(old, new)
+                    else:
+                        self.indexes[key].remove(old)
+            recheck.append(dest)
+        for path in changes.deleted:
+            for key in self.indexes:
+                for old in self.indexed_under(key, path):
+                    self.indexes[key].remove(old)
+
+        files = {key: {} for key in roots}
+        for path in recheck + list(changes.rescan):
+            if os.path.isdir(path):
+                found = scan_tree({key: (path, extensions) for key, (_, extensions) in roots.items()}, self.scan_excludes)
+                for key, entries in found.items():
+                    files[key].update((p, st) for p, st in entries.items() if key in classify(p, roots))
+            else:
+                for key in classify(path, roots):
+                    st = get_stat(path)
+                    if st is not None:
+                        files[key][path] = st
+        self.index_files(files.get("text", {}), files.get("images", {}))
@@ -0,0 +1,91 @@
+import logging
+import numpy as np
+import torch
+
+# float32: eager PyTorch as trained; int8: dynamic int8 quantization of the Linear layers;
+# onnx: ONNX Runtime backend (SentenceTransformer models only)
+INFERENCE_MODES = ("float32", "int8", "onnx")
+
+# Fixed inputs for the drift check, so runs are comparable across machines and versions
+DRIFT_TEXTS = [
+    "年度财务报告概述",
+    "会议纪要：讨论下一季度的产品路线图",
+    "合同条款第三条规定了付款方式和期限",
+    "员工手册中关于请假流程的说明",
+    "一只猫坐在窗台上晒太阳",
+    "海边的日落和帆船",
+    "Quarterly revenue grew by twelve percent",
+    "Installation guide for the network printer",
+]
+
+
+def configure_threads(threads=None, interop_threads=None):
+    """Set PyTorch's intra-op (and, before any parallel work has run, inter-op) thread counts."""
+    if threads:
+        torch.set_num_threads(threads)
+    if interop_threads:
+        try:
+            torch.set_num_interop_threads(interop_threads)
+        except RuntimeError as e:
+            logging.warning(f"Could not set inter-op threads: {str(e)}")
+
+
+def quantize(model):
+    """Copy of ``model`` with its Linear layers dynamically quantized to int8."""
+    return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def prepare_model(model, mode):
+    """Switch ``model`` to eval mode and apply ``mode``; returns the model to serve.
+
+    ``onnx`` is chosen when the model is loaded (see load_text_model), so here
+    it only puts the model in eval mode.
+    """
+    if mode not in INFERENCE_MODES:
+        raise ValueError(f"Unsupported inference mode: {mode}")
+    model.eval()
+    return quantize(model) if mode == "int8" else model
+
+
+def load_text_model(path, mode):
+    from sentence_transformers import SentenceTransformer
+    if mode == "onnx":
+        # Exported on first load by sentence-transformers (needs optimum[onnxruntime])
+        return SentenceTransformer(path, backend="onnx")
+    return SentenceTransformer(path)
+
+
+def cosine_drift(reference, candidate):
+    """Per-row cosine similarity between reference and candidate embeddings, summarized."""
+    reference = np.asarray(reference, dtype=np.float32)
+    candidate = np.asarray(candidate, dtype=np.float32)
+    cosine = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1) + 1e-12
+    )
+    return {"min_cosine": float(cosine.min()), "mean_cosine": float(cosine.mean()), "samples": len(cosine)}
+
+
+def drift_images(count=4, size=224, seed=0):
+    """Deterministic synthetic images (smooth gradients with noise) for the CLIP drift check."""
+    from PIL import Image
+    rng = np.random.default_rng(seed)
+    axis = np.linspace(0, 1, size, dtype=np.float32)
+    images = []
+    for _ in range(count):
+        weights = rng.random((3, 2))
+        pixels = weights[:, 0, None, None] * axis[None, :, None] + weights[:, 1, None, None] * axis[None, None, :]
+        pixels = pixels.transpose(1, 2, 0) / max(weights.sum(axis=1).max(), 1e-6)
+        pixels += rng.normal(0, 0.05, pixels.shape)
+        images.append(Image.fromarray((np.clip(pixels, 0, 1) * 255).astype(np.uint8)))
+    return images
+
+
+def check_drift(name, reference_encode, candidate_encode, inputs, min_cosine):
+    """Compare a quantized or exported model with its float32 original and log the result."""
+    with torch.inference_mode():
+        drift = cosine_drift(reference_encode(inputs), candidate_encode(inputs))
+    drift["threshold"] = min_cosine
+    drift["ok"] = drift["min_cosine"] >= min_cosine
+    log = logging.info if drift["ok"] else logging.warning
+    log(f"Inference drift for {name}: min cosine {drift['min_cosine']:.4f}, mean {drift['mean_cosine']:.4f}")
+    return drift
@@ -0,0 +1,155 @@
+import os
+import threading
+from PIL import Image
+from .model_names import TEXT_MODEL_NAME, CLIP_MODEL_NAME, model_id
+from .ocr import OCREngine, OCR_DPI, OCR_MAX_PAGES, ocr_image_data, ocr_pdf_page
+from .content_cache import OCRCache, file_digest
+
+# Endpoint names the HTTP client posts to -> (model, ModelRuntime method)
+ENDPOINTS = {
+    "embed_text": ("text", "encode_texts"),
+    "embed_text_batch": ("text", "encode_texts"),
+    "embed_clip_text": ("clip", "encode_clip_texts"),
+    "embed_clip_text_batch": ("clip", "encode_clip_texts"),
+    "embed_image": ("clip", "encode_images"),
+    "embed_image_batch": ("clip", "encode_images"),
+}
+# Single-item endpoints the server answers with a one-row batch instead of a vector
+ROW_ENDPOINTS = {"embed_clip_text", "embed_image"}
+
+
+class LocalEmbeddingClient:
+    """In-process stand-in for EmbeddingClient: the same calls, no server.
+
+    Each model is loaded from ``model_dir`` the first time it is needed and
+    kept for the life of the client; embeddings are the NumPy rows the models
+    return, never serialized. OCR runs here with the local Tesseract. Model
+    ids match the server's, so embeddings cached by either backend are
+    reused by the other.
+
+    Instances can be pickled into worker processes; the copy loads the models
+    again only if it embeds anything. With ``ocr_cache_file``, PDF pages OCR'd
+    by ocr_pdf_pages go through that OCRCache, which worker processes open
+    themselves.
+    """
+
+    def __init__(self, model_dir, text_mode="float32", clip_mode="float32",
+                 ocr_cache_file=None, ocr_cache_mb=256, ocr_dpi=OCR_DPI):
+        self.model_dir = model_dir
+        self.text_mode = text_mode
+        self.clip_mode = clip_mode
+        self.ocr_cache_file = ocr_cache_file
+        self.ocr_cache_mb = ocr_cache_mb
+        self.ocr_dpi = ocr_dpi
+        self.ocr_cache = None
+        self.runtimes = {}
+        # One forward pass per model at a time; PyTorch's own threads use the cores
+        self.locks = {"text": threading.Lock(), "clip": threading.Lock()}
+        self.clip_processor = None
+        self.ocr_engine = None
+
+    def __getstate__(self):
+        return {
+            "model_dir": self.model_dir, "text_mode": self.text_mode, "clip_mode": self.clip_mode,
+            "ocr_cache_file": self.ocr_cache_file, "ocr_cache_mb": self.ocr_cache_mb, "ocr_dpi": self.ocr_dpi,
+        }
+
+    def __setstate__(self, state):
+        self.__init__(**state)
+
+    @property
+    def api_url(self):
+        return f"local:{self.model_dir}"
+
+    def node(self):
+        return self
+
+    def runtime(self, model):
+        """The ModelRuntime holding ``model``; call with its lock held."""
+        if model not in self.runtimes:
+            # Imported here so that OCR-only copies in worker processes never load PyTorch
+            from .model_runtime import ModelRuntime
+            self.runtimes[model] = ModelRuntime(
+                self.model_dir, TEXT_MODEL_NAME, CLIP_MODEL_NAME, self.text_mode, self.clip_mode,
+                models=(model,), drift_check=False,
+            )
+        return self.runtimes[model]
+
+    def encode(self, endpoint, items):
+        model, method = ENDPOINTS[endpoint]
+        with self.locks[model]:
+            return getattr(self.runtime(model), method)(items)
+
+    def embed_batch(self, endpoint, key, items):
+        """Embeddings for a batch of texts or image bytes; None for images that cannot be decoded."""
+        return self.encode(endpoint, items)
+
+    def embed_query(self, endpoint, text):
+        row = self.encode(endpoint, [text])[0]
+        return row[None, :] if endpoint in ROW_ENDPOINTS else row
+
+    def models(self):
+        """The same answer as the server's /models, or {} when the models cannot be found."""
+        try:
+            if self.clip_processor is None:
+                if "clip" in self.runtimes:
+                    self.clip_processor = self.runtimes["clip"].clip_processor
+                else:
+                    # The image settings only need the processor, not the model
+                    from transformers import ChineseCLIPProcessor
+                    self.clip_processor = ChineseCLIPProcessor.from_pretrained(
+                        os.path.join(self.model_dir, CLIP_MODEL_NAME)
+                    )
+        except Exception as e:
+            print(f"Error loading CLIP processor: {str(e)}")
+            return {}
+        image_processor = self.clip_processor.image_processor
+        engine = self.ocr()
+        return {
+            "text": model_id(TEXT_MODEL_NAME, self.text_mode),
+            "clip": model_id(CLIP_MODEL_NAME, self.clip_mode),
+            "clip_image": {
+                "size": dict(image_processor.size),
+                "resample": int(getattr(image_processor, "resample", Image.BICUBIC)),
+            },
+            "ocr": {"lang": engine.lang, "engine": engine.engine_id},
+        }
+
+    def ocr(self):
+        if self.ocr_engine is None:
+            self.ocr_engine = OCREngine(dpi=self.ocr_dpi)
+        return self.ocr_engine
+
+    def ocr_pdf_pages(self, path, pages):
+        """{page: text} for the 1-based ``pages`` of a PDF, one page at a time in this process.
+
+        Called from the indexer's extraction workers, which already use every core.
+        """
+        engine = self.ocr()
+        pages = pages[:OCR_MAX_PAGES]
+        if self.ocr_cache_file is None:
+            return {page: ocr_pdf_page(path, page, engine.dpi, engine.lang) for page in pages}
+        if self.ocr_cache is None:
+            self.ocr_cache = OCRCache(self.ocr_cache_file, self.ocr_cache_mb * 1024 * 1024)
+        digest = file_digest(path)
+        texts = {}
+        for page in pages:
+            key = OCRCache.key(digest, page, engine.lang, engine.engine_id)
+            texts[page] = self.ocr_cache.get_text(key)
+            if texts[page] is None:
+                texts[page] = ocr_pdf_page(path, page, engine.dpi, engine.lang)
+                self.ocr_cache.put_text(key, texts[page])
+        return texts
+
+    def ocr_pages_stream(self, path, pages):
+        """(page, text) for ``pages`` in page order, as the OCR process pool finishes them."""
+        return self.ocr().pages(path, pages[:OCR_MAX_PAGES])
+
+    def ocr_image(self, data):
+        return ocr_image_data(data, self.ocr().lang)
+
+    def close(self):
+        if self.ocr_engine is not None:
+            self.ocr_engine.shutdown()
+        if self.ocr_cache is not None:
+            self.ocr_cache.close()
@@ -0,0 +1,83 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+
+class MicroBatcher:
+    """Coalesces concurrent single-item requests into batched model calls.
+
+    Callers block in ``submit``; a worker thread waits up to ``max_wait``
+    seconds after the first pending item for more to arrive (at most
+    ``max_batch_size``), runs ``run_batch`` once on the whole list and hands
+    each caller its own result. ``run_batch`` must return one result per item.
+    ``concurrency`` worker threads collect and run batches side by side, for
+    a ``run_batch`` that can serve several batches at once.
+    """
+
+    def __init__(self, run_batch, max_batch_size=32, max_wait=0.005, name="batcher", concurrency=1):
+        self.run_batch = run_batch
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self.name = name
+        self.pending = queue.Queue()
+        self.stats_lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+        self.size_histogram = {}
+        self.workers = [
+            threading.Thread(target=self._run, name=f"{name}-{index}", daemon=True) for index in range(concurrency)
+        ]
+        for worker in self.workers:
+            worker.start()
+
+    def submit(self, item, timeout=None):
+        future = Future()
+        self.pending.put((item, future))
+        return future.result(timeout)
+
+    def _collect(self):
+        batch = [self.pending.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.pending.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+            items = [item for item, _ in batch]
+            try:
+                results = self.run_batch(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name} returned {len(results)} results for {len(items)} items")
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+            else:
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            self._record(len(batch))
+
+    def _record(self, size):
+        with self.stats_lock:
+            self.batches += 1
+            self.items += size
+            self.size_histogram[size] = self.size_histogram.get(size, 0) + 1
+
+    def stats(self):
+        with self.stats_lock:
+            return {
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000,
+                "batches": self.batches,
+                "items": self.items,
+                "mean_batch_size": self.items / self.batches if self.batches else 0.0,
+                "batch_size_histogram": dict(sorted(self.size_histogram.items())),
+            }
@@ -0,0 +1,9 @@
+# Model directories under MODEL_DIR, shared by the API server and the in-process backend so both
+# report the same model ids and can share cached embeddings
+TEXT_MODEL_NAME = "paraphrase-multilingual-MiniLM-L12-v2"
+CLIP_MODEL_NAME = "chinese-clip-vit-base-patch16"
+
+
+def model_id(name, mode):
+    """Name reported to clients; quantized or exported models get their own id so cached embeddings never mix."""
+    return name if mode == "float32" else f"{name}@{mode}"
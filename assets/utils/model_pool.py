@@ -0,0 +1,288 @@
+import os
+import sys
+import json
+import time
+import queue
+import pickle
+import logging
+import itertools
+import threading
+import subprocess
+from concurrent.futures import Future
+
+# A task whose worker dies under it is retried on another worker this many times in total
+MAX_ATTEMPTS = 3
+# Seconds before restarting a worker that keeps crashing (doubles per consecutive crash)
+RESTART_BACKOFF_MAX = 30
+# A worker holding tasks without finishing one for this long is killed and restarted
+TASK_TIMEOUT = 300
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+def parse_cores(spec):
+    """Core ids from a ``0-15,32-47`` style list."""
+    cores = []
+    for part in spec.split(","):
+        part = part.strip()
+        if "-" in part:
+            first, last = part.split("-")
+            cores.extend(range(int(first), int(last) + 1))
+        elif part:
+            cores.append(int(part))
+    return cores
+
+
+def available_cores():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def split_cores(cores, parts):
+    """Split ``cores`` into ``parts`` contiguous, near-equal groups (sharing cores if there are too few)."""
+    if parts <= len(cores):
+        size, extra = divmod(len(cores), parts)
+        groups, start = [], 0
+        for part in range(parts):
+            end = start + size + (part < extra)
+            groups.append(cores[start:end])
+            start = end
+        return groups
+    return [[cores[part % len(cores)]] for part in range(parts)]
+
+
+class Task:
+    __slots__ = ("id", "model", "method", "args", "future", "attempts")
+
+    def __init__(self, task_id, model, method, args):
+        self.id = task_id
+        self.model = model
+        self.method = method
+        self.args = args
+        self.future = Future()
+        self.attempts = 0
+
+
+class Worker:
+    """One model worker process slot: the current process plus the tasks assigned to it."""
+
+    def __init__(self, index, model, cores):
+        self.index = index
+        self.model = model
+        self.cores = cores
+        self.process = None
+        self.outbox = None
+        self.ready = False
+        self.tasks = {}
+        self.progress = time.monotonic()
+        self.completed = 0
+        self.restarts = 0
+        self.crashes = 0
+        self.next_start = 0.0
+
+
+class ModelWorkerPool:
+    """Model worker processes behind a least-loaded dispatcher.
+
+    ``workers`` maps a model ("text", "clip") to its number of worker
+    processes. Each worker loads only its own model (a ModelRuntime built
+    from ``config``) and is pinned to its own slice of ``cores``, with
+    PyTorch's intra-op threads sized to that slice. Tasks go to the ready
+    worker of the model with the fewest tasks outstanding.
+
+    A monitor thread restarts workers that exit or stop making progress,
+    with backoff when they keep crashing, and the tasks they held are
+    retried on other workers.
+    """
+
+    def __init__(self, workers, config, cores=None, health_interval=1.0, task_timeout=TASK_TIMEOUT):
+        self.config = config
+        self.health_interval = health_interval
+        self.task_timeout = task_timeout
+        models = [model for model, count in workers.items() for _ in range(count)]
+        usable = available_cores()
+        if cores and not set(cores) <= set(usable):
+            logging.warning(f"Ignoring cores not available to this process: {sorted(set(cores) - set(usable))}")
+            cores = [core for core in cores if core in usable]
+        groups = split_cores(cores or usable, len(models))
+        self.workers = [Worker(index, model, group) for index, (model, group) in enumerate(zip(models, groups))]
+        self.lock = threading.Lock()
+        self.ids = itertools.count()
+        self.drift = {}
+        self.closed = False
+        with self.lock:
+            for worker in self.workers:
+                self._start(worker)
+        threading.Thread(target=self._monitor, name="model-pool-monitor", daemon=True).start()
+
+    def submit(self, model, method, *args):
+        task = Task(next(self.ids), model, method, args)
+        with self.lock:
+            self._dispatch(task)
+        return task.future
+
+    def call(self, model, method, *args, timeout=None):
+        return self.submit(model, method, *args).result(timeout)
+
+    def _dispatch(self, task):
+        candidates = [worker for worker in self.workers if worker.model == task.model]
+        if not candidates:
+            raise ValueError(f"No workers serve the {task.model} model")
+        # Workers waiting to be restarted only get work when no other worker is alive
+        live = [worker for worker in candidates if worker.process is not None] or candidates
+        worker = min(live, key=lambda worker: (not worker.ready, len(worker.tasks)))
+        if not worker.tasks:
+            worker.progress = time.monotonic()
+        worker.tasks[task.id] = task
+        if worker.outbox is not None:
+            worker.outbox.put(task)
+
+    def _start(self, worker):
+        """Launch a process for ``worker`` and send it the tasks already assigned to it."""
+        options = {
+            "cores": worker.cores,
+            # Only the first worker of each model checks inference drift
+            "runtime": dict(
+                self.config, models=[worker.model],
+                drift_check=self.config.get("drift_check", True) and self._first(worker),
+            ),
+        }
+        threads = str(len(worker.cores))
+        env = dict(os.environ, OMP_NUM_THREADS=threads, MKL_NUM_THREADS=threads)
+        worker.process = subprocess.Popen(
+            [sys.executable, "-m", "assets.utils.model_worker", json.dumps(options)],
+            stdin=subprocess.PIPE, stdout=subprocess.PIPE, cwd=ROOT_DIR, env=env,
+        )
+        worker.outbox = queue.Queue()
+        worker.ready = False
+        worker.progress = time.monotonic()
+        for task in worker.tasks.values():
+            worker.outbox.put(task)
+        threading.Thread(target=self._write, args=(worker.process, worker.outbox), daemon=True).start()
+        threading.Thread(target=self._read, args=(worker, worker.process), daemon=True).start()
+        logging.info(f"Started {worker.model} worker {worker.index} (pid {worker.process.pid}) on cores {worker.cores}")
+
+    def _first(self, worker):
+        return next(other for other in self.workers if other.model == worker.model) is worker
+
+    def _write(self, process, outbox):
+        # Sending outside the pool lock: a large batch must not stall dispatch while the pipe drains
+        while True:
+            task = outbox.get()
+            if task is None:
+                break
+            try:
+                pickle.dump((task.id, task.method, task.args), process.stdin, protocol=pickle.HIGHEST_PROTOCOL)
+                process.stdin.flush()
+            except (OSError, ValueError):
+                break  # The reader notices the dead process and reassigns its tasks
+        try:
+            process.stdin.close()
+        except OSError:
+            pass
+
+    def _read(self, worker, process):
+        try:
+            while True:
+                task_id, ok, value = pickle.load(process.stdout)
+                with self.lock:
+                    worker.progress = time.monotonic()
+                    if task_id is None:
+                        worker.ready = True
+                        worker.crashes = 0
+                        self.drift.update(value or {})
+                        continue
+                    task = worker.tasks.pop(task_id, None)
+                    worker.completed += 1
+                if task is not None:
+                    if ok:
+                        task.future.set_result(value)
+                    else:
+                        task.future.set_exception(RuntimeError(value))
+        except (EOFError, OSError, pickle.UnpicklingError):
+            pass
+        self._exited(worker, process)
+
+    def _exited(self, worker, process):
+        try:
+            process.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            process.kill()
+        with self.lock:
+            if worker.process is not process:
+                return
+            worker.outbox.put(None)
+            worker.process = None
+            worker.outbox = None
+            worker.ready = False
+            if self.closed:
+                for task in worker.tasks.values():
+                    task.future.set_exception(RuntimeError("Model worker pool shut down"))
+                worker.tasks = {}
+                return
+            worker.crashes += 1
+            worker.next_start = time.monotonic() + min(RESTART_BACKOFF_MAX, 2 ** (worker.crashes - 1))
+            logging.warning(
+                f"{worker.model} worker {worker.index} exited with code {process.returncode}; "
+                f"retrying {len(worker.tasks)} tasks"
+            )
+            tasks, worker.tasks = list(worker.tasks.values()), {}
+            for task in tasks:
+                task.attempts += 1
+                if task.attempts >= MAX_ATTEMPTS:
+                    task.future.set_exception(RuntimeError(f"{task.model} worker crashed {task.attempts} times on this task"))
+                else:
+                    self._dispatch(task)
+
+    def _monitor(self):
+        while not self.closed:
+            time.sleep(self.health_interval)
+            now = time.monotonic()
+            with self.lock:
+                for worker in self.workers:
+                    if self.closed:
+                        break
+                    if worker.process is None and now >= worker.next_start:
+                        worker.restarts += 1
+                        self._start(worker)
+                    elif worker.process is not None and worker.tasks and now - worker.progress > self.task_timeout:
+                        logging.warning(f"{worker.model} worker {worker.index} made no progress for {self.task_timeout}s; killing it")
+                        worker.process.kill()  # Its reader thread then handles it like a crash
+
+    def count(self, model):
+        return sum(worker.model == model for worker in self.workers)
+
+    def healthy(self):
+        with self.lock:
+            return self._healthy()
+
+    def _healthy(self):
+        """Whether every model has at least one worker with its model loaded."""
+        ready = {worker.model for worker in self.workers if worker.ready}
+        return all(worker.model in ready for worker in self.workers)
+
+    def stats(self):
+        with self.lock:
+            return {
+                "healthy": self._healthy(),
+                "workers": [
+                    {
+                        "model": worker.model,
+                        "pid": worker.process.pid if worker.process is not None else None,
+                        "cores": worker.cores,
+                        "ready": worker.ready,
+                        "in_flight": len(worker.tasks),
+                        "completed": worker.completed,
+                        "restarts": worker.restarts,
+                    }
+                    for worker in self.workers
+                ],
+            }
+
+    def shutdown(self):
+        with self.lock:
+            self.closed = True
+            for worker in self.workers:
+                if worker.outbox is not None:
+                    worker.outbox.put(None)  # Closing stdin makes the worker exit
@@ -0,0 +1,95 @@
+import io
+import os
+import logging
+import torch
+from PIL import Image
+from .inference import DRIFT_TEXTS, check_drift, drift_images, load_text_model, prepare_model
+
+MODELS = ("text", "clip")
+
+
+class ModelRuntime:
+    """The text and/or CLIP model, loaded in their inference modes, behind plain encode calls.
+
+    The API server uses one in-process; each model worker process holds one
+    for its subset of ``models``. Encode methods take and return picklable
+    values so they can be called across processes.
+    """
+
+    def __init__(self, model_dir, text_name, clip_name, text_mode="float32", clip_mode="float32",
+                 models=MODELS, drift_check=True, drift_min=0.98):
+        if clip_mode == "onnx":
+            raise ValueError("CLIP_MODEL_MODE=onnx is not supported; use float32 or int8")
+        self.drift_check = drift_check
+        self.drift_min = drift_min
+        self.drift = {}
+        self.text_model = None
+        self.clip_model = None
+        self.clip_processor = None
+        if "text" in models:
+            self.load_text(os.path.join(model_dir, text_name), text_name, text_mode)
+        if "clip" in models:
+            self.load_clip(os.path.join(model_dir, clip_name), clip_name, clip_mode)
+
+    def load_text(self, path, name, mode):
+        model = load_text_model(path, mode)
+        # int8 quantization returns a copy, so the float32 model is kept only for the drift check
+        reference = model if mode == "int8" and self.drift_check else None
+        self.text_model = prepare_model(model, mode)
+        if mode != "float32" and self.drift_check:
+            if reference is None:
+                reference = load_text_model(path, "float32").eval()
+            self.drift['text'] = check_drift(
+                name, reference.encode, self.text_model.encode, DRIFT_TEXTS, self.drift_min
+            )
+
+    def load_clip(self, path, name, mode):
+        from transformers import ChineseCLIPProcessor, ChineseCLIPModel
+        self.clip_processor = ChineseCLIPProcessor.from_pretrained(path)
+        reference = ChineseCLIPModel.from_pretrained(path)
+        self.clip_model = prepare_model(reference, mode)
+        if mode != "float32" and self.drift_check:
+            self.drift['clip_text'] = check_drift(
+                name + " (text)",
+                lambda texts: self.clip_text_features(reference, texts),
+                lambda texts: self.clip_text_features(self.clip_model, texts),
+                DRIFT_TEXTS, self.drift_min,
+            )
+            self.drift['clip_image'] = check_drift(
+                name + " (image)",
+                lambda images: self.clip_image_features(reference, images),
+                lambda images: self.clip_image_features(self.clip_model, images),
+                drift_images(), self.drift_min,
+            )
+
+    def clip_text_features(self, model, texts):
+        inputs = self.clip_processor(text=texts, return_tensors="pt", padding=True)
+        return model.get_text_features(**inputs).numpy()
+
+    def clip_image_features(self, model, images):
+        inputs = self.clip_processor(images=images, return_tensors="pt")
+        return model.get_image_features(**inputs).numpy()
+
+    @torch.inference_mode()
+    def encode_texts(self, texts):
+        return list(self.text_model.encode(texts, batch_size=len(texts)))
+
+    @torch.inference_mode()
+    def encode_clip_texts(self, texts):
+        return list(self.clip_text_features(self.clip_model, texts))
+
+    @torch.inference_mode()
+    def encode_images(self, blobs):
+        """Embeddings for encoded image bytes; undecodable images get None instead of failing the batch."""
+        images, positions = [], []
+        for position, data in enumerate(blobs):
+            try:
+                images.append(Image.open(io.BytesIO(data)).convert("RGB"))
+                positions.append(position)
+            except Exception as e:
+                logging.warning(f"Skipping undecodable image {position}: {str(e)}")
+        embeddings = [None] * len(blobs)
+        if images:
+            for position, embedding in zip(positions, self.clip_image_features(self.clip_model, images)):
+                embeddings[position] = embedding
+        return embeddings
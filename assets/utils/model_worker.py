@@ -0,0 +1,65 @@
+"""Model worker process: ``python -m assets.utils.model_worker '<json options>'``.
+
+Started by ModelWorkerPool. Tasks arrive as pickled ``(task_id, method,
+args)`` tuples on stdin and results leave as pickled ``(task_id, ok, value)``
+tuples on stdout; a ``(None, True, drift)`` message announces that the models
+are loaded. Anything the libraries print goes to stderr.
+"""
+import os
+import sys
+import json
+import queue
+import pickle
+import threading
+
+
+def read_tasks(stream, tasks):
+    try:
+        while True:
+            tasks.put(pickle.load(stream))
+    except (EOFError, OSError, pickle.UnpicklingError):
+        # The pool closed our stdin (shutdown) or went away
+        tasks.put(None)
+
+
+def main():
+    options = json.loads(sys.argv[1])
+    tasks_in = sys.stdin.buffer
+    results_out = os.fdopen(os.dup(sys.stdout.fileno()), "wb")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    cores = options.get("cores") or []
+    if cores and hasattr(os, "sched_setaffinity"):
+        try:
+            os.sched_setaffinity(0, cores)
+        except OSError as e:
+            print(f"Could not pin to cores {cores}: {str(e)}", file=sys.stderr)
+
+    from .inference import configure_threads
+    from .model_runtime import ModelRuntime
+    # Intra-op threads fill the pinned cores; the pool provides the parallelism across requests
+    configure_threads(len(cores) or None, 1)
+    runtime = ModelRuntime(**options["runtime"])
+
+    def send(message):
+        pickle.dump(message, results_out, protocol=pickle.HIGHEST_PROTOCOL)
+        results_out.flush()
+
+    send((None, True, runtime.drift))
+    tasks = queue.Queue()
+    threading.Thread(target=read_tasks, args=(tasks_in, tasks), daemon=True).start()
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+        task_id, method, args = task
+        try:
+            result = (task_id, True, getattr(runtime, method)(*args))
+        except Exception as e:
+            result = (task_id, False, f"{type(e).__name__}: {str(e)}")
+        send(result)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+import io
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import pytesseract
+from PIL import Image
+from pdf2image import convert_from_path, pdfinfo_from_path
+
+OCR_LANG = "chi_sim+eng"
+OCR_DPI = 200
+# Pages beyond this are not OCR'd; the result reports the truncation
+OCR_MAX_PAGES = 500
+
+
+def init_worker():
+    # One Tesseract thread per worker process; parallelism comes from the pool
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+
+
+def ocr_image(image, lang=OCR_LANG):
+    return pytesseract.image_to_string(image, lang=lang)
+
+
+def ocr_image_data(data, lang):
+    """Process pool entry point: OCR encoded image bytes."""
+    with Image.open(io.BytesIO(data)) as image:
+        return ocr_image(image, lang)
+
+
+def ocr_pdf_page(path, page, dpi, lang):
+    """Process pool entry point: rasterize a single page of ``path`` and OCR it."""
+    images = convert_from_path(path, dpi=dpi, first_page=page, last_page=page, grayscale=True)
+    return "\n".join(ocr_image(image, lang) for image in images)
+
+
+class OCREngine:
+    """Parallel, page-streaming OCR for PDFs.
+
+    Each page is rasterized and recognized inside a worker process, so only
+    the pages currently being worked on exist as bitmaps. At most two pages
+    per worker are queued, and results are yielded in page order as soon as
+    every earlier page is done.
+    """
+
+    def __init__(self, workers=None, dpi=OCR_DPI, max_pages=OCR_MAX_PAGES, lang=OCR_LANG):
+        self.workers = workers or max(1, (os.cpu_count() or 2) - 1)
+        self.dpi = dpi
+        self.max_pages = max_pages
+        self.lang = lang
+        self.executor = None
+        self._engine_id = None
+
+    def pool(self):
+        if self.executor is None:
+            self.executor = ProcessPoolExecutor(self.workers, initializer=init_worker)
+        return self.executor
+
+    @property
+    def engine_id(self):
+        """Tesseract version and DPI, for keying cached results."""
+        if self._engine_id is None:
+            try:
+                version = pytesseract.get_tesseract_version()
+            except Exception:
+                version = "unknown"
+            self._engine_id = f"tesseract-{version}@{self.dpi}dpi"
+        return self._engine_id
+
+    @staticmethod
+    def page_count(path):
+        return int(pdfinfo_from_path(path)["Pages"])
+
+    def pages(self, path, pages=None):
+        """Yield (page number, text) for ``pages`` (default: all, up to max_pages) of the PDF at ``path``."""
+        if pages is None:
+            pages = range(1, min(self.page_count(path), self.max_pages) + 1)
+        pages = iter(pages)
+        in_flight = deque()
+        try:
+            while True:
+                while len(in_flight) < 2 * self.workers:
+                    page = next(pages, None)
+                    if page is None:
+                        break
+                    in_flight.append((page, self.pool().submit(ocr_pdf_page, path, page, self.dpi, self.lang)))
+                if not in_flight:
+                    return
+                page, future = in_flight.popleft()
+                yield page, future.result()
+        finally:
+            # A consumer that stops early (error, cancelled request) leaves no queued work behind
+            for _, pending in in_flight:
+                pending.cancel()
+
+    def image(self, data):
+        """OCR encoded image bytes in the pool, so concurrent requests don't queue behind each other."""
+        return self.pool().submit(ocr_image_data, data, self.lang).result()
+
+    def shutdown(self):
+        if self.executor is not None:
+            self.executor.shutdown(cancel_futures=True)
+            self.executor = None
@@ -0,0 +1,89 @@
+from .content_cache import OCRCache, file_digest, bytes_digest
+
+
+def ocr_pdf_pages(client, path, pages):
+    """{page: text} for the 1-based ``pages`` of a local PDF, OCR'd by ``client``.
+
+    Module-level so that ``functools.partial(ocr_pdf_pages, client)`` can be
+    handed to extraction worker processes.
+    """
+    return client.ocr_pdf_pages(path, pages)
+
+
+class OCRClient:
+    """OCR through an embedding client (server or in-process) and an optional local OCRCache.
+
+    Cache keys use the OCR language and engine reported by the client's
+    models(), so results are never reused across Tesseract versions or
+    settings. Without that information the cache is bypassed.
+    """
+
+    def __init__(self, client, cache=None):
+        self.client = client
+        self.cache = cache
+        self.engine = None
+
+    def load_engine(self):
+        if self.engine is None:
+            self.engine = self.client.models().get("ocr") or {}
+        return self.engine
+
+    def cache_key(self, digest, page):
+        engine = self.load_engine() if self.cache is not None else {}
+        if not engine:
+            return None
+        return OCRCache.key(digest, page, engine["lang"], engine["engine"])
+
+    def pdf_pages(self, path, pages):
+        """{page: text} for the 1-based ``pages`` of a local PDF; only uncached pages are sent to the server."""
+        digest = file_digest(path) if self.cache is not None else None
+        keys = {page: self.cache_key(digest, page) for page in pages}
+        texts = {page: self.cache.get_text(key) for page, key in keys.items() if key}
+        missing = [page for page in pages if texts.get(page) is None]
+        if missing:
+            for page, text in self.client.ocr_pdf_pages(path, missing).items():
+                texts[page] = text
+                if keys.get(page):
+                    self.cache.put_text(keys[page], text)
+        return {page: texts[page] for page in pages if texts.get(page) is not None}
+
+    def pdf_pages_stream(self, path, pages):
+        """Yield (page, text) for ``pages`` in order as they become available.
+
+        Cached pages come from the local cache; the rest are OCR'd by a server
+        job whose pages are streamed back as they finish. Closing the generator
+        early cancels the job.
+        """
+        digest = file_digest(path) if self.cache is not None else None
+        keys = {page: self.cache_key(digest, page) for page in pages}
+        texts = {page: self.cache.get_text(key) for page, key in keys.items() if key}
+        missing = [page for page in pages if texts.get(page) is None]
+        stream = self.client.ocr_pages_stream(path, missing) if missing else None
+        pending = None
+        try:
+            for page in pages:
+                if texts.get(page) is None:
+                    while stream is not None and (pending is None or pending[0] < page):
+                        pending = next(stream, None)
+                        if pending is None:
+                            stream = None
+                    if pending is None or pending[0] != page:
+                        continue
+                    texts[page] = pending[1]
+                    if keys.get(page):
+                        self.cache.put_text(keys[page], texts[page])
+                yield page, texts[page]
+        finally:
+            if stream is not None:
+                stream.close()
+
+    def image_text(self, path):
+        with open(path, "rb") as img_file:
+            data = img_file.read()
+        key = self.cache_key(bytes_digest(data), 0) if self.cache is not None else None
+        text = self.cache.get_text(key) if key else None
+        if text is None:
+            text = self.client.ocr_image(data)
+            if key:
+                self.cache.put_text(key, text)
+        return text
@@ -0,0 +1,142 @@
+import time
+import uuid
+import threading
+
+JOB_TTL = 600
+
+
+class OCRJob:
+    """Per-page results of one OCR job, appended in page order as they complete."""
+
+    def __init__(self, key, pages):
+        self.id = uuid.uuid4().hex
+        self.key = key
+        self.pages = pages
+        self.results = []
+        self.status = "running"
+        self.error = None
+        self.subscribers = 1
+        self.finished = None
+        self.cancelled = threading.Event()
+        self.cond = threading.Condition()
+
+    @property
+    def done(self):
+        return self.status != "running"
+
+    def add(self, page, text):
+        with self.cond:
+            self.results.append((page, text))
+            self.cond.notify_all()
+
+    def finish(self, status, error=None):
+        with self.cond:
+            self.status = status
+            self.error = error
+            self.finished = time.monotonic()
+            self.cond.notify_all()
+
+    def wait(self, since, timeout=None):
+        """Results after the first ``since``, waiting up to ``timeout`` seconds for one to arrive."""
+        with self.cond:
+            if timeout:
+                self.cond.wait_for(lambda: len(self.results) > since or self.done, timeout)
+            return self.results[since:], self.status
+
+    def snapshot(self, since=0, timeout=None):
+        results, status = self.wait(since, timeout)
+        return {
+            "job_id": self.id,
+            "status": status,
+            "pages": self.pages,
+            "results": [{"page": page, "text": text} for page, text in results],
+            "next": since + len(results),
+            "error": self.error,
+        }
+
+
+class OCRJobManager:
+    """Runs OCR jobs on background threads.
+
+    A submission whose key (content digest, pages, language, engine) matches a
+    running or finished job joins that job instead of starting a new one. A
+    job is only cancelled once every submitter has cancelled it. Finished jobs
+    are forgotten ``ttl`` seconds after they end.
+    """
+
+    def __init__(self, ttl=JOB_TTL):
+        self.ttl = ttl
+        self.jobs = {}
+        self.by_key = {}
+        self.lock = threading.Lock()
+        self.submitted = 0
+        self.deduplicated = 0
+
+    def submit(self, key, pages, run, cleanup=None):
+        """Start ``run()`` (an iterator of (page, text)) as a job; returns (job, created)."""
+        with self.lock:
+            self.expire()
+            self.submitted += 1
+            job = self.by_key.get(key)
+            if job is not None and job.status in ("running", "done"):
+                job.subscribers += 1
+                self.deduplicated += 1
+                return job, False
+            job = OCRJob(key, pages)
+            self.jobs[job.id] = job
+            self.by_key[key] = job
+        threading.Thread(target=self._run, args=(job, run, cleanup), daemon=True).start()
+        return job, True
+
+    def _run(self, job, run, cleanup):
+        try:
+            results = run()
+            try:
+                for page, text in results:
+                    if job.cancelled.is_set():
+                        break
+                    job.add(page, text)
+            finally:
+                # Closing the iterator cancels pages still queued in the OCR pool
+                if hasattr(results, "close"):
+                    results.close()
+            job.finish("cancelled" if job.cancelled.is_set() else "done")
+        except Exception as e:
+            job.finish("failed", str(e))
+        finally:
+            if cleanup is not None:
+                cleanup()
+
+    def get(self, job_id):
+        with self.lock:
+            return self.jobs.get(job_id)
+
+    def cancel(self, job_id):
+        with self.lock:
+            job = self.jobs.get(job_id)
+            if job is None:
+                return None
+            job.subscribers -= 1
+            if job.subscribers <= 0 and not job.done:
+                job.cancelled.set()
+                if self.by_key.get(job.key) is job:
+                    del self.by_key[job.key]
+            return job
+
+    def expire(self):
+        now = time.monotonic()
+        for job_id, job in list(self.jobs.items()):
+            if job.done and now - job.finished > self.ttl:
+                del self.jobs[job_id]
+                if self.by_key.get(job.key) is job:
+                    del self.by_key[job.key]
+
+    def stats(self):
+        with self.lock:
+            running = sum(not job.done for job in self.jobs.values())
+            return {
+                "jobs": len(self.jobs),
+                "running": running,
+                "submitted": self.submitted,
+                "deduplicated": self.deduplicated,
+            }
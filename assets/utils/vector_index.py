@@ -0,0 +1,311 @@
+import threading
+import numpy as np
+from .ann import recall_at_k
+from .codecs import SCORE_BLOCK, make_codec
+
+
+def normalize(vectors):
+    """L2-normalize a vector or each row of a matrix, leaving zero rows untouched."""
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class VectorIndex:
+    """In-memory embedding index for one modality.
+
+    Embeddings are pre-normalized rows held by a codec (see codecs.py) with a
+    parallel list of paths, so a query is one blockwise scan over the stored
+    representation (float32, float16, int8 or PQ codes). Rows are appended
+    into spare capacity and removed by moving the last row into the hole, which
+    keeps updates from update_index O(1) instead of rebuilding the matrix.
+
+    A path may own several rows (one per text chunk); search scores every row
+    and reports each path once, with the score of its best row.
+
+    The codec arrays may also be read-only memory maps from IndexStore; they
+    are only copied into memory the first time the index is modified.
+
+    With a lossy codec that can refine (``pq-rerank``), the best ``rerank``
+    candidates of the compressed scan (or all of them, if fewer) are re-scored
+    from the finer codes.
+
+    An optional ``ann`` backend (see IVFIndex) narrows large searches to a
+    subset of candidate rows; small or untrained indexes are searched exactly.
+    """
+
+    def __init__(self, dim=None, codec="float32", rerank=100):
+        self.dim = dim
+        self.codec_name = codec
+        self.rerank = rerank
+        self.paths = []
+        self.mtimes = []
+        # File sizes parallel to mtimes; -1 where unknown (entries indexed before sizes were kept)
+        self.sizes = []
+        self.rows = {}
+        self.vectors = make_codec(codec, dim) if dim else None
+        self.version = 0
+        self.ann = None
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.rows)
+
+    def __contains__(self, path):
+        return path in self.rows
+
+    @property
+    def row_count(self):
+        return len(self.paths)
+
+    @property
+    def matrix(self):
+        """Read-only float32 view of the stored rows, decoded on indexing."""
+        return DecodedRows(self.vectors, len(self.paths))
+
+    def get_mtime(self, path):
+        rows = self.rows.get(path)
+        return None if rows is None else self.mtimes[rows[0]]
+
+    def get_size(self, path):
+        rows = self.rows.get(path)
+        return None if rows is None or self.sizes[rows[0]] < 0 else self.sizes[rows[0]]
+
+    def set_size(self, path, size):
+        """Record the file size of an entry indexed without one, keeping its embeddings."""
+        with self.lock:
+            rows = self.rows.get(path)
+            if rows is None:
+                return False
+            for row in rows:
+                self.sizes[row] = size
+            self.version += 1
+            return True
+
+    def get_embeddings(self, path):
+        """Return the (chunks, dim) float32 embeddings stored for ``path``, or None."""
+        with self.lock:
+            rows = self.rows.get(path)
+            return None if rows is None else self.vectors.decode(rows)
+
+    def _reserve(self, size):
+        self.vectors.reserve(len(self.paths), size)
+
+    def upsert(self, path, embeddings, mtime, size=None):
+        """Replace all rows of ``path`` with ``embeddings`` (one vector or one per chunk)."""
+        vectors = np.asarray(embeddings, dtype=np.float32)
+        vectors = normalize(vectors.reshape(-1, vectors.shape[-1]))
+        with self.lock:
+            if self.dim is None or (not self.paths and self.dim != vectors.shape[1]):
+                self.dim = vectors.shape[1]
+                self.vectors = make_codec(self.codec_name, self.dim)
+            if vectors.shape[1] != self.dim:
+                raise ValueError(f"Embedding for {path} has dimension {vectors.shape[1]}, expected {self.dim}")
+            self._remove_rows(path)
+            start = len(self.paths)
+            self._reserve(start + len(vectors))
+            self.vectors.write(start, vectors)
+            if self.ann is not None:
+                self.ann.append(start, vectors)
+            self.paths.extend([path] * len(vectors))
+            self.mtimes.extend([mtime] * len(vectors))
+            self.sizes.extend([-1 if size is None else size] * len(vectors))
+            self.rows[path] = list(range(start, start + len(vectors)))
+            self.version += 1
+
+    def _remove_rows(self, path):
+        rows = self.rows.pop(path, None)
+        if rows is None:
+            return False
+        self._reserve(len(self.paths))
+        # Highest rows first, so the row moved into each hole never belongs to ``path``
+        for row in sorted(rows, reverse=True):
+            last = len(self.paths) - 1
+            if row != last:
+                moved = self.paths[last]
+                self.vectors.move(row, last)
+                if self.ann is not None:
+                    self.ann.move(row, last)
+                self.paths[row] = moved
+                self.mtimes[row] = self.mtimes[last]
+                self.sizes[row] = self.sizes[last]
+                moved_rows = self.rows[moved]
+                moved_rows[moved_rows.index(last)] = row
+            self.paths.pop()
+            self.mtimes.pop()
+            self.sizes.pop()
+        return True
+
+    def remove(self, path):
+        with self.lock:
+            removed = self._remove_rows(path)
+            if removed:
+                self.version += 1
+            return removed
+
+    def rename(self, old_path, new_path):
+        """Move the rows of ``old_path`` to ``new_path`` without touching the embeddings."""
+        with self.lock:
+            rows = self.rows.get(old_path)
+            if rows is None or old_path == new_path:
+                return False
+            self._remove_rows(new_path)
+            rows = self.rows.pop(old_path)
+            for row in rows:
+                self.paths[row] = new_path
+            self.rows[new_path] = rows
+            self.version += 1
+            return True
+
+    def retain(self, paths):
+        """Drop every entry whose path is not in ``paths``."""
+        keep = set(paths)
+        with self.lock:
+            for path in [p for p in self.rows if p not in keep]:
+                self.remove(path)
+
+    def search(self, query, top_k=10, min_score=None, where=None):
+        """Return up to ``top_k`` (path, cosine score) pairs, best first.
+
+        ``where(path, mtime)`` limits the search to the paths it accepts; the
+        accepted rows are scored exactly, since the ANN probe could miss them.
+        """
+        query = normalize(np.asarray(query, dtype=np.float32).reshape(-1))
+        with self.lock:
+            if not self.paths:
+                return []
+            rows = len(self.paths)
+            candidates = None
+            if where is not None:
+                accepted = [found for path, found in self.rows.items() if where(path, self.mtimes[found[0]])]
+                if not accepted:
+                    return []
+                candidates = np.sort(np.fromiter((row for found in accepted for row in found), dtype=np.int64))
+            elif self.ann is not None and self.ann.active(rows):
+                candidates = self.ann.candidates(query, rows)
+            scores = self.vectors.scores(query, rows, candidates)
+            if self.vectors.refinable:
+                # Every reported score comes from the finer codes, however few candidates there are
+                if len(scores) > self.rerank:
+                    top = np.argpartition(-scores, self.rerank - 1)[:self.rerank]
+                else:
+                    top = np.arange(len(scores))
+                candidates = top if candidates is None else candidates[top]
+                scores = self.vectors.refine(query, candidates)
+            paths = self.paths[:] if candidates is None else [self.paths[i] for i in candidates]
+        return top_paths(scores, paths, top_k, min_score)
+
+    def exact_rows(self, query, k):
+        scores = self.vectors.scores(query, len(self.paths))
+        k = min(k, len(scores))
+        return np.argpartition(-scores, k - 1)[:k]
+
+    def ann_rows(self, query, k, nprobe=None):
+        candidates = self.ann.candidates(query, len(self.paths), nprobe)
+        if not len(candidates):
+            return candidates
+        scores = self.vectors.scores(query, len(self.paths), candidates)
+        k = min(k, len(scores))
+        return candidates[np.argpartition(-scores, k - 1)[:k]]
+
+    def measure_recall(self, k=10, samples=100, nprobe=None):
+        """recall@k of the ANN backend against exact search, using stored rows as queries."""
+        with self.lock:
+            if self.ann is None or not self.ann.trained:
+                return 1.0
+            return recall_at_k(
+                self.matrix, lambda q, n: self.ann_rows(q, n, nprobe), self.exact_rows, k, samples
+            )
+
+    def refresh_ann(self):
+        """(Re)train the ANN backend once the index is large enough, then tune nprobe for recall.
+
+        Runs under the index lock, so searches wait for the (rare) training pass.
+        """
+        with self.lock:
+            if self.ann is None or not self.ann.needs_training(len(self.paths)):
+                return False
+            self.ann.train(self.matrix)
+            nlist = len(self.ann.centroids)
+            while True:
+                self.ann.recall = self.measure_recall()
+                if self.ann.recall >= self.ann.target_recall or self.ann.nprobe >= nlist:
+                    break
+                self.ann.nprobe = min(nlist, self.ann.nprobe * 2)
+            self.version += 1
+            return True
+
+    def recode(self, codec):
+        """Re-encode every stored row with another codec (lossy if the current one is)."""
+        with self.lock:
+            if codec == self.codec_name:
+                return False
+            self.codec_name = codec
+            if self.vectors is not None:
+                rows = len(self.paths)
+                vectors = make_codec(codec, self.dim)
+                vectors.reserve(0, rows)
+                for start in range(0, rows, SCORE_BLOCK):
+                    vectors.write(start, self.vectors.decode(slice(start, min(start + SCORE_BLOCK, rows))))
+                self.vectors = vectors
+            self.version += 1
+            return True
+
+    @classmethod
+    def from_arrays(cls, paths, mtimes, vectors, sizes=None):
+        """Wrap an existing codec (possibly over memory-mapped arrays) without copying it."""
+        index = cls(vectors.dim, vectors.name)
+        index.paths = list(paths)
+        index.mtimes = list(mtimes)
+        index.sizes = [-1] * len(index.paths) if sizes is None else list(sizes)
+        for row, path in enumerate(index.paths):
+            index.rows.setdefault(path, []).append(row)
+        index.vectors = vectors
+        return index
+
+    @classmethod
+    def from_dict(cls, entries, codec="float32"):
+        index = cls(codec=codec)
+        for path, data in entries.items():
+            index.upsert(path, data["embedding"], data["mtime"])
+        return index
+
+
+class DecodedRows:
+    """Sequence-like float32 view over the first ``rows`` rows of a codec, for ANN training."""
+
+    def __init__(self, vectors, rows):
+        self.vectors = vectors
+        self.rows = rows
+
+    def __len__(self):
+        return self.rows
+
+    def __getitem__(self, rows):
+        if isinstance(rows, slice):
+            rows = slice(*rows.indices(self.rows))
+        return self.vectors.decode(rows)
+
+
+def top_paths(scores, paths, top_k, min_score=None):
+    """Pick the ``top_k`` best distinct paths from per-row ``scores``, best first.
+
+    Rows are examined best-first in widening windows, so a path with many
+    high-scoring chunks cannot crowd the others out of the result.
+    """
+    total = scores.shape[0]
+    if not total:
+        return []
+    candidates = min(total, top_k * 4)
+    while True:
+        top = np.argpartition(-scores, candidates - 1)[:candidates]
+        top = top[np.argsort(-scores[top])]
+        best = {}
+        for i in top:
+            if min_score is not None and scores[i] < min_score:
+                return list(best.items())[:top_k]
+            best.setdefault(paths[i], float(scores[i]))
+        if len(best) >= top_k or candidates == total:
+            return list(best.items())[:top_k]
+        candidates = min(total, candidates * 4)
@@ -0,0 +1,132 @@
+import os
+import fnmatch
+import threading
+import time
+
+try:
+    from watchdog.observers import Observer
+    from watchdog.events import FileSystemEventHandler
+except ImportError:  # watchdog is optional; without it SearchFrame falls back to periodic rescans
+    Observer = None
+    FileSystemEventHandler = object
+
+# Seconds a path must be quiet before it is indexed, so files still being written are not embedded twice
+SETTLE_DELAY = 2.0
+# Full rescan interval used as a safety net for events the OS dropped
+RECONCILE_INTERVAL = 30 * 60
+
+
+def classify(path, roots):
+    """Return the modalities (keys of ``roots``) whose directory and extensions cover ``path``."""
+    ext = path.split(".")[-1].lower()
+    return [
+        key for key, (directory, extensions) in roots.items()
+        if directory and ext in extensions and is_under(path, directory)
+    ]
+
+
+def is_under(path, directory):
+    directory = os.path.join(os.path.normpath(directory), "")
+    return os.path.normpath(path).startswith(directory)
+
+
+class ChangeSet:
+    """Filesystem changes collected by FileWatcher since the last drain."""
+
+    def __init__(self, changed=(), deleted=(), moved=(), rescan=()):
+        self.changed = list(changed)
+        self.deleted = list(deleted)
+        self.moved = list(moved)
+        self.rescan = list(rescan)
+
+    def __bool__(self):
+        return bool(self.changed or self.deleted or self.moved or self.rescan)
+
+
+class FileWatcher(FileSystemEventHandler):
+    """Records created, modified, moved and deleted paths under the watched roots.
+
+    Uses the platform's native notification API through watchdog (inotify on
+    Linux, ReadDirectoryChangesW on Windows). Events are only buffered here;
+    ``drain`` hands them to the indexer once they have settled.
+    """
+
+    def __init__(self, roots, excludes=()):
+        super().__init__()
+        self.roots = roots
+        self.excludes = excludes
+        self.lock = threading.Lock()
+        self.changed = {}
+        self.deleted = set()
+        self.moved = []
+        self.rescan = set()
+        self.observer = None
+
+    def start(self):
+        """Start watching; returns False when watchdog is unavailable or no root exists."""
+        # Keep the roots as configured so event paths match the keys scan_files produced
+        directories = {d for d, _ in self.roots.values() if d and os.path.isdir(d)}
+        if Observer is None or not directories:
+            return False
+        self.observer = Observer()
+        for directory in directories:
+            self.observer.schedule(self, directory, recursive=True)
+        self.observer.daemon = True
+        self.observer.start()
+        return True
+
+    def stop(self):
+        if self.observer is not None:
+            self.observer.stop()
+            self.observer = None
+
+    def _excluded(self, path):
+        parts = os.path.normpath(path).split(os.sep)
+        return any(
+            fnmatch.fnmatch(part, pattern) for part in parts for pattern in self.excludes
+        ) or any(fnmatch.fnmatch(path, pattern) for pattern in self.excludes)
+
+    def _relevant(self, event, path):
+        return not self._excluded(path) and (event.is_directory or classify(path, self.roots))
+
+    def on_created(self, event):
+        if event.is_directory and self._relevant(event, event.src_path):
+            with self.lock:
+                self.rescan.add(event.src_path)
+        elif self._relevant(event, event.src_path):
+            self._touch(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory and self._relevant(event, event.src_path):
+            self._touch(event.src_path)
+
+    def on_deleted(self, event):
+        if self._relevant(event, event.src_path):
+            with self.lock:
+                self.changed.pop(event.src_path, None)
+                self.deleted.add(event.src_path)
+
+    def on_moved(self, event):
+        src, dest = event.src_path, event.dest_path
+        with self.lock:
+            self.deleted.discard(dest)
+            if self.changed.pop(src, None) is not None:
+                # A pending edit follows the file to its new name
+                self.changed[dest] = time.monotonic()
+            self.moved.append((src, dest))
+
+    def _touch(self, path):
+        with self.lock:
+            self.deleted.discard(path)
+            self.changed[path] = time.monotonic()
+
+    def drain(self, settle=SETTLE_DELAY):
+        """Return and forget all settled changes as a ChangeSet."""
+        now = time.monotonic()
+        with self.lock:
+            changed = [path for path, seen in self.changed.items() if now - seen >= settle]
+            for path in changed:
+                del self.changed[path]
+            changes = ChangeSet(changed, self.deleted, self.moved, self.rescan)
+            self.deleted, self.moved, self.rescan = set(), [], set()
+        return changes
@@ -0,0 +1,51 @@
+import io
+import numpy as np
+
+# Embedding encodings a client may ask for in its Accept header; JSON stays the default
+JSON_MIME = "application/json"
+FLOAT32_MIME = "application/x-float32"
+NPY_MIME = "application/x-npy"
+EMBEDDING_MIMES = (JSON_MIME, FLOAT32_MIME, NPY_MIME)
+BINARY_ACCEPT = f"{FLOAT32_MIME}, {NPY_MIME};q=0.9, {JSON_MIME};q=0.5"
+# Shape of a packed float32 body, e.g. "32,384"
+SHAPE_HEADER = "X-Embedding-Shape"
+
+
+def pack_embeddings(embeddings, mime):
+    """Serialize embeddings as little-endian float32; returns (body, extra headers).
+
+    Missing rows of a batch (``None``) are sent as rows of NaN.
+    """
+    if isinstance(embeddings, list) and any(row is None for row in embeddings):
+        width = next((len(row) for row in embeddings if row is not None), 0)
+        embeddings = [np.full(width, np.nan) if row is None else row for row in embeddings]
+    array = np.ascontiguousarray(embeddings, dtype="<f4")
+    if mime == NPY_MIME:
+        buffer = io.BytesIO()
+        np.save(buffer, array)
+        return buffer.getvalue(), {}
+    return array.tobytes(), {SHAPE_HEADER: ",".join(str(n) for n in array.shape)}
+
+
+def unpack_embeddings(response, key, batch=True):
+    """Embeddings from a server response in whichever encoding the server chose.
+
+    Batches come back as a list with ``None`` for items the server could not
+    embed, single embeddings as returned by the endpoint.
+    """
+    content_type = response.headers.get("Content-Type", "").split(";")[0].strip()
+    if content_type == FLOAT32_MIME:
+        shape = tuple(int(n) for n in response.headers[SHAPE_HEADER].split(","))
+        array = np.frombuffer(response.content, dtype="<f4").reshape(shape)
+    elif content_type == NPY_MIME:
+        array = np.load(io.BytesIO(response.content))
+    else:
+        return response.json()[key]
+    if not batch:
+        return array
+    return [None if not row.size or np.isnan(row).any() else row for row in array]
+
+
+def multipart_files(key, blobs):
+    """``files=`` argument for requests posting ``blobs`` (bytes or open files) as repeated ``key`` parts."""
+    return [(key, (str(position), blob, "application/octet-stream")) for position, blob in enumerate(blobs)]
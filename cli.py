@@ -0,0 +1,156 @@
+"""Headless indexing and search over the same index the desktop app uses, without Tk.
+
+    python cli.py [options] index [FOLDER ...]   index FOLDERs, or sync the configured directories
+    python cli.py [options] search QUERY         search documents and images
+    python cli.py [options] stats                describe the index
+    python cli.py [options] daemon               keep the configured directories indexed until stopped
+
+Settings come from config.json in the data directory (FILEFINDER_HOME, else
+%APPDATA%\\FileFinder or ~/FileFinder), overridden by the options below.
+Results are printed to stdout as JSON (one object per line for ``daemon``);
+log messages go to stderr. Exit status: 0 on success, 1 when the command
+failed or indexing met errors, 2 for invalid usage.
+"""
+import os
+import sys
+import json
+import signal
+import argparse
+import types
+
+# Overridable config keys: option name -> config key
+OVERRIDES = {
+    "api_url": "api_url",
+    "backend": "embedding_backend",
+    "model_dir": "local_model_dir",
+    "document_dir": "document_dir",
+    "image_dir": "image_dir",
+    "dtype": "index_dtype",
+    "search_mode": "search_mode",
+}
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Headless file indexer and search.")
+    parser.add_argument("--data-dir", help="Directory with config.json, the index and the caches")
+    parser.add_argument("--config", help="Settings file (default: <data-dir>/config.json)")
+    parser.add_argument("--index", help="Index directory (default: <data-dir>/file_index)")
+    parser.add_argument("--api-url", help="Embedding server URL(s), comma-separated")
+    parser.add_argument("--backend", choices=["http", "local"], help="Embed through the server or in-process")
+    parser.add_argument("--model-dir", help="Model directory for the local backend")
+    parser.add_argument("--document-dir", help="Documents directory to index")
+    parser.add_argument("--image-dir", help="Images directory to index")
+    parser.add_argument("--dtype", help="Index storage codec (float32, float16, int8, ...)")
+    parser.add_argument("--search-mode", choices=["local", "server"],
+                        help="search/stats on the local index or on the one the embedding server owns")
+    commands = parser.add_subparsers(dest="command", required=True)
+    index = commands.add_parser("index", help="Index folders, or sync the configured directories")
+    index.add_argument("folders", nargs="*", help="Folders to index; without any, the configured directories are synced")
+    search = commands.add_parser("search", help="Search documents and images")
+    search.add_argument("query")
+    search.add_argument("--top-k", type=int, help="Results per modality (default: 10 documents, 5 images)")
+    search.add_argument("--type", choices=["all", "text", "images"], default="all")
+    commands.add_parser("stats", help="Describe the index")
+    commands.add_parser("daemon", help="Keep the configured directories indexed until SIGINT/SIGTERM")
+    return parser, parser.parse_args(argv)
+
+
+def load_settings(args):
+    from assets.utils.app_config import default_data_dir, data_files, read_config
+    data_dir = args.data_dir or default_data_dir()
+    config = read_config(args.config or os.path.join(data_dir, "config.json"))
+    for option, key in OVERRIDES.items():
+        if getattr(args, option) is not None:
+            config[key] = getattr(args, option)
+    index_file, embedding_cache_file, ocr_cache_file = data_files(data_dir)
+    return data_dir, config, (args.index or index_file, embedding_cache_file, ocr_cache_file)
+
+
+def indexing_result(indexer, service):
+    return {"stale": indexer.stale, "errors": indexer.errors, "index": service.stats()}
+
+
+def run(args, parser, emit):
+    data_dir, config, files = load_settings(args)
+    if args.command in ("index", "daemon"):
+        if not (args.command == "index" and args.folders) and not (config["document_dir"] or config["image_dir"]):
+            parser.error("no folders given and no document_dir/image_dir configured")
+    os.makedirs(data_dir, exist_ok=True)
+
+    from assets.utils.app_config import make_embedding_client
+    from assets.utils.index_service import IndexService, RemoteIndexService
+    remote = config["search_mode"] == "server" and args.command in ("search", "stats")
+    clients = []
+
+    def client():
+        if not clients:
+            # Server-side search always goes over HTTP, whatever the embedding backend
+            clients.append(make_embedding_client({**config, "embedding_backend": "http"} if remote else config))
+        return clients[0]
+
+    settings = types.SimpleNamespace(**config)
+    if remote:
+        service = RemoteIndexService(settings, client, files[2])
+    else:
+        service = IndexService(settings, client, *files)
+    try:
+        if args.command == "stats":
+            emit(service.stats())
+            return 0
+        if args.command == "search":
+            result = {"query": args.query}
+            if args.type in ("all", "text"):
+                result["text"] = service.search_text(args.query, top_k=args.top_k or 10)
+            if args.type in ("all", "images"):
+                result["images"] = service.search_images(args.query, top_k=args.top_k or 5)
+            for key in ("text", "images"):
+                if key in result:
+                    result[key] = [{"path": path, "score": float(score)} for path, score in result[key]]
+            emit(result)
+            return 0
+        if args.command == "index":
+            indexer = service.index_folders(args.folders) if args.folders else service.update_index()
+            emit(indexing_result(indexer, service))
+            return 1 if indexer.errors else 0
+
+        # daemon: one line per full scan; SIGINT/SIGTERM stop it after the current pass
+        service.on_update = lambda indexer: emit({"event": "scan", **indexing_result(indexer, service)})
+        stop = lambda signum, frame: service.stop_indexing.set()
+        signal.signal(signal.SIGINT, stop)
+        signal.signal(signal.SIGTERM, stop)
+        service.continuous_indexing()
+        service.save_index()
+        emit({"event": "stopped", "index": service.stats()})
+        return 0
+    finally:
+        for instance in clients:
+            instance.close()
+
+
+def main(argv=None):
+    parser, args = parse_args(argv)
+    # Results own the real stdout; anything printed along the way (indexer errors, library
+    # warnings, extraction workers) goes to stderr so the JSON stays parseable
+    results = os.fdopen(os.dup(sys.stdout.fileno()), "w", encoding="utf-8")
+    os.dup2(sys.stderr.fileno(), sys.stdout.fileno())
+    sys.stdout = sys.stderr
+
+    def emit(value):
+        results.write(json.dumps(value, ensure_ascii=False) + "\n")
+        results.flush()
+
+    try:
+        return run(args, parser, emit)
+    except KeyboardInterrupt:
+        return 130
+    except Exception as e:
+        print(f"Error running {args.command}: {str(e)}", file=sys.stderr)
+        emit({"error": str(e)})
+        return 1
+
+
+if __name__ == "__main__":
+    # Required for the indexer's extraction process pool in frozen (PyInstaller) builds
+    import multiprocessing
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,115 @@
+"""Model-free stand-in for api_server.py, for trying the app or several load-balanced servers on one machine.
+
+    python stub_server.py --port 5001 --latency-ms 20 --fail-rate 0.05
+
+Embeddings are pseudo-random unit vectors derived from the input, so every
+stub returns the same vector for the same text or image.
+"""
+import time
+import random
+import hashlib
+import argparse
+import threading
+import numpy as np
+from flask import Flask, Response, request, jsonify
+from assets.utils.wire import EMBEDDING_MIMES, JSON_MIME, pack_embeddings
+
+TEXT_DIM = 384
+CLIP_DIM = 512
+
+app = Flask(__name__)
+options = argparse.Namespace(latency_ms=0.0, fail_rate=0.0)
+counts_lock = threading.Lock()
+counts = {}
+
+
+def fake_embedding(data, dim):
+    if isinstance(data, str):
+        data = data.encode("utf-8")
+    seed = int.from_bytes(hashlib.sha256(data).digest()[:8], "little")
+    vector = np.random.default_rng(seed).standard_normal(dim).astype(np.float32)
+    return vector / np.linalg.norm(vector)
+
+
+def embedding_response(key, embeddings):
+    mime = request.accept_mimetypes.best_match(EMBEDDING_MIMES, default=JSON_MIME)
+    if mime == JSON_MIME:
+        return jsonify({key: [embedding.tolist() for embedding in embeddings]})
+    body, headers = pack_embeddings(embeddings, mime)
+    return Response(body, mimetype=mime, headers=headers)
+
+
+def request_blobs(key):
+    if request.files:
+        return [part.read() for part in request.files.getlist(key)]
+    return [request.get_data()]
+
+
+@app.before_request
+def simulate_load():
+    with counts_lock:
+        counts[request.path] = counts.get(request.path, 0) + 1
+    if options.latency_ms:
+        time.sleep(options.latency_ms / 1000)
+    if request.path not in ('/models', '/health', '/metrics') and random.random() < options.fail_rate:
+        return jsonify({'error': 'Simulated failure'}), 503
+
+
+@app.route('/models', methods=['GET'])
+def models():
+    return jsonify({
+        'text': 'stub-text',
+        'clip': 'stub-clip',
+        'clip_image': {'size': {'shortest_edge': 224}, 'resample': 3},
+        'ocr': {'lang': 'stub', 'engine': 'stub'},
+    })
+
+
+@app.route('/health', methods=['GET'])
+def health():
+    return jsonify({'status': 'ok'})
+
+
+@app.route('/metrics', methods=['GET'])
+def metrics():
+    with counts_lock:
+        return jsonify({'requests': dict(counts)})
+
+
+@app.route('/embed_text', methods=['POST'])
+def embed_text():
+    return embedding_response('embedding', [fake_embedding(request.json['text'], TEXT_DIM)])
+
+
+@app.route('/embed_clip_text', methods=['POST'])
+def embed_clip_text():
+    return embedding_response('embedding', [fake_embedding(request.json['text'], CLIP_DIM)])
+
+
+@app.route('/embed_text_batch', methods=['POST'])
+def embed_text_batch():
+    return embedding_response('embeddings', [fake_embedding(text, TEXT_DIM) for text in request.json['texts']])
+
+
+@app.route('/embed_clip_text_batch', methods=['POST'])
+def embed_clip_text_batch():
+    return embedding_response('embeddings', [fake_embedding(text, CLIP_DIM) for text in request.json['texts']])
+
+
+@app.route('/embed_image', methods=['POST'])
+def embed_image():
+    return embedding_response('embedding', [fake_embedding(request_blobs('image')[0], CLIP_DIM)])
+
+
+@app.route('/embed_image_batch', methods=['POST'])
+def embed_image_batch():
+    return embedding_response('embeddings', [fake_embedding(blob, CLIP_DIM) for blob in request_blobs('images')])
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="delay added to every request")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="share of embedding requests answered with 503")
+    options = parser.parse_args()
+    app.run(host='127.0.0.1', port=options.port, threaded=True)
@@ -0,0 +1,77 @@
+import io
+import pickle
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import pytest
+from assets.utils.balancer import BalancedEmbeddingClient
+
+
+def start_server(status, received):
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            received.append(len(body))
+            self.send_response(status)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def do_GET(self):
+            self.send_response(503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+@pytest.fixture
+def nodes():
+    received = {"failing": [], "healthy": []}
+    servers = [start_server(503, received["failing"]), start_server(200, received["healthy"])]
+    yield [f"http://127.0.0.1:{server.server_port}" for server in servers], received
+    for server in servers:
+        server.shutdown()
+
+
+@pytest.mark.parametrize("upload", ["data", "files"])
+def test_failover_resends_file_body_from_start(nodes, upload):
+    urls, received = nodes
+    client = BalancedEmbeddingClient(urls, retries=3, backoff=0, probe_interval=60)
+    # Start on the failing node, so the healthy one only ever sees the retry
+    client.endpoints[1].outstanding = 1000
+    try:
+        body = io.BytesIO(b"x" * 5000)
+        body.seek(100)
+        if upload == "data":
+            response = client.post("extract_pdf_with_ocr", data=body)
+        else:
+            response = client.post("embed_image_batch", files=[("images", ("0", body, "application/octet-stream"))])
+        assert response.status_code == 200
+        assert received["failing"] and received["healthy"]
+        if upload == "data":
+            assert received["failing"] == [4900] and received["healthy"] == [4900]
+        else:
+            # Multipart framing varies; the file part itself must be the same size on both nodes
+            assert received["healthy"][0] == received["failing"][0] > 4900
+    finally:
+        client.endpoints[1].outstanding = 0
+        client.close()
+
+
+def test_probe_thread_starts_on_first_failure(nodes):
+    urls, _ = nodes
+    before = threading.active_count()
+    client = pickle.loads(pickle.dumps(BalancedEmbeddingClient(urls, backoff=0, probe_interval=60)))
+    try:
+        # Copies unpickled into worker processes start no threads
+        assert client.probe_thread is None and threading.active_count() == before
+        client.endpoints[1].outstanding = 1000
+        client.post("embed_text", json={"text": "x"})
+        assert client.probe_thread is not None and client.probe_thread.is_alive()
+    finally:
+        client.endpoints[1].outstanding = 0
+        client.close()
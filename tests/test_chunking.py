@@ -0,0 +1,27 @@
+from assets.utils.chunking import chunk_text
+
+
+def test_chunks_overlap_by_the_configured_amount():
+    # No sentence or word breaks, so every cut lands exactly at ``size``
+    text = "".join(chr(ord("a") + row % 26) for row in range(1000))
+    chunks = chunk_text(text, size=160, overlap=32)
+    assert chunks[0] == text[:160]
+    assert chunks[1] == text[128:288]
+    assert chunks[-1].endswith(text[-20:])
+    assert all(len(chunk) <= 160 for chunk in chunks)
+
+
+def test_chunks_cut_at_sentence_ends():
+    text = "。".join(f"第{row}句话讲的是一件很长的事情" for row in range(60))
+    chunks = chunk_text(text, size=80, overlap=16)
+    assert len(chunks) > 1
+    for chunk in chunks[:-1]:
+        assert len(chunk) <= 80 and chunk.endswith("。")
+    # Every sentence survives in some chunk
+    assert all(any(f"第{row}句" in chunk for chunk in chunks) for row in range(60))
+
+
+def test_chunk_count_is_capped():
+    assert len(chunk_text("word " * 100_000, size=50, overlap=10, max_chunks=7)) == 7
+    assert chunk_text("short note") == ["short note"]
+    assert chunk_text("  \n ") == []
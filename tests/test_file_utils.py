@@ -0,0 +1,44 @@
+import os
+import pytest
+from assets.utils.file_utils import scan_tree
+
+
+def touch(path):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w", encoding="utf-8") as f:
+        f.write("x")
+
+
+@pytest.fixture
+def tree(tmp_path):
+    for name in (
+        "notes.txt", "report.pdf", "~$report.docx", "photos/cat.jpg", "photos/notes.txt",
+        ".git/objects/readme.txt", "app/node_modules/pkg/readme.txt", "app/__pycache__/x.txt",
+        "archive/old.txt",
+    ):
+        touch(str(tmp_path / name))
+    return tmp_path
+
+
+@pytest.mark.parametrize("workers", [1, 4])
+def test_default_excludes(tree, workers):
+    result = scan_tree({"docs": (str(tree), ["txt", "pdf", "docx"])}, workers=workers)
+    found = sorted(os.path.relpath(path, tree) for path in result["docs"])
+    assert found == sorted(os.path.normpath(name) for name in (
+        "notes.txt", "report.pdf", "photos/notes.txt", "archive/old.txt",
+    ))
+
+
+def test_custom_excludes_replace_the_defaults(tree):
+    result = scan_tree({"docs": (str(tree), ["txt"])}, excludes=["archive", "*/photos/*"])
+    found = {os.path.relpath(path, tree) for path in result["docs"]}
+    assert os.path.normpath("archive/old.txt") not in found
+    assert os.path.normpath("photos/notes.txt") not in found
+    assert os.path.normpath(".git/objects/readme.txt") in found
+
+
+def test_nested_roots_are_classified_in_one_pass(tree):
+    result = scan_tree({"docs": (str(tree), ["txt"]), "images": (str(tree / "photos"), ["jpg"])})
+    assert set(result["images"]) == {str(tree / "photos" / "cat.jpg")}
+    assert str(tree / "photos" / "notes.txt") in result["docs"]
+    assert result["docs"][str(tree / "notes.txt")].size == 1
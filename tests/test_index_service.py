@@ -0,0 +1,63 @@
+import types
+import numpy as np
+from assets.utils.app_config import DEFAULT_CONFIG
+from assets.utils.index_service import IndexService
+
+
+class FakeClient:
+    api_url = "http://localhost:5000"
+
+    def __init__(self, text_model):
+        self.text_model = text_model
+        self.calls = 0
+
+    def models(self):
+        return {"text": self.text_model, "clip": "clip-model"} if self.text_model else {}
+
+    def embed_query(self, endpoint, text):
+        self.calls += 1
+        return np.full(4, len(self.text_model or ""), dtype=np.float32)
+
+
+def make_service(tmp_path, current):
+    settings = types.SimpleNamespace(**DEFAULT_CONFIG)
+    return IndexService(
+        settings, lambda: current[0], str(tmp_path / "index"),
+        str(tmp_path / "embedding_cache.sqlite"), str(tmp_path / "ocr_cache.sqlite"),
+    )
+
+
+def test_query_cache_is_keyed_on_model(tmp_path):
+    current = [FakeClient("model-a")]
+    service = make_service(tmp_path, current)
+    service.embed_query("embed_text", "hello")
+    service.embed_query("embed_text", " hello ")
+    assert current[0].calls == 1
+
+    # Another model behind the same URL must not be served model-a's embedding
+    current[0] = FakeClient("model-bb")
+    assert service.embed_query("embed_text", "hello")[0] == len("model-bb")
+    assert current[0].calls == 1
+
+    stats = service.stats()["query_cache"]
+    assert stats["hits"] == 1 and stats["misses"] == 2
+
+
+def test_query_cache_bypassed_without_model_identity(tmp_path):
+    current = [FakeClient(None)]
+    service = make_service(tmp_path, current)
+    service.embed_query("embed_text", "hello")
+    service.embed_query("embed_text", "hello")
+    assert current[0].calls == 2
+    assert service.stats()["query_cache"]["entries"] == 0
+
+
+def test_query_cache_embeds_the_query_as_typed(tmp_path):
+    seen = []
+    client = FakeClient("model-a")
+    client.embed_query = lambda endpoint, text: seen.append(text) or np.ones(4, dtype=np.float32)
+    service = make_service(tmp_path, [client])
+    service.embed_query("embed_text", "ＡＢＣ  報告")
+    service.embed_query("embed_text", "ABC 報告")
+    # Full-width input reaches the model unchanged; the normalized form only keys the cache
+    assert seen == ["ＡＢＣ  報告"]
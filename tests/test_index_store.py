@@ -0,0 +1,143 @@
+import os
+import json
+import threading
+import numpy as np
+import pytest
+from assets.utils import index_store
+from assets.utils.index_store import IndexStore
+
+
+@pytest.fixture
+def windows_locks(monkeypatch):
+    """Make replacing or deleting a memory-mapped file fail the way it does on Windows."""
+    mapped = set()
+    real_load, real_replace, real_remove = np.load, os.replace, os.remove
+
+    def load(path, mmap_mode=None, **kwargs):
+        if mmap_mode:
+            mapped.add(os.path.abspath(path))
+        return real_load(path, mmap_mode=mmap_mode, **kwargs)
+
+    def guard(path):
+        if os.path.abspath(path) in mapped:
+            raise PermissionError(f"{path} is mapped")
+
+    def replace(src, dst):
+        guard(dst)
+        real_replace(src, dst)
+
+    def remove(path):
+        guard(path)
+        real_remove(path)
+
+    monkeypatch.setattr(index_store.np, "load", load)
+    monkeypatch.setattr(index_store.os, "replace", replace)
+    monkeypatch.setattr(index_store.os, "remove", remove)
+    return mapped
+
+
+def build(path):
+    store = IndexStore(str(path))
+    indexes = store.load()
+    rng = np.random.default_rng(0)
+    for row in range(20):
+        indexes["text"].upsert(f"doc{row}.txt", rng.standard_normal(8), mtime=row)
+        indexes["images"].upsert(f"img{row}.png", rng.standard_normal(4), mtime=row)
+    store.save(indexes)
+    return indexes
+
+
+def test_save_over_mapped_index(tmp_path, windows_locks):
+    build(tmp_path / "index")
+    store = IndexStore(str(tmp_path / "index"))
+    indexes = store.load()
+    assert windows_locks
+
+    # Changes that keep the memory-mapped codec arrays, then two saves
+    indexes["text"].rename("doc0.txt", "renamed.txt")
+    store.save(indexes)
+    indexes["images"].remove("img1.png")
+    store.save(indexes)
+
+    reloaded = IndexStore(str(tmp_path / "index")).load()
+    assert "renamed.txt" in reloaded["text"] and "doc0.txt" not in reloaded["text"]
+    assert "img1.png" not in reloaded["images"] and len(reloaded["images"]) == 19
+    np.testing.assert_allclose(
+        reloaded["text"].get_embeddings("renamed.txt"), indexes["text"].get_embeddings("renamed.txt")
+    )
+
+
+def test_superseded_generations_are_removed(tmp_path):
+    path = tmp_path / "index"
+    indexes = build(path)
+    store = IndexStore(str(path))
+    indexes = store.load()
+    indexes["text"].remove("doc3.txt")
+    store.save(indexes)
+    del indexes
+    store.save(store.load(), force=True)
+
+    with open(path / "manifest.json", encoding="utf-8") as f:
+        generations = {name: info["generation"] for name, info in json.load(f)["modalities"].items()}
+    for file_name in os.listdir(path):
+        name, _, rest = file_name.partition(".")
+        if name in generations:
+            assert rest.startswith(f"{generations[name]}.")
+
+
+def test_unsuffixed_files_move_to_a_generation(tmp_path):
+    path = tmp_path / "index"
+    build(path)
+    # Rewrite the index under the names used before generations existed
+    with open(path / "manifest.json", encoding="utf-8") as f:
+        manifest = json.load(f)
+    for name, info in manifest["modalities"].items():
+        prefix = f"{name}.{info.pop('generation')}."
+        for file_name in os.listdir(path):
+            if file_name.startswith(prefix):
+                os.rename(path / file_name, path / f"{name}.{file_name[len(prefix):]}")
+    with open(path / "manifest.json", "w", encoding="utf-8") as f:
+        json.dump(manifest, f)
+
+    store = IndexStore(str(path))
+    indexes = store.load()
+    assert len(indexes["text"]) == 20
+    store.save(indexes)
+    assert len(IndexStore(str(path)).load()["text"]) == 20
+    assert not os.path.exists(path / "text.paths")
+
+
+def test_sizes_round_trip(tmp_path):
+    store = IndexStore(str(tmp_path / "index"))
+    indexes = store.load()
+    indexes["text"].upsert("a.txt", np.ones(8), mtime=1.0, size=123)
+    indexes["text"].upsert("b.txt", np.ones(8), mtime=2.0)
+    store.save(indexes)
+
+    reloaded = IndexStore(str(tmp_path / "index")).load()
+    assert reloaded["text"].get_size("a.txt") == 123
+    assert reloaded["text"].get_size("b.txt") is None
+
+
+def test_concurrent_saves(tmp_path):
+    store = IndexStore(str(tmp_path / "index"))
+    indexes = store.load()
+    errors = []
+
+    def writer(offset):
+        rng = np.random.default_rng(offset)
+        try:
+            for row in range(30):
+                indexes["text"].upsert(f"doc{offset + row}.txt", rng.standard_normal(8), mtime=row)
+                store.save(indexes)
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=writer, args=(offset,)) for offset in (0, 1000, 2000)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    store.save(indexes)
+    assert not errors
+    assert len(IndexStore(str(tmp_path / "index")).load()["text"]) == 90
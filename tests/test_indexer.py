@@ -0,0 +1,87 @@
+import os
+import numpy as np
+from assets.utils.indexer import Indexer
+from assets.utils.vector_index import VectorIndex
+
+
+class FakeClient:
+    api_url = "http://localhost:5000"
+
+    def __init__(self):
+        self.calls = 0
+
+    def models(self):
+        return {"text": "text-model", "clip": "clip-model"}
+
+    def embed_batch(self, endpoint, key, items):
+        self.calls += 1
+        return [np.array([len(item), 1.0, 0.0, 0.0], dtype=np.float32) for item in items]
+
+
+def make_indexer(indexes, client):
+    return Indexer(indexes, client, extract_workers=1, embed_workers=1, ocr_pdfs=False)
+
+
+def write(path, text, mtime):
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.utime(path, (mtime, mtime))
+
+
+def test_same_mtime_rewrite_is_reindexed(tmp_path):
+    path = str(tmp_path / "notes.txt")
+    write(path, "first version of the notes", 1_600_000_000)
+    indexes = {"text": VectorIndex(), "images": VectorIndex()}
+    client = FakeClient()
+    make_indexer(indexes, client).index_files([path], [])
+    assert indexes["text"].get_size(path) == os.path.getsize(path)
+
+    # Rewritten within the same (coarse) mtime tick
+    write(path, "second, longer version of the notes", 1_600_000_000)
+    indexer = make_indexer(indexes, client)
+    indexer.index_files([path], [])
+    assert indexer.stale["text"] == 1
+    assert indexes["text"].get_size(path) == os.path.getsize(path)
+
+    indexer = make_indexer(indexes, client)
+    indexer.index_files([path], [])
+    assert indexer.stale["text"] == 0
+
+
+def test_entries_without_size_are_backfilled(tmp_path):
+    path = str(tmp_path / "notes.txt")
+    write(path, "indexed before sizes were kept", 1_600_000_000)
+    indexes = {"text": VectorIndex(), "images": VectorIndex()}
+    indexes["text"].upsert(path, np.ones(4), 1_600_000_000)
+    client = FakeClient()
+
+    indexer = make_indexer(indexes, client)
+    indexer.index_files([path], [])
+    assert indexer.stale["text"] == 0 and client.calls == 0
+    assert indexes["text"].get_size(path) == os.path.getsize(path)
+
+
+class CountingClient(FakeClient):
+    pickled = 0
+
+    def __getstate__(self):
+        CountingClient.pickled += 1
+        return self.__dict__
+
+    def ocr_pdf_pages(self, path, pages):
+        return {}
+
+
+def test_worker_processes_get_the_client_once(tmp_path):
+    paths = []
+    for number in range(12):
+        path = str(tmp_path / f"doc{number}.txt")
+        write(path, f"document number {number}", 1_600_000_000)
+        paths.append(path)
+    indexes = {"text": VectorIndex(), "images": VectorIndex()}
+    CountingClient.pickled = 0
+    indexer = Indexer(indexes, CountingClient(), extract_workers=2, embed_workers=1)
+    indexer.index_files(paths, [])
+    assert len(indexes["text"]) == 12
+    # At most once per worker process (not at all under fork), never once per document
+    assert CountingClient.pickled <= 2
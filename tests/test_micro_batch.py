@@ -0,0 +1,55 @@
+import threading
+import pytest
+from assets.utils.micro_batch import MicroBatcher
+
+
+def submit_all(batcher, items):
+    results = [None] * len(items)
+    errors = [None] * len(items)
+    start = threading.Barrier(len(items))
+
+    def call(index):
+        start.wait()
+        try:
+            results[index] = batcher.submit(items[index], timeout=5)
+        except Exception as e:
+            errors[index] = e
+
+    threads = [threading.Thread(target=call, args=(index,)) for index in range(len(items))]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results, errors
+
+
+def test_concurrent_submits_share_batches():
+    calls = []
+
+    def run_batch(items):
+        calls.append(list(items))
+        return [item * 2 for item in items]
+
+    batcher = MicroBatcher(run_batch, max_batch_size=8, max_wait=0.05)
+    results, errors = submit_all(batcher, list(range(20)))
+    # Each caller gets the result for its own item, from fewer model calls than items
+    assert results == [item * 2 for item in range(20)] and errors == [None] * 20
+    assert len(calls) < 20 and all(len(batch) <= 8 for batch in calls)
+    stats = batcher.stats()
+    assert stats["items"] == 20 and stats["batches"] == len(calls)
+    assert sum(size * count for size, count in stats["batch_size_histogram"].items()) == 20
+
+
+def test_batch_errors_reach_every_caller():
+    def run_batch(items):
+        raise ValueError("model failed")
+
+    batcher = MicroBatcher(run_batch, max_wait=0.05)
+    _, errors = submit_all(batcher, list(range(4)))
+    assert all(isinstance(e, ValueError) for e in errors)
+
+
+def test_result_count_mismatch_is_an_error():
+    batcher = MicroBatcher(lambda items: items[:-1] if len(items) > 1 else [], max_wait=0)
+    with pytest.raises(RuntimeError):
+        batcher.submit("x", timeout=5)
@@ -0,0 +1,54 @@
+import threading
+from assets.utils.ocr_jobs import OCRJobManager
+
+
+def gated_run(gate, calls):
+    def run():
+        calls.append(1)
+        for page in range(3):
+            gate.wait(5)
+            yield page, f"page {page}"
+    return run
+
+
+def test_identical_submissions_share_one_job():
+    manager = OCRJobManager()
+    gate, calls = threading.Event(), []
+    first, created = manager.submit("digest:1-3:chi_sim", [0, 1, 2], gated_run(gate, calls))
+    second, joined = manager.submit("digest:1-3:chi_sim", [0, 1, 2], gated_run(gate, calls))
+    assert created and not joined and second is first
+    other, created_other = manager.submit("digest:1-3:eng", [0, 1, 2], gated_run(gate, calls))
+    assert created_other and other is not first
+
+    gate.set()
+    with first.cond:
+        assert first.cond.wait_for(lambda: first.done, 5)
+    snapshot = first.snapshot()
+    assert snapshot["status"] == "done"
+    assert [result["text"] for result in snapshot["results"]] == ["page 0", "page 1", "page 2"]
+    # A finished job still serves later identical submissions
+    again, created_again = manager.submit("digest:1-3:chi_sim", [0, 1, 2], gated_run(gate, calls))
+    assert again is first and not created_again
+    assert len(calls) == 2
+    assert manager.stats()["deduplicated"] == 2
+
+
+def test_job_is_cancelled_only_when_every_submitter_cancels():
+    manager = OCRJobManager()
+    gate, calls = threading.Event(), []
+    cleaned = threading.Event()
+    job, _ = manager.submit("key", [0, 1, 2], gated_run(gate, calls), cleanup=cleaned.set)
+    manager.submit("key", [0, 1, 2], gated_run(gate, calls))
+
+    manager.cancel(job.id)
+    assert not job.cancelled.is_set()
+    manager.cancel(job.id)
+    assert job.cancelled.is_set()
+
+    gate.set()
+    assert cleaned.wait(5)
+    assert job.status == "cancelled"
+    # The cancelled job no longer absorbs new submissions
+    fresh, created = manager.submit("key", [0, 1, 2], gated_run(gate, calls))
+    assert created and fresh is not job
+    assert manager.cancel("missing") is None
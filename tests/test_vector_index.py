@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+from assets.utils.ann import IVFIndex
+from assets.utils.codecs import PQ_TRAIN_ROWS
+from assets.utils.vector_index import VectorIndex, normalize, top_paths
+
+
+@pytest.fixture(scope="module")
+def pq_index():
+    rng = np.random.default_rng(0)
+    vectors = normalize(rng.standard_normal((PQ_TRAIN_ROWS, 32)))
+    index = VectorIndex(codec="pq-rerank")
+    for row, vector in enumerate(vectors):
+        index.upsert(f"doc{row}.txt", vector, mtime=row)
+    assert index.vectors.refinable
+    return index, vectors
+
+
+@pytest.mark.parametrize("accepted", [5, 50, 500])
+def test_pq_rerank_filtered_scores_are_refined(pq_index, accepted):
+    index, vectors = pq_index
+    query = vectors[3]
+    results = index.search(query, top_k=accepted, where=lambda path, mtime: mtime < accepted)
+    exact = vectors[:accepted] @ query
+    expected = np.argsort(-exact)[:len(results)]
+
+    assert results[0] == ("doc3.txt", pytest.approx(1.0, abs=0.01))
+    for path, score in results:
+        assert score == pytest.approx(exact[int(path[3:-4])], abs=0.02)
+    # Refined scores order the neighbours the way exact scores do, up to int8 rounding
+    assert [path for path, _ in results[:3]] == [f"doc{row}.txt" for row in expected[:3]]
+
+
+def test_pq_rerank_unfiltered_self_match(pq_index):
+    index, vectors = pq_index
+    path, score = index.search(vectors[42], top_k=1)[0]
+    assert path == "doc42.txt" and score == pytest.approx(1.0, abs=0.01)
+
+
+def test_ivf_recall_against_exact_search():
+    rng = np.random.default_rng(1)
+    # Clustered rows, like embeddings of related documents
+    centers = normalize(rng.standard_normal((40, 32)))
+    vectors = normalize(centers[rng.integers(0, 40, 6000)] + 0.3 * rng.standard_normal((6000, 32)))
+    index = VectorIndex()
+    index.ann = IVFIndex(min_rows=2000)
+    for row, vector in enumerate(vectors):
+        index.upsert(f"doc{row}.txt", vector, mtime=row)
+    assert index.refresh_ann() and index.ann.active(index.row_count)
+
+    assert index.measure_recall(k=10) >= 0.9
+
+    # The same through search(): ANN results against a brute-force top 10 for unseen queries
+    queries = normalize(centers[rng.integers(0, 40, 50)] + 0.3 * rng.standard_normal((50, 32)))
+    found = 0
+    for query in queries:
+        exact = {f"doc{row}.txt" for row in np.argsort(-(vectors @ query))[:10]}
+        found += len(exact & {path for path, _ in index.search(query, top_k=10)})
+    assert found / (10 * len(queries)) >= 0.9
+
+
+def test_top_paths_keeps_each_paths_best_chunk():
+    paths = ["a.txt", "a.txt", "a.txt", "a.txt", "b.txt", "c.txt", "b.txt"]
+    scores = np.array([0.95, 0.94, 0.93, 0.92, 0.5, 0.4, 0.8], dtype=np.float32)
+    # a.txt's extra chunks do not crowd out the other files, and b.txt scores its best chunk
+    assert top_paths(scores, paths, 3) == [
+        ("a.txt", pytest.approx(0.95)), ("b.txt", pytest.approx(0.8)), ("c.txt", pytest.approx(0.4)),
+    ]
+    assert [path for path, _ in top_paths(scores, paths, 3, min_score=0.6)] == ["a.txt", "b.txt"]
+    assert top_paths(scores[:0], [], 3) == []
+
+    # More chunks of one file than the first candidate window holds
+    paths = ["long.txt"] * 100 + ["short.txt"]
+    scores = np.concatenate([np.linspace(0.99, 0.9, 100), [0.1]]).astype(np.float32)
+    assert [path for path, _ in top_paths(scores, paths, 2)] == ["long.txt", "short.txt"]